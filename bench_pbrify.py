@@ -0,0 +1,263 @@
+"""Benchmarks for PBRify against a synthetic mod library.
+
+A stand-in for create_pbr.exe reads the textures of each pair, waits as if
+it were running inference and writes the output maps. The numbers measure
+PBRify's own overhead and I/O behaviour, not the model's.
+
+    python bench_pbrify.py prefetch [--mods 6] [--pairs 40] [--size 1024] [--delay 0.02] [--dir PATH]
+    python bench_pbrify.py memory [--mods 20] [--pairs 2000] [--per-folder 50] [--dir PATH]
+    python bench_pbrify.py trivial [--textures 200] [--size 1024] [--dir PATH]
+
+The stand-in is a Python script, so the benchmarks run on Linux and macOS.
+Put --dir on the drive you want to measure; a tmpfs keeps everything in
+memory and shows no difference. Results are printed and appended to
+bench_output.txt.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import shutil
+import statistics
+import struct
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pbrify
+
+BENCH_OUTPUT_FILE_NAME = 'bench_output.txt'
+BENCH_FOURCCS = {'bc1': 'DXT1', 'bc3': 'DXT5', 'bc5': 'ATI2'}
+
+FAKE_FAIL_VARIABLE = 'PBRIFY_FAKE_FAIL'  # the stand-in crashes on normal maps whose name contains this
+FAKE_TRUNCATE_VARIABLE = 'PBRIFY_FAKE_TRUNCATE'  # and writes half of the maps of the ones containing this
+
+FAKE_CREATE_PBR = '''#!{python}
+import os, sys, time, pathlib
+args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+input_dir = pathlib.Path(args['--input_dir'])
+output_dir = pathlib.Path(args['--output_dir'])
+fail = os.environ.get('{fail_variable}')
+truncate = os.environ.get('{truncate_variable}')
+normals = sorted(p for p in input_dir.rglob('*_n.dds'))
+print(f'normals: found {{len(normals)}}', flush=True)
+for normal in normals:
+    print(f'Processing {{normal}}', flush=True)
+    if fail and fail in normal.name:
+        sys.exit(f'RuntimeError: cannot convert {{normal}}')
+    data = normal.read_bytes()
+    if truncate and truncate in normal.name:
+        data = data[:len(data) // 2]
+    normal.with_name(normal.name[:-6] + '.dds').read_bytes()
+    time.sleep({delay})
+    target = output_dir / 'textures' / 'pbr' / normal.parent.relative_to(input_dir / 'textures')
+    target.mkdir(parents=True, exist_ok=True)
+    for suffix in ('', '_n', '_rmaos'):
+        (target / (normal.name[:-6] + suffix + '.dds')).write_bytes(data)
+    print('PBR inference complete', flush=True)
+'''
+
+
+def write_dds(path: Path, size: int, fourcc: str = 'DXT1', block: bytes = b''):
+    """Write a block compressed texture with a full mip chain, of random data or of one block repeated."""
+    header = bytearray(128)
+    header[:4] = b'DDS '
+    mips = size.bit_length()
+    linear_size = max(1, size // 4) ** 2 * pbrify.DDS_BLOCK_BYTES[fourcc]
+    struct.pack_into('<IIIIIII', header, 4, 124, 0x1007 | 0x20000, size, size, linear_size, 0, mips)
+    struct.pack_into('<II4s', header, 76, 32, 0x4, fourcc.encode('ascii'))
+    data_size = pbrify.dds_data_size(pbrify.DDSInfo(width=size, height=size, mip_count=mips, fourcc=fourcc))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = block * (data_size // len(block)) if block else os.urandom(data_size)
+    path.write_bytes(bytes(header) + data)
+
+
+def write_bench_texture(path: Path, size: int, kind: str, constant: bool):
+    """Write an uncompressed ('rgba'), BC1, BC3 or BC5 texture, mid grey or random."""
+    if kind == 'rgba':
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pbrify.write_constant_dds(path, size, size, (128, 128, 128, 255))
+        if not constant:
+            with open(path, 'r+b') as f:
+                f.seek(128)
+                f.write(os.urandom(path.stat().st_size - 128))
+        return
+    block = b''
+    if constant:
+        bc4 = bytes([128, 128]) + bytes(6)
+        bc1 = struct.pack('<HHI', 0x8410, 0x8410, 0)  # RGB565 mid grey
+        block = {'bc1': bc1, 'bc3': bc4 + bc1, 'bc5': bc4 + bc4}[kind]
+    write_dds(path, size, BENCH_FOURCCS[kind], block)
+
+
+def build_library(root: Path, mods: int, pairs: int, size: int, delay: float,
+                  per_folder: int = 0) -> pbrify.Settings:
+    """Create mods, an output folder and the stand-in create_pbr.exe below root.
+    
+    With per_folder set, the pairs of a mod are spread over folders of that many pairs.
+    """
+    for m in range(mods):
+        for p in range(pairs):
+            folder = root / 'mods' / f'Mod{m:03}' / 'textures' / 'armor'
+            if per_folder:
+                folder = folder / f'set{p // per_folder:03}'
+            write_dds(folder / f'tex{p:04}.dds', size)
+            write_dds(folder / f'tex{p:04}_n.dds', size)
+    (root / 'output').mkdir()
+    create_pbr = root / 'bin' / 'create_pbr.exe'
+    create_pbr.parent.mkdir()
+    create_pbr.write_text(FAKE_CREATE_PBR.format(python=sys.executable, delay=delay, fail_variable=FAKE_FAIL_VARIABLE,
+                                                 truncate_variable=FAKE_TRUNCATE_VARIABLE))
+    create_pbr.chmod(0o755)
+    return pbrify.Settings(mods_directory=root / 'mods', output_directory=root / 'output', create_pbr_path=create_pbr)
+
+
+def evict(folder: Path):
+    """Drop a folder's files from the page cache, so the next reads come from the disk."""
+    os.sync()
+    for root, _, files in os.walk(folder):
+        for name in files:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+async def time_to_first_inference(engine: pbrify.ConversionEngine) -> list:
+    """Run the engine and measure, per mod, the seconds from its start to its first finished texture."""
+    started = {}
+    first = {}
+    events = engine.events()
+    engine_task = asyncio.create_task(engine.run())
+    async for event in events:
+        if event.kind == pbrify.EVENT_PROGRESS:
+            started[event.mod_name] = time.perf_counter()
+        elif event.kind == pbrify.EVENT_MOD_PROGRESS and event.mod_name not in first:
+            first[event.mod_name] = time.perf_counter() - started[event.mod_name]
+    await engine_task
+    return [first[name] for name in sorted(first, key=started.get)]
+
+
+def bench_prefetch(args: argparse.Namespace) -> list:
+    logger = logging.getLogger('pbrify-bench')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    root = Path(tempfile.mkdtemp(prefix='pbrify-bench-', dir=args.dir))
+    lines = [f"prefetch: {args.mods} mods x {args.pairs} pairs of {args.size}x{args.size} DXT1, "
+             f"{args.delay}s per texture, in {root}"]
+    try:
+        settings = build_library(root, args.mods, args.pairs, args.size, args.delay)
+        for prefetch in (False, True):
+            shutil.rmtree(settings.output_directory)
+            settings.output_directory.mkdir()
+            evict(settings.mods_directory)
+            settings.prefetch_textures = prefetch
+            engine = pbrify.ConversionEngine(settings, logger, pbrify.JobQueue())
+            start = time.perf_counter()
+            firsts = asyncio.run(time_to_first_inference(engine))
+            total = time.perf_counter() - start
+            # the first mod starts before anything could be prefetched
+            later = statistics.mean(firsts[1:]) if len(firsts) > 1 else float('nan')
+            lines.append(f"  prefetch {'on ' if prefetch else 'off'}: first inference of first mod {firsts[0] * 1000:.1f} ms, "
+                         f"of later mods {later * 1000:.1f} ms (mean), total {total:.2f} s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return lines
+
+
+def bench_memory(args: argparse.Namespace) -> list:
+    logger = logging.getLogger('pbrify-bench')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    root = Path(tempfile.mkdtemp(prefix='pbrify-bench-', dir=args.dir))
+    lines = [f"memory: {args.mods} mods x {args.pairs} pairs, {args.per_folder} pairs per folder, in {root}"]
+    try:
+        settings = build_library(root, args.mods, args.pairs, 4, 0, args.per_folder)
+        pbrify.PATH_INDEX.listings.clear()
+        
+        # what a scan keeps: the directory index, the plans and the scan results
+        tracemalloc.start()
+        engine = pbrify.ConversionEngine(settings, logger)
+        results = [engine.describe_mod(mod_path) for mod_path in engine.get_mods_to_process()]
+        textures = sum(result.textures for result in results)
+        scanned, _ = tracemalloc.get_traced_memory()
+        engine.plans.clear()
+        engine.predicted_sizes.clear()
+        results.clear()
+        index, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        lines.append(f"  scan and plan: {scanned / textures:.0f} B per texture pair "
+                     f"({pbrify.format_bytes(scanned)} for {textures} pairs)")
+        lines.append(f"    plans and scan results: {(scanned - index) / textures:.0f} B per pair")
+        lines.append(f"    directory index and interpreter caches: {index / textures:.0f} B per pair")
+    finally:
+        pbrify.PATH_INDEX.listings.clear()
+        shutil.rmtree(root, ignore_errors=True)
+    return lines
+
+
+def bench_trivial(args: argparse.Namespace) -> list:
+    if pbrify.np is None:
+        return ["trivial: NumPy is not installed"]
+    root = Path(tempfile.mkdtemp(prefix='pbrify-bench-', dir=args.dir))
+    lines = [f"trivial: {args.textures} textures of {args.size}x{args.size} per format, half of them constant, "
+             f"in {root}"]
+    try:
+        for kind in ('rgba', 'bc1', 'bc3', 'bc5'):
+            paths = [root / kind / f'tex{i:04}.dds' for i in range(args.textures)]
+            for i, path in enumerate(paths):
+                write_bench_texture(path, args.size, kind, constant=i % 2 == 0)
+            # the low mip the detection decodes against the full texture
+            for max_size in (pbrify.TRIVIAL_ANALYSIS_SIZE, args.size):
+                start = time.perf_counter()
+                found = 0
+                for path in paths:
+                    pixels = pbrify.read_dds_pixels(path, max_size)
+                    if pixels is not None and pbrify.constant_colour(pixels, pbrify.DEFAULT_TRIVIAL_TOLERANCE):
+                        found += 1
+                elapsed = time.perf_counter() - start
+                lines.append(f"  {kind} at {min(max_size, args.size)} px: {len(paths) / elapsed:.0f} textures/s, "
+                             f"{len(paths) * args.size ** 2 / elapsed / 1_000_000:.0f} source megapixels/s, "
+                             f"{found} of {len(paths)} constant")
+        lines.append(f"  each constant pair saves about {pbrify.estimated_seconds(args.size ** 2):.2f}s of create_pbr.exe")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PBRify benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+    prefetch = commands.add_parser('prefetch', help="time to first inference with and without texture prefetch")
+    prefetch.add_argument('--mods', type=int, default=6)
+    prefetch.add_argument('--pairs', type=int, default=40)
+    prefetch.add_argument('--size', type=int, default=1024, help="texture width and height")
+    prefetch.add_argument('--delay', type=float, default=0.02, help="seconds of fake inference per texture")
+    prefetch.add_argument('--dir', help="where to create the library")
+    prefetch.set_defaults(run=bench_prefetch)
+    memory = commands.add_parser('memory', help="memory held per texture pair after scanning and planning")
+    memory.add_argument('--mods', type=int, default=20)
+    memory.add_argument('--pairs', type=int, default=2000, help="pairs per mod")
+    memory.add_argument('--per-folder', type=int, default=50, help="pairs per texture folder")
+    memory.add_argument('--dir', help="where to create the library")
+    memory.set_defaults(run=bench_memory)
+    trivial = commands.add_parser('trivial', help="throughput of the constant texture detection per DDS format")
+    trivial.add_argument('--textures', type=int, default=200, help="textures per format")
+    trivial.add_argument('--size', type=int, default=1024, help="texture width and height")
+    trivial.add_argument('--dir', help="where to create the textures")
+    trivial.set_defaults(run=bench_trivial)
+    args = parser.parse_args()
+
+    lines = args.run(args)
+    print("\n".join(lines))
+    with open(BENCH_OUTPUT_FILE_NAME, 'a', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == '__main__':
+    main()
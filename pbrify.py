@@ -6,15 +6,38 @@
 
 import sys
 import os
+import argparse
+import asyncio
+import locale
 import subprocess
 import re
 import logging
-import itertools
+import logging.handlers
+import queue
+import gzip
+import atexit
+import json
+import shutil
+import threading
+import hashlib
+import fnmatch
+import struct
+import time
+import signal
+import errno
+import socket
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, field, replace
 from typing import Optional
 from datetime import datetime
 
+try:
+    import numpy as np  # optional, only the detection of trivial textures needs it
+except ImportError:
+    np = None
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # PYSIDE6 IMPORTS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -24,9 +47,12 @@ try:
         QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
         QGridLayout, QLabel, QLineEdit, QPushButton, QComboBox,
         QProgressBar, QTextEdit, QGroupBox, QFileDialog, QMessageBox,
-        QStatusBar, QFrame, QSplitter, QSizePolicy
+        QStatusBar, QFrame, QSplitter, QSizePolicy, QCheckBox, QTableView,
+        QHeaderView, QAbstractItemView
+    )
+    from PySide6.QtCore import (
+        Qt, QThread, Signal, QObject, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
     )
-    from PySide6.QtCore import Qt, QThread, Signal, QObject
     from PySide6.QtGui import QFont, QIcon, QPalette, QColor
 except ImportError:
     print("PySide6 is required. Install it with: pip install PySide6")
@@ -38,7 +64,31 @@ except ImportError:
 
 PYTHON_MIN_VERSION = (3, 12)
 CONFIG_FILE_NAME = 'config.txt'
-LOG_FILE_NAME = 'pbrify_log.txt'
+LOG_DIR_NAME = 'logs'
+LOG_FILE_PREFIX = 'pbrify_log_'  # followed by the start time and process id of the run
+LOG_MAX_BYTES = 20 * 1024 * 1024  # per segment, older segments are gzipped
+LOG_BACKUP_COUNT = 5  # gzipped segments kept per run
+LOG_KEEP_RUNS = 20  # logs of older runs are deleted on startup
+QUEUE_FILE_NAME = 'pbrify_queue.json'
+QUEUE_JOURNAL_SUFFIX = '.journal'  # job changes since the queue file was last written, one JSON line each
+QUEUE_COMPACT_ENTRIES = 1000  # the journal is folded into the queue file once it has more lines than this or the jobs
+WORK_DIR_NAME = '.pbrify'  # bookkeeping folder inside the output directory
+DEDUP_INDEX_FILE_NAME = 'dedup_index.json'
+SIZE_HISTORY_FILE_NAME = 'size_history.json'
+STAGING_DIR_NAME = 'staging'
+COMMIT_DIR_NAME = 'committing'  # copies from the scratch directory on their way in
+MANIFEST_FILE_NAME = 'pbrify_manifest.json'  # inside each '<Mod> PBR' folder
+QUARANTINE_FILE_NAME = 'pbrify_quarantine.txt'  # inside each '<Mod> PBR' folder
+
+SCAN_STATUS_NEW = 'New'
+SCAN_STATUS_PARTIAL = 'Partial'  # some pairs are overridden or already covered
+SCAN_STATUS_UPDATE = 'Update'    # converted before, textures changed since
+SCAN_REPORT_INTERVAL = 0.1  # seconds between progress updates of a background scan
+
+# Level create_pbr.exe output is logged at. The per-mod log in each output folder always has all of it.
+CHILD_LOG_LEVELS = {'off': 0, 'debug': logging.DEBUG, 'info': logging.INFO}
+ALLOWED_CHILD_LOG_LEVELS = list(CHILD_LOG_LEVELS)
+DEFAULT_CHILD_LOG_LEVEL = 'debug'
 
 ALLOWED_CHECKPOINTS = ['s4', 's4_alt']
 DEFAULT_CHECKPOINT = 's4'
@@ -52,8 +102,93 @@ DEFAULT_TILE_SIZE = '1024'
 ALLOWED_NORMAL_SUFFIXES = ['n', 'norm', 'normal']
 ALLOWED_DIFFUSE_SUFFIXES = ['d', 'diff', 'diffuse']
 ALLOWED_GLOW_SUFFIXES = ['g', 'glow']
+DIFFUSE_NAME_SUFFIXES = [''] + [f'_{s}' for s in ALLOWED_DIFFUSE_SUFFIXES]  # in order of preference
 ALLOWED_SUFFIXES = ALLOWED_NORMAL_SUFFIXES + ALLOWED_DIFFUSE_SUFFIXES + ALLOWED_GLOW_SUFFIXES
 
+# Maps create_pbr.exe writes to textures/pbr for each pair: albedo, normal, roughness/metallic/AO/specular
+PBR_OUTPUT_MAP_SUFFIXES = ['', '_n', '_rmaos']
+
+JOB_STATE_QUEUED = 'queued'
+JOB_STATE_RUNNING = 'running'
+JOB_STATE_DONE = 'done'
+JOB_STATE_FAILED = 'failed'
+JOB_STATES = [JOB_STATE_QUEUED, JOB_STATE_RUNNING, JOB_STATE_DONE, JOB_STATE_FAILED]
+
+PRIORITY_HIGH = 'high'
+PRIORITY_NORMAL = 'normal'
+PRIORITY_LANES = [PRIORITY_HIGH, PRIORITY_NORMAL]  # claimed in this order
+
+# Rough output size per input pixel for all maps of a pair combined, mipmaps included.
+# Corrected at runtime by the ratio of actual to predicted sizes of previous runs.
+OUTPUT_BYTES_PER_PIXEL = {'dds': 4.0, 'png': 9.0}
+DISK_SPACE_RESERVE = 2 * 1024 ** 3  # never fill the output drive past this
+DISK_SPACE_POLL_SECONDS = 10
+
+DEFAULT_MAX_BISECT_RUNS = 12  # extra create_pbr.exe runs allowed to isolate failing textures of one mod
+
+# Watchdog for create_pbr.exe, in seconds. 0 disables a timeout.
+DEFAULT_NO_OUTPUT_TIMEOUT = 900
+DEFAULT_TEXTURE_TIMEOUT = 600
+TEXTURE_TIMEOUT_PER_MEGAPIXEL = 30  # added to the texture timeout for large textures
+
+DEFAULT_MAX_CONCURRENT_MODS = 1  # create_pbr.exe runs at the same time, each one loads the model
+CHILD_LINE_LIMIT = 1024 * 1024  # longest create_pbr.exe output line read as one line
+
+# Work sharing between machines through a shared job directory, in seconds
+DEFAULT_CLAIM_LEASE = 120  # a claim not touched for this long belongs to a dead node
+CLAIM_HEARTBEATS_PER_LEASE = 4
+
+# Directory listings made this soon after the directory changed are not trusted, as
+# filesystems with coarse mtimes would not show a second change in the same tick
+MTIME_RACY_WINDOW_NS = 2_000_000_000
+
+# Output verification
+MAX_TEXTURE_DIMENSION = 16384
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_END = b'\x00\x00\x00\x00IEND\xaeB`\x82'  # IEND chunk, the last 12 bytes of a complete PNG
+DDS_BLOCK_BYTES = {'DXT1': 8, 'ATI1': 8, 'BC4U': 8, 'BC4S': 8,
+                   'DXT2': 16, 'DXT3': 16, 'DXT4': 16, 'DXT5': 16, 'ATI2': 16, 'BC5U': 16, 'BC5S': 16}
+DXGI_BLOCK_BYTES = {**dict.fromkeys([70, 71, 72, 79, 80, 81], 8),  # BC1, BC4
+                    **dict.fromkeys([73, 74, 75, 76, 77, 78, 82, 83, 84, 94, 95, 96, 97, 98, 99], 16)}  # BC2, BC3, BC5-BC7
+
+# Page cache prefetch of upcoming mods
+DEFAULT_PREFETCH_BUDGET_MB = 1024
+PREFETCH_AHEAD_MODS = 2  # the mod prepared next and the one after it
+PREFETCH_CHUNK_SIZE = 1024 * 1024  # read size where posix_fadvise is missing
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+THREAD_MODE_BACKGROUND_END = 0x00020000
+
+# Texture policy
+LIST_SEPARATOR = '|'  # between globs and mod names in config.txt, it cannot appear in Windows file names
+ESTIMATED_SECONDS_PER_MEGAPIXEL = 0.75  # create_pbr.exe on a mid-range GPU, for dry run estimates
+
+# Metrics export for monitoring, e.g. node_exporter's textfile collector
+DEFAULT_METRICS_INTERVAL = 15  # seconds between writes
+METRICS_PREFIX = 'pbrify_'
+
+# Adaptive concurrency
+DEFAULT_MAX_CPU_LOAD = 85  # percent, the load average per CPU stands in for it on Linux and macOS
+DEFAULT_MIN_FREE_MEMORY_MB = 2048
+DEFAULT_USER_IDLE_SECONDS = 300  # input within this many seconds means someone is using the machine
+LOAD_CONTROL_INTERVAL = 5  # seconds between load samples
+LOAD_RAISE_FRACTION = 0.7  # another create_pbr.exe is allowed while the CPU load stays below this share of the maximum
+LOAD_RESUME_MARGIN = 1.25  # suspended processes resume once free memory is this far above the minimum
+TH32CS_SNAPPROCESS = 0x00000002
+PROCESS_SUSPEND_RESUME = 0x0800
+FOREGROUND_BUSY_STATES = (2, 3, 4)  # QUNS_BUSY, QUNS_RUNNING_D3D_FULL_SCREEN, QUNS_PRESENTATION_MODE
+
+# Trivial textures: pairs whose diffuse and normal maps are a single colour
+TRIVIAL_CONVERT = 'convert'
+TRIVIAL_SKIP = 'skip'
+TRIVIAL_SYNTHESIZE = 'synthesize'  # write constant PBR maps without create_pbr.exe
+ALLOWED_TRIVIAL_ACTIONS = [TRIVIAL_CONVERT, TRIVIAL_SKIP, TRIVIAL_SYNTHESIZE]
+DEFAULT_TRIVIAL_TOLERANCE = 4  # largest spread of a channel, out of 255, that still counts as constant
+TRIVIAL_ANALYSIS_SIZE = 64  # largest side of the mip that is decoded
+TRIVIAL_OUTPUT_SIZE = 256  # largest side of synthesized maps
+TRIVIAL_RMAOS = (204, 0, 255, 10)  # roughness 0.8, not metallic, no occlusion, specular 0.04
+TRIVIAL_DDS_FORMATS = {'DXT1': 'bc1', 'DXT4': 'bc3', 'DXT5': 'bc3', 'ATI2': 'bc5', 'BC5U': 'bc5'}
+TRIVIAL_DXGI_FORMATS = {71: 'bc1', 72: 'bc1', 77: 'bc3', 78: 'bc3', 83: 'bc5'}
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # PHOTOSHOP-LIKE DARK THEME STYLESHEET
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -232,6 +367,27 @@ QTextEdit {
     selection-background-color: #264f78;
 }
 
+/* Table (Scan Results) */
+QTableView {
+    background-color: #1e1e1e;
+    alternate-background-color: #252526;
+    border: 1px solid #4a4a4a;
+    border-radius: 4px;
+    color: #d4d4d4;
+    gridline-color: #3c3c3c;
+    font-size: 11px;
+    selection-background-color: #264f78;
+}
+
+QHeaderView::section {
+    background-color: #2d2d2d;
+    color: #cccccc;
+    border: none;
+    border-right: 1px solid #3c3c3c;
+    border-bottom: 1px solid #3c3c3c;
+    padding: 4px 6px;
+}
+
 /* Status Bar */
 QStatusBar {
     background-color: #007acc;
@@ -322,19 +478,50 @@ class QTextEditHandler(logging.Handler):
         self.signals.message.emit(msg)
 
 
-def setup_logging(log_signals: Optional[LogSignals] = None) -> logging.Logger:
-    """Setup logging to file and optionally to a text widget."""
+def gzip_rotator(source: str, dest: str):
+    """Compress a full log segment and remove the original."""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def prune_run_logs(log_dir: Path, keep: int = LOG_KEEP_RUNS):
+    """Delete the logs of all but the newest runs, segments included."""
+    runs = sorted({p.name.split('.', 1)[0] for p in log_dir.glob(f'{LOG_FILE_PREFIX}*')}, reverse=True)
+    for run in runs[keep:]:
+        for path in log_dir.glob(f'{run}.*'):
+            path.unlink(missing_ok=True)
+
+
+# Writes the records queued by the loggers of the running process
+log_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(log_signals: Optional[LogSignals] = None, console: bool = False) -> logging.Logger:
+    """Setup logging to a file of this run and optionally to a text widget or the console.
+    
+    Threads only put records on a queue. A listener thread formats them and
+    writes the file, which is rotated by size with older segments gzipped.
+    """
+    global log_listener
+    stop_logging()
     logger = logging.getLogger('PBRify')
     logger.setLevel(logging.DEBUG)
     logger.handlers.clear()
     
     # File handler
-    log_path = Path.cwd() / LOG_FILE_NAME
-    file_handler = logging.FileHandler(log_path, mode='w', encoding='utf-8')
+    log_dir = Path.cwd() / LOG_DIR_NAME
+    log_dir.mkdir(exist_ok=True)
+    prune_run_logs(log_dir, LOG_KEEP_RUNS - 1)
+    log_path = log_dir / f'{LOG_FILE_PREFIX}{datetime.now():%Y%m%d-%H%M%S}_{os.getpid()}.txt'
+    file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES,
+                                                        backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    file_handler.namer = lambda name: name + '.gz'
+    file_handler.rotator = gzip_rotator
     file_handler.setLevel(logging.DEBUG)
     file_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    handlers = [file_handler]
     
     # UI handler
     if log_signals:
@@ -342,10 +529,155 @@ def setup_logging(log_signals: Optional[LogSignals] = None) -> logging.Logger:
         ui_handler.setLevel(logging.INFO)
         ui_formatter = logging.Formatter('[%(levelname)s] %(message)s')
         ui_handler.setFormatter(ui_formatter)
-        logger.addHandler(ui_handler)
+        handlers.append(ui_handler)
     
+    # Console handler
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+        handlers.append(console_handler)
+    
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
     return logger
 
+
+def stop_logging():
+    """Write out the queued records and close the log file."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+
+atexit.register(stop_logging)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CASE-INSENSITIVE PATH INDEX
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class DirectoryListing:
+    """The entries of one directory, keyed by lowercased name."""
+    path: Path  # shared by everything that refers to the directory while the listing is current
+    key: tuple  # (st_dev, st_ino) of the directory
+    mtime_ns: int
+    listed_at: int  # time.time_ns() when the directory was listed
+    files: dict = field(default_factory=dict)  # lowercased name -> name
+    dirs: dict = field(default_factory=dict)  # lowercased name -> name
+    collisions: dict = field(default_factory=dict)  # lowercased name -> every name that folds to it
+
+
+class DirectoryIndex:
+    """Case-insensitive path lookups, cached per directory.
+    
+    A directory is listed once and looked up by lowercased name after that.
+    A listing stays valid while the directory's mtime is unchanged, which
+    every create, delete or rename inside it bumps. A listing made within
+    MTIME_RACY_WINDOW_NS of the directory's last change is listed again on
+    next use, as another change in the same mtime tick would go unseen.
+    
+    Names that only differ in case (possible on Linux) are recorded as
+    collisions. Lookups resolve to the first of them in sorted order.
+    """
+    
+    def __init__(self):
+        self.listings: dict[str, DirectoryListing] = {}
+        self.lock = threading.Lock()
+    
+    def listing(self, directory: Path) -> Optional[DirectoryListing]:
+        """Get the listing of a directory, listing it if the cached one is stale. None if it is not a directory."""
+        key = str(directory)
+        try:
+            st = os.stat(directory)
+        except OSError:
+            self.invalidate(directory)
+            return None
+        with self.lock:
+            cached = self.listings.get(key)
+        if (cached is not None and cached.mtime_ns == st.st_mtime_ns and
+                cached.listed_at - st.st_mtime_ns > MTIME_RACY_WINDOW_NS):
+            return cached
+        
+        listing = DirectoryListing(path=directory, key=(st.st_dev, st.st_ino), mtime_ns=st.st_mtime_ns,
+                                   listed_at=time.time_ns())
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            return None
+        for entry in entries:
+            folded = entry.name.lower()
+            if folded == entry.name:
+                folded = entry.name  # one string instead of two equal ones
+            known = listing.dirs.get(folded) or listing.files.get(folded)
+            if known is not None:
+                listing.collisions.setdefault(folded, [known]).append(entry.name)
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            (listing.dirs if is_dir else listing.files)[folded] = entry.name
+        with self.lock:
+            self.listings[key] = listing
+        return listing
+    
+    def invalidate(self, directory: Path):
+        with self.lock:
+            self.listings.pop(str(directory), None)
+    
+    def find_dir(self, directory: Path, name: str) -> Optional[Path]:
+        """Find a subdirectory by name, ignoring case."""
+        listing = self.listing(directory)
+        found = listing.dirs.get(name.lower()) if listing is not None else None
+        return directory / found if found is not None else None
+    
+    def find_file(self, directory: Path, name: str) -> Optional[Path]:
+        """Find a file by name, ignoring case."""
+        listing = self.listing(directory)
+        found = listing.files.get(name.lower()) if listing is not None else None
+        return directory / found if found is not None else None
+    
+    def find_dirs(self, directory: Path, name: str) -> list:
+        """Find every subdirectory whose name matches ignoring case."""
+        listing = self.listing(directory)
+        if listing is None or name.lower() not in listing.dirs:
+            return []
+        names = listing.collisions.get(name.lower(), [listing.dirs[name.lower()]])
+        return [directory / n for n in names if (directory / n).is_dir()]
+    
+    def walk(self, directory: Path, exclude: tuple = ()):
+        """Yield (directory, listing) for a directory and everything below it.
+        
+        Subdirectories of the top directory named in exclude (lowercased) are
+        skipped. Symlinked directories are entered once.
+        """
+        seen = set()
+        stack = [(directory, exclude)]
+        while stack:
+            current, skip = stack.pop()
+            listing = self.listing(current)
+            if listing is None or listing.key in seen:
+                continue
+            seen.add(listing.key)
+            yield listing.path, listing
+            stack.extend((listing.path / name, ()) for folded, name in sorted(listing.dirs.items(), reverse=True)
+                         if folded not in skip)
+    
+    def collisions(self, directory: Path) -> list:
+        """List (directory, names) of every case collision at or below a directory."""
+        return [(current, names) for current, listing in self.walk(directory)
+                for names in listing.collisions.values()]
+
+
+PATH_INDEX = DirectoryIndex()  # shared by scanning, planning, staging and sanitizing
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # UTILITY FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -353,7 +685,10 @@ def setup_logging(log_signals: Optional[LogSignals] = None) -> logging.Logger:
 # Regex patterns
 SUFFIX_CAPTURE_REGEX = re.compile(r'_(?P<suffix>[^_.]+)(\.dds)$', re.IGNORECASE)
 DIGITS_AT_END_REGEX = re.compile(r'(\d+)\s*$')
+SHARD_REGEX = re.compile(r'^(\d+)/(\d+)$')
 NORMAL_MAP_REGEX = re.compile(fr'_({'|'.join(ALLOWED_NORMAL_SUFFIXES)})$', re.IGNORECASE)
+# create_pbr.exe names a texture after these words, mod folders often have spaces so the path runs up to the last .dds
+DDS_PATH_REGEX = re.compile(r'''(?:Processing|Skipping)[:\s]+['"]?(.+\.dds)''', re.IGNORECASE)
 
 
 def fix_suffix_case(filename: str, allowed_suffixes: list) -> str:
@@ -371,51 +706,136 @@ def fix_suffix_case(filename: str, allowed_suffixes: list) -> str:
     return filename
 
 
-def has_textures_but_no_pbr(folder: Path) -> bool:
-    """Check if folder has a textures folder but no pbr folder."""
+def has_textures_but_no_pbr(folder: Path, allow_pbr: bool = False) -> bool:
+    """Check if folder has a textures folder but no pbr folder.
+    
+    With allow_pbr, a pbr folder does not disqualify the mod; its own PBR
+    textures are then excluded pair by pair through the coverage index.
+    """
     try:
-        textures_paths = [p for p in folder.iterdir() if p.is_dir() and p.name.lower() == 'textures']
+        textures_paths = PATH_INDEX.find_dirs(folder, 'textures')
         
         # if len < 1: there is no textures folder
         # if len > 1: there are multiple textures folders (only possible on case-sensitive file systems)
         if len(textures_paths) != 1:
             return False
         
-        pbr_paths = [p for p in textures_paths[0].iterdir() if p.is_dir() and p.name.lower() == 'pbr']
-        if len(pbr_paths) > 0:
+        pbr_paths = PATH_INDEX.find_dirs(textures_paths[0], 'pbr')
+        if len(pbr_paths) > 0 and not allow_pbr:
             return False
         
         return True
     except Exception:
         return False
 
+def iter_texture_pairs(mod_folder: Path):
+    """Yield the diffuse/normal pairs of a mod that create_pbr.exe would convert."""
+    textures_folder = PATH_INDEX.find_dir(mod_folder, 'textures')
+    if textures_folder is None:
+        return
+    # PBR textures have _n normals of their own, they are not inputs
+    for directory, listing in PATH_INDEX.walk(textures_folder, exclude=('pbr',)):
+        for folded, name in listing.files.items():
+            if not folded.endswith('.dds'):
+                continue
+            stem = name[:-4]
+            normal_stem_without_suffix = NORMAL_MAP_REGEX.sub('', stem)
+            if normal_stem_without_suffix == stem:
+                continue
+            base = normal_stem_without_suffix.lower()
+            found_diffuse = next((listing.files[f'{base}{suffix}.dds'] for suffix in DIFFUSE_NAME_SUFFIXES
+                                  if f'{base}{suffix}.dds' in listing.files), None)
+            if found_diffuse:
+                yield TexturePair(folder=directory, diffuse_name=found_diffuse, normal_name=name)
+
+
 def has_valid_pairs(mod_folder: Path) -> bool:
     """Check if the folder has valid diffuse/normal pairs to be processed."""
     try:
         if mod_folder is None or not mod_folder.is_dir():
             return False
-        textures_folder = next(mod_folder.glob('textures', case_sensitive=False), None)
-        if textures_folder is not None and textures_folder.is_dir():
-            normal_iter = itertools.chain(
-                textures_folder.rglob('*_n.dds', case_sensitive=False),
-                textures_folder.rglob('*_norm.dds', case_sensitive=False),
-                textures_folder.rglob('*_normal.dds', case_sensitive=False)
-            )
-            for normal in normal_iter:
-                if normal.is_file():
-                    normal_stem_without_suffix = NORMAL_MAP_REGEX.sub('', normal.stem)
-                    diffuse_iter = itertools.chain(
-                        normal.parent.glob(f'{normal_stem_without_suffix}.dds', case_sensitive=False),
-                        normal.parent.glob(f'{normal_stem_without_suffix}_d.dds', case_sensitive=False),
-                        normal.parent.glob(f'{normal_stem_without_suffix}_diff.dds', case_sensitive=False),
-                        normal.parent.glob(f'{normal_stem_without_suffix}_diffuse.dds', case_sensitive=False)
-                    )
-                    found_diffuse = next(diffuse_iter, None)
-                    if found_diffuse and found_diffuse.is_file():
-                        return True
-        return False
+        return next(iter_texture_pairs(mod_folder), None) is not None
     except Exception:
         return False
+
+
+def read_dds_header(path: Path) -> Optional[DDSInfo]:
+    """Read the dimensions and pixel format from a DDS header. Returns None if invalid."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(148)
+        if len(header) < 128 or header[:4] != b'DDS ':
+            return None
+        height, width = struct.unpack_from('<II', header, 12)
+        mip_count = struct.unpack_from('<I', header, 28)[0]
+        pf_flags = struct.unpack_from('<I', header, 80)[0]
+        fourcc = header[84:88].decode('ascii', errors='replace') if pf_flags & 0x4 else ''
+        bit_count = struct.unpack_from('<I', header, 88)[0]
+        dxgi_format = struct.unpack_from('<I', header, 128)[0] if fourcc == 'DX10' and len(header) >= 132 else 0
+        return DDSInfo(width=width, height=height, mip_count=max(mip_count, 1),
+                       fourcc=fourcc, bit_count=bit_count, dxgi_format=dxgi_format)
+    except Exception:
+        return None
+
+
+def directory_size(path: Path) -> int:
+    """Get the total size of all files below a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def kill_process_tree(process):
+    """Kill a child process (subprocess or asyncio) together with every process it started."""
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        else:
+            # the child leads its own session, see run_create_pbr
+            os.killpg(process.pid, signal.SIGKILL)
+    except Exception:
+        pass
+    try:
+        process.kill()
+    except Exception:
+        pass
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count as a human readable string."""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds: float) -> str:
+    """Format a number of seconds as e.g. '1h 2m 3s'."""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}s"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    else:
+        return f"{seconds}s"
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Get the BLAKE2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
                 
 
 
@@ -423,6 +843,98 @@ def has_valid_pairs(mod_folder: Path) -> bool:
 # DATA CLASSES
 # ═══════════════════════════════════════════════════════════════════════════════
 
+@dataclass(slots=True)
+class TexturePair:
+    """A diffuse texture and its matching normal map.
+    
+    Libraries can hold millions of pairs, so a pair only keeps the folder of
+    its maps, shared with every other pair in it, and the two file names. The
+    paths are built when asked for. The DDS dimensions are read on first use.
+    """
+    folder: Path
+    diffuse_name: str
+    normal_name: str
+    width: int = field(default=-1, compare=False)  # -1 until read, 0 without a usable DDS header
+    height: int = field(default=-1, compare=False)
+    
+    @property
+    def diffuse(self) -> Path:
+        return self.folder / self.diffuse_name
+    
+    @property
+    def normal(self) -> Path:
+        return self.folder / self.normal_name
+    
+    @property
+    def pixels(self) -> int:
+        """Pixel count of the diffuse map, or of the normal map if the diffuse map has no usable header."""
+        if self.width < 0:
+            info = read_dds_header(self.diffuse) or read_dds_header(self.normal)
+            self.width, self.height = (info.width, info.height) if info is not None else (0, 0)
+        return self.width * self.height
+
+
+@dataclass
+class ModPlan:
+    """The texture pairs of a mod that will actually be converted."""
+    mod_path: Path
+    pairs: list
+    total_pairs: int = 0
+    overridden_pairs: int = 0  # lose the MO2 overwrite order
+    covered_pairs: int = 0     # already have PBR textures somewhere in the library
+    update: bool = False       # the output folder exists and is brought up to date
+    current_pairs: int = 0     # unchanged since the last conversion
+    removed_keys: list = field(default_factory=list)
+    stale_outputs: list = field(default_factory=list)
+    filtered: dict = field(default_factory=dict)  # texture policy filter: (pairs, pixels) it removed
+    trivial: list = field(default_factory=list)  # (pair, diffuse colour, normal colour) to synthesize
+    has_pbr_dir: bool = False  # the mod ships PBR textures of its own
+    
+    @property
+    def filtered_pairs(self) -> int:
+        return sum(pairs for pairs, _ in self.filtered.values())
+    
+    @property
+    def is_partial(self) -> bool:
+        """True if only some of the mod's pairs are converted, which requires staging."""
+        return len(self.pairs) < self.total_pairs
+    
+    @property
+    def needs_staging(self) -> bool:
+        """True if create_pbr.exe must not see the whole mod: some pairs are left out or it has a pbr folder."""
+        return self.is_partial or self.has_pbr_dir
+    
+    @property
+    def has_work(self) -> bool:
+        return len(self.pairs) > 0 or len(self.trivial) > 0 or len(self.stale_outputs) > 0
+
+
+@dataclass(slots=True)
+class ScanResult:
+    """One mod found by a scan, as listed in the scan results table."""
+    mod_path: Path
+    textures: int        # pairs to convert
+    pixels: int          # of those pairs, as a measure of conversion cost
+    output_size: int     # predicted, in bytes
+    status: str
+    included: bool = True
+
+
+@dataclass
+class DDSInfo:
+    """The parts of a DDS header PBRify cares about."""
+    width: int
+    height: int
+    mip_count: int = 1
+    fourcc: str = ''
+    bit_count: int = 0
+    dxgi_format: int = 0
+    
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
 @dataclass
 class Settings:
     """Application settings."""
@@ -432,6 +944,39 @@ class Settings:
     checkpoint: str = DEFAULT_CHECKPOINT
     texture_format: str = DEFAULT_TEXTURE_FORMAT
     max_tile_size: str = DEFAULT_TILE_SIZE
+    deduplicate_outputs: bool = False
+    mo2_profile: Optional[Path] = None  # modlist.txt of the profile to follow
+    skip_covered_textures: bool = False
+    manifest_hashes: bool = False  # hash inputs so touched but unchanged files are not reconverted
+    max_bisect_runs: int = DEFAULT_MAX_BISECT_RUNS
+    no_output_timeout: int = DEFAULT_NO_OUTPUT_TIMEOUT
+    texture_timeout: int = DEFAULT_TEXTURE_TIMEOUT
+    max_concurrent_mods: int = DEFAULT_MAX_CONCURRENT_MODS
+    job_directory: Optional[Path] = None  # shared by every machine converting the same library
+    node_name: str = ''  # defaults to host name and process id
+    claim_lease: int = DEFAULT_CLAIM_LEASE
+    shard: str = ''  # static split 'i/N' of the mods between machines
+    prefetch_textures: bool = False  # read upcoming mods into the page cache, for libraries on hard drives
+    prefetch_budget_mb: int = DEFAULT_PREFETCH_BUDGET_MB
+    scratch_directory: Optional[Path] = None  # fast drive create_pbr.exe writes to before outputs are committed
+    metrics_file: Optional[Path] = None  # Prometheus text format, name it *.prom for the textfile collector
+    status_file: Optional[Path] = None  # JSON
+    metrics_interval: int = DEFAULT_METRICS_INTERVAL
+    variants: list = field(default_factory=list)  # 'checkpoint:format:tile' of a settings matrix, each into its own folders
+    min_texture_size: int = 0  # pairs with a side below this many pixels are not converted, 0 disables
+    max_texture_size: int = 0  # pairs with a side above this many pixels are not converted, 0 disables
+    include_globs: list = field(default_factory=list)  # if set, only pairs matching one of them are converted
+    exclude_globs: list = field(default_factory=list)  # e.g. textures/lod/**, interface/**
+    excluded_mods: list = field(default_factory=list)  # mod names or globs
+    child_log_level: str = DEFAULT_CHILD_LOG_LEVEL
+    adaptive_concurrency: bool = False  # run fewer create_pbr.exe processes, or suspend them, while the machine is busy
+    max_cpu_load: int = DEFAULT_MAX_CPU_LOAD
+    min_free_memory_mb: int = DEFAULT_MIN_FREE_MEMORY_MB
+    user_idle_seconds: int = DEFAULT_USER_IDLE_SECONDS  # only one process while someone is using the machine, 0 disables
+    pause_for_fullscreen: bool = True  # suspend while a game or presentation is in the foreground
+    trivial_textures: str = TRIVIAL_CONVERT  # what to do with pairs of constant maps, detecting them needs NumPy
+    trivial_tolerance: int = DEFAULT_TRIVIAL_TOLERANCE
+    variant: str = ''  # set on the copies made for one variant of a matrix, never saved
     
     def is_valid(self) -> bool:
         """Check if all required settings are valid."""
@@ -455,6 +1000,43 @@ class Settings:
                 f.write(f'checkpoint={self.checkpoint}\n')
                 f.write(f'texture_format={self.texture_format}\n')
                 f.write(f'max_tile_size={self.max_tile_size}\n')
+                f.write(f'deduplicate_outputs={str(self.deduplicate_outputs).lower()}\n')
+                if self.mo2_profile:
+                    f.write(f'mo2_profile={self.mo2_profile.resolve()}\n')
+                f.write(f'skip_covered_textures={str(self.skip_covered_textures).lower()}\n')
+                f.write(f'manifest_hashes={str(self.manifest_hashes).lower()}\n')
+                f.write(f'max_bisect_runs={self.max_bisect_runs}\n')
+                f.write(f'no_output_timeout={self.no_output_timeout}\n')
+                f.write(f'texture_timeout={self.texture_timeout}\n')
+                f.write(f'max_concurrent_mods={self.max_concurrent_mods}\n')
+                if self.job_directory:
+                    f.write(f'job_directory={self.job_directory.resolve()}\n')
+                f.write(f'node_name={self.node_name}\n')
+                f.write(f'claim_lease={self.claim_lease}\n')
+                f.write(f'shard={self.shard}\n')
+                f.write(f'prefetch_textures={str(self.prefetch_textures).lower()}\n')
+                f.write(f'prefetch_budget_mb={self.prefetch_budget_mb}\n')
+                if self.scratch_directory:
+                    f.write(f'scratch_directory={self.scratch_directory.resolve()}\n')
+                if self.metrics_file:
+                    f.write(f'metrics_file={self.metrics_file.resolve()}\n')
+                if self.status_file:
+                    f.write(f'status_file={self.status_file.resolve()}\n')
+                f.write(f'metrics_interval={self.metrics_interval}\n')
+                f.write(f'variants={",".join(self.variants)}\n')
+                f.write(f'min_texture_size={self.min_texture_size}\n')
+                f.write(f'max_texture_size={self.max_texture_size}\n')
+                f.write(f'include_globs={LIST_SEPARATOR.join(self.include_globs)}\n')
+                f.write(f'exclude_globs={LIST_SEPARATOR.join(self.exclude_globs)}\n')
+                f.write(f'excluded_mods={LIST_SEPARATOR.join(self.excluded_mods)}\n')
+                f.write(f'child_log_level={self.child_log_level}\n')
+                f.write(f'adaptive_concurrency={str(self.adaptive_concurrency).lower()}\n')
+                f.write(f'max_cpu_load={self.max_cpu_load}\n')
+                f.write(f'min_free_memory_mb={self.min_free_memory_mb}\n')
+                f.write(f'user_idle_seconds={self.user_idle_seconds}\n')
+                f.write(f'pause_for_fullscreen={str(self.pause_for_fullscreen).lower()}\n')
+                f.write(f'trivial_textures={self.trivial_textures}\n')
+                f.write(f'trivial_tolerance={self.trivial_tolerance}\n')
             return True
         except Exception:
             return False
@@ -500,11 +1082,119 @@ class Settings:
             
             if 'max_tile_size' in config and config['max_tile_size'] in ALLOWED_TILE_SIZES:
                 settings.max_tile_size = config['max_tile_size']
+            
+            if 'deduplicate_outputs' in config:
+                settings.deduplicate_outputs = config['deduplicate_outputs'].lower() == 'true'
+            
+            if 'mo2_profile' in config:
+                p = MO2Profile.find_modlist(Path(config['mo2_profile']))
+                if p is not None:
+                    settings.mo2_profile = p
+            
+            if 'skip_covered_textures' in config:
+                settings.skip_covered_textures = config['skip_covered_textures'].lower() == 'true'
+            
+            if 'manifest_hashes' in config:
+                settings.manifest_hashes = config['manifest_hashes'].lower() == 'true'
+            
+            if 'max_bisect_runs' in config and config['max_bisect_runs'].isdigit():
+                settings.max_bisect_runs = int(config['max_bisect_runs'])
+            
+            if 'no_output_timeout' in config and config['no_output_timeout'].isdigit():
+                settings.no_output_timeout = int(config['no_output_timeout'])
+            
+            if 'texture_timeout' in config and config['texture_timeout'].isdigit():
+                settings.texture_timeout = int(config['texture_timeout'])
+            
+            if 'max_concurrent_mods' in config and config['max_concurrent_mods'].isdigit():
+                settings.max_concurrent_mods = max(1, int(config['max_concurrent_mods']))
+            
+            if 'job_directory' in config:
+                p = Path(config['job_directory'])
+                if p.is_dir():
+                    settings.job_directory = p
+            
+            if 'node_name' in config:
+                settings.node_name = config['node_name']
+            
+            if 'claim_lease' in config and config['claim_lease'].isdigit():
+                settings.claim_lease = max(1, int(config['claim_lease']))
+            
+            if 'shard' in config and parse_shard(config['shard']) is not None:
+                settings.shard = config['shard']
+            
+            if 'prefetch_textures' in config:
+                settings.prefetch_textures = config['prefetch_textures'].lower() == 'true'
+            
+            if 'prefetch_budget_mb' in config and config['prefetch_budget_mb'].isdigit():
+                settings.prefetch_budget_mb = int(config['prefetch_budget_mb'])
+            
+            if 'scratch_directory' in config:
+                p = Path(config['scratch_directory'])
+                if p.is_dir():
+                    settings.scratch_directory = p
+            
+            if 'metrics_file' in config:
+                p = Path(config['metrics_file'])
+                if p.parent.is_dir():
+                    settings.metrics_file = p
+            
+            if 'status_file' in config:
+                p = Path(config['status_file'])
+                if p.parent.is_dir():
+                    settings.status_file = p
+            
+            if 'metrics_interval' in config and config['metrics_interval'].isdigit():
+                settings.metrics_interval = max(1, int(config['metrics_interval']))
+            
+            if 'variants' in config:
+                variants = [parse_variant(v) for v in config['variants'].split(',') if v.strip()]
+                settings.variants = [':'.join(v) for v in variants if v is not None]
+            
+            if 'min_texture_size' in config and config['min_texture_size'].isdigit():
+                settings.min_texture_size = int(config['min_texture_size'])
+            
+            if 'max_texture_size' in config and config['max_texture_size'].isdigit():
+                settings.max_texture_size = int(config['max_texture_size'])
+            
+            for key in ('include_globs', 'exclude_globs', 'excluded_mods'):
+                if key in config:
+                    setattr(settings, key, [v.strip() for v in config[key].split(LIST_SEPARATOR) if v.strip()])
+            
+            if 'child_log_level' in config and config['child_log_level'] in ALLOWED_CHILD_LOG_LEVELS:
+                settings.child_log_level = config['child_log_level']
+            
+            if 'adaptive_concurrency' in config:
+                settings.adaptive_concurrency = config['adaptive_concurrency'].lower() == 'true'
+            
+            if 'max_cpu_load' in config and config['max_cpu_load'].isdigit():
+                settings.max_cpu_load = max(1, int(config['max_cpu_load']))
+            
+            if 'min_free_memory_mb' in config and config['min_free_memory_mb'].isdigit():
+                settings.min_free_memory_mb = int(config['min_free_memory_mb'])
+            
+            if 'user_idle_seconds' in config and config['user_idle_seconds'].isdigit():
+                settings.user_idle_seconds = int(config['user_idle_seconds'])
+            
+            if 'pause_for_fullscreen' in config:
+                settings.pause_for_fullscreen = config['pause_for_fullscreen'].lower() == 'true'
+            
+            if 'trivial_textures' in config and config['trivial_textures'] in ALLOWED_TRIVIAL_ACTIONS:
+                settings.trivial_textures = config['trivial_textures']
+            
+            if 'trivial_tolerance' in config and config['trivial_tolerance'].isdigit():
+                settings.trivial_tolerance = int(config['trivial_tolerance'])
                 
         except Exception:
             pass
         
         return settings
+    
+    def for_variant(self, variant: str) -> Settings:
+        """Copy of these settings with one variant of the settings matrix applied."""
+        checkpoint, texture_format, max_tile_size = parse_variant(variant)
+        return replace(self, checkpoint=checkpoint, texture_format=texture_format, max_tile_size=max_tile_size,
+                       variants=[], variant=f'{checkpoint}:{texture_format}:{max_tile_size}')
 
 
 @dataclass
@@ -512,12 +1202,31 @@ class ProcessingStats:
     """Statistics for the processing run."""
     total_mods: int = 0
     processed_mods: int = 0
+    updated_mods: int = 0
     skipped_mods: int = 0
     failed_mods: int = 0
     total_textures: int = 0
     processed_textures: int = 0
     skipped_textures: int = 0
+    quarantined_textures: int = 0
+    hung_processes: int = 0
     renamed_files: int = 0
+    overridden_textures: int = 0
+    covered_textures: int = 0
+    filtered_textures: int = 0
+    trivial_textures: int = 0  # pairs of constant maps, skipped or synthesized
+    synthesized_textures: int = 0
+    case_collisions: int = 0
+    incomplete_textures: int = 0
+    idle_gaps: int = 0
+    idle_time: float = 0.0  # seconds between one create_pbr.exe exiting and the next starting
+    max_idle_gap: float = 0.0
+    scan_time: float = 0.0
+    first_conversion_time: Optional[float] = None  # seconds from the start of the run to the first conversion
+    written_bytes: int = 0  # output maps of converted textures
+    variant_costs: list = field(default_factory=list)  # VariantCost of each variant of a settings matrix
+    deduplicated_files: int = 0
+    reclaimed_bytes: int = 0
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     
@@ -525,12 +1234,31 @@ class ProcessingStats:
         """Reset all statistics."""
         self.total_mods = 0
         self.processed_mods = 0
+        self.updated_mods = 0
         self.skipped_mods = 0
         self.failed_mods = 0
         self.total_textures = 0
         self.processed_textures = 0
         self.skipped_textures = 0
+        self.quarantined_textures = 0
+        self.hung_processes = 0
         self.renamed_files = 0
+        self.overridden_textures = 0
+        self.covered_textures = 0
+        self.filtered_textures = 0
+        self.trivial_textures = 0
+        self.synthesized_textures = 0
+        self.case_collisions = 0
+        self.incomplete_textures = 0
+        self.idle_gaps = 0
+        self.idle_time = 0.0
+        self.max_idle_gap = 0.0
+        self.scan_time = 0.0
+        self.first_conversion_time = None
+        self.written_bytes = 0
+        self.variant_costs = []
+        self.deduplicated_files = 0
+        self.reclaimed_bytes = 0
         self.start_time = None
         self.end_time = None
     
@@ -539,16 +1267,7 @@ class ProcessingStats:
         if self.start_time is None:
             return "N/A"
         end = self.end_time or datetime.now()
-        delta = end - self.start_time
-        total_seconds = int(delta.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        if hours > 0:
-            return f"{hours}h {minutes}m {seconds}s"
-        elif minutes > 0:
-            return f"{minutes}m {seconds}s"
-        else:
-            return f"{seconds}s"
+        return format_duration((end - self.start_time).total_seconds())
     
     def get_summary(self) -> str:
         """Get a summary of the processing run."""
@@ -559,187 +1278,3189 @@ class ProcessingStats:
             f"Duration: {self.get_duration()}",
             f"Total mods found: {self.total_mods}",
             f"Mods processed: {self.processed_mods}",
+            f"Mods updated: {self.updated_mods}",
             f"Mods skipped: {self.skipped_mods}",
             f"Mods failed: {self.failed_mods}",
             f"Files renamed: {self.renamed_files}",
             f"Textures processed: {self.processed_textures}",
             f"Textures skipped: {self.skipped_textures}",
+            f"Textures quarantined: {self.quarantined_textures}",
+            f"Hung create_pbr.exe processes killed: {self.hung_processes}",
+            f"Textures overridden by other mods: {self.overridden_textures}",
+            f"Textures already covered by PBR assets: {self.covered_textures}",
+            f"Textures filtered out by the texture policy: {self.filtered_textures}",
+            f"Textures with constant maps: {self.trivial_textures} ({self.synthesized_textures} synthesized)",
+            f"Textures with missing or damaged outputs: {self.incomplete_textures}",
+            f"Case collisions found: {self.case_collisions}",
+            f"Idle time between create_pbr.exe runs: {self.idle_time:.1f}s over {self.idle_gaps} gaps "
+            f"(longest {self.max_idle_gap:.1f}s)",
+            f"Scan time: {self.scan_time:.1f}s, time to first conversion: "
+            + (f"{self.first_conversion_time:.1f}s" if self.first_conversion_time is not None else "N/A"),
+            f"Output written: {format_bytes(self.written_bytes)}",
+            *(cost.summary() for cost in self.variant_costs),
+            f"Duplicate outputs linked: {self.deduplicated_files} ({format_bytes(self.reclaimed_bytes)} reclaimed)",
             "═" * 50,
         ]
         return "\n".join(lines)
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# WORKER THREAD SIGNALS
+# JOB QUEUE
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class WorkerSignals(QObject):
-    """Signals for the processing worker thread."""
-    progress = Signal(int, int, str)  # current, total, mod_name
-    mod_progress = Signal(int, int)   # current, total
-    finished = Signal(object)         # ProcessingStats
-    error = Signal(str)
+@dataclass
+class Job:
+    """A single mod conversion job."""
+    mod_path: str
+    priority: str = PRIORITY_NORMAL
+    state: str = JOB_STATE_QUEUED
+    seq: int = 0
+    attempts: int = 0
+    error: str = ''
+    output_path: str = ''  # one per line for the variants of a settings matrix
+    queued_at: str = ''
+    started_at: str = ''
+    finished_at: str = ''
+    
+    @property
+    def mod_name(self) -> str:
+        return Path(self.mod_path).name
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# PROCESSOR WORKER THREAD
-# ═══════════════════════════════════════════════════════════════════════════════
 
-class ProcessorWorker(QThread):
-    """Worker thread for mod processing."""
+class JobQueue:
+    """Persistent, thread-safe queue of conversion jobs with priority lanes.
     
-    def __init__(self, settings: Settings, logger: logging.Logger):
-        super().__init__()
-        self.settings = settings
-        self.logger = logger
-        self.signals = WorkerSignals()
-        self.stats = ProcessingStats()
-        self.should_stop = False
-        self.current_process: Optional[subprocess.Popen] = None
+    Every state change is written to disk, so the queue survives the window
+    being closed or the worker being killed. Jobs left in the running state by
+    a previous session are requeued by recover().
     
-    def stop(self):
-        """Request to stop processing."""
-        self.should_stop = True
-        if self.current_process:
+    A change appends the jobs it touched to a journal next to the queue file,
+    so queuing thousands of mods does not rewrite the whole queue each time.
+    The journal is folded into the queue file once it grows past the number
+    of jobs.
+    """
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.journal_path = path.with_name(path.name + QUEUE_JOURNAL_SUFFIX) if path is not None else None
+        self.journal_entries = 0
+        self.lock = threading.Lock()
+        self.jobs: dict[str, Job] = {}
+        self.next_seq = 0
+        self.load()
+    
+    @staticmethod
+    def key(mod_path: Path) -> str:
+        return str(mod_path.resolve())
+    
+    def load(self):
+        """Load jobs from the queue file and replay its journal. A missing or corrupt file gives an empty queue."""
+        if self.path is None:
+            return
+        if self.path.is_file():
             try:
-                self.current_process.terminate()
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for entry in data.get('jobs', []):
+                    self.load_job(entry)
+            except Exception:
+                self.jobs.clear()
+        if self.journal_path.is_file():
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        self.journal_entries += 1
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # cut short when the last session was killed
+                        if entry.get('removed'):
+                            self.jobs.pop(entry.get('mod_path'), None)
+                        else:
+                            self.load_job(entry)
             except Exception:
                 pass
     
-    def get_mods_to_process(self) -> list:
-        """Get list of mods that need processing."""
-        mods = []
+    def load_job(self, entry: dict):
         try:
-            if (self.settings.mods_directory is None or
-                not self.settings.mods_directory.is_dir()
-                or self.settings.output_directory is None or
-                not self.settings.output_directory.is_dir()):
-                return []
-            
-            all_folders = [f for f in self.settings.mods_directory.iterdir() if f.is_dir()]
-            
-            for folder in all_folders:
-                if has_textures_but_no_pbr(folder):
-                    if has_valid_pairs(folder):
-                        output_path = self.settings.output_directory / f'{folder.name} PBR'
-                        if not output_path.exists():
-                            mods.append(folder)
-        except Exception as e:
-            self.logger.error(f"Error scanning mods directory: {e}")
-            return [] # in case of error, return empty list to avoid processing
-        return mods
+            job = Job(**entry)
+        except TypeError:
+            return
+        if job.state not in JOB_STATES or job.priority not in PRIORITY_LANES:
+            return
+        self.jobs[job.mod_path] = job
+        self.next_seq = max(self.next_seq, job.seq + 1)
     
-    def run(self):
-        """Main processing loop."""
-        self.should_stop = False
-        self.stats.reset()
-        self.stats.start_time = datetime.now()
+    def save(self):
+        """Atomically write the whole queue file and start a new journal. Must be called with the lock held."""
+        if self.path is None:
+            return
+        try:
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': [asdict(job) for job in self.jobs.values()]}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.journal_path.unlink(missing_ok=True)
+            self.journal_entries = 0
+        except Exception:
+            pass
+    
+    def record(self, jobs: list, removed: bool = False):
+        """Append changed or removed jobs to the journal. Must be called with the lock held."""
+        if self.path is None or not jobs:
+            return
+        if (self.journal_entries + len(jobs) > max(QUEUE_COMPACT_ENTRIES, len(self.jobs))
+                or not self.path.is_file()):
+            self.save()
+            return
+        try:
+            entries = [{'mod_path': job.mod_path, 'removed': True} if removed else asdict(job) for job in jobs]
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+            self.journal_entries += len(entries)
+        except Exception:
+            pass
+    
+    def recover(self) -> list:
+        """Requeue jobs that were running when the last session ended.
+        
+        Their partially written output is removed so the mod is not mistaken
+        for an already processed one. Returns the recovered jobs.
+        """
+        with self.lock:
+            recovered = [job for job in self.jobs.values() if job.state == JOB_STATE_RUNNING]
+            for job in recovered:
+                discard_partial_output(job)
+                job.state = JOB_STATE_QUEUED
+            self.record(recovered)
+            return recovered
+    
+    def enqueue(self, mod_path: Path, priority: str = PRIORITY_NORMAL) -> bool:
+        """Add a mod to the queue. Returns False if it is already queued or running.
+        
+        Queuing a mod that is already waiting in the normal lane with high priority
+        moves it to the high-priority lane.
+        """
+        return self.enqueue_many([mod_path], priority) == 1
+    
+    def enqueue_many(self, mod_paths, priority: str = PRIORITY_NORMAL) -> int:
+        """Add several mods to the queue with one write. Returns how many were queued or moved up."""
+        with self.lock:
+            changed = []
+            for mod_path in mod_paths:
+                key = self.key(mod_path)
+                job = self.jobs.get(key)
+                if job is not None and job.state == JOB_STATE_RUNNING:
+                    continue
+                if job is not None and job.state == JOB_STATE_QUEUED:
+                    if priority == PRIORITY_HIGH and job.priority != PRIORITY_HIGH:
+                        job.priority = PRIORITY_HIGH
+                        changed.append(job)
+                    continue
+                job = Job(
+                    mod_path=key,
+                    priority=priority,
+                    seq=self.next_seq,
+                    queued_at=datetime.now().isoformat(timespec='seconds'),
+                )
+                self.jobs[key] = job
+                self.next_seq += 1
+                changed.append(job)
+            self.record(changed)
+            return len(changed)
+    
+    def claim_next(self, lane: Optional[str] = None) -> Optional[Job]:
+        """Mark the next queued job as running and return it.
         
+        If lane is None, the high-priority lane is drained before the normal lane.
+        """
+        with self.lock:
+            lanes = PRIORITY_LANES if lane is None else [lane]
+            for priority in lanes:
+                queued = [j for j in self.jobs.values() if j.state == JOB_STATE_QUEUED and j.priority == priority]
+                if queued:
+                    job = min(queued, key=lambda j: j.seq)
+                    job.state = JOB_STATE_RUNNING
+                    job.attempts += 1
+                    job.error = ''
+                    job.started_at = datetime.now().isoformat(timespec='seconds')
+                    self.record([job])
+                    return job
+            return None
+    
+    def update(self, job: Job):
+        """Persist changes made to a running job (e.g. its output path)."""
+        with self.lock:
+            self.record([job])
+    
+    def finish(self, job: Job, success: bool, error: str = ''):
+        """Mark a running job as done or failed."""
+        with self.lock:
+            job.state = JOB_STATE_DONE if success else JOB_STATE_FAILED
+            job.error = error
+            job.finished_at = datetime.now().isoformat(timespec='seconds')
+            self.record([job])
+    
+    def release(self, job: Job):
+        """Put an interrupted job back into the queue, discarding its partial output."""
+        with self.lock:
+            discard_partial_output(job)
+            job.state = JOB_STATE_QUEUED
+            job.started_at = ''
+            self.record([job])
+    
+    def clear_finished(self):
+        """Forget done and failed jobs."""
+        with self.lock:
+            self.jobs = {k: j for k, j in self.jobs.items() if j.state in (JOB_STATE_QUEUED, JOB_STATE_RUNNING)}
+            self.save()
+    
+    def remove(self, job: Job):
+        """Forget a job, e.g. one another node has claimed."""
+        with self.lock:
+            self.jobs.pop(job.mod_path, None)
+            self.record([job], removed=True)
+    
+    def pending_paths(self, lane: Optional[str] = None) -> list:
+        """Get the mod paths of queued jobs, in the order they would be claimed."""
+        with self.lock:
+            lanes = PRIORITY_LANES if lane is None else [lane]
+            queued = [j for j in self.jobs.values() if j.state == JOB_STATE_QUEUED and j.priority in lanes]
+            queued.sort(key=lambda j: (lanes.index(j.priority), j.seq))
+            return [Path(j.mod_path) for j in queued]
+    
+    def pending_count(self, lane: Optional[str] = None) -> int:
+        return len(self.pending_paths(lane))
+
+
+def discard_partial_output(job: Job):
+    """Remove the output folders of an interrupted job, if it created any."""
+    for path in job.output_path.splitlines():
         try:
-            mods = self.get_mods_to_process()
-            self.stats.total_mods = len(mods)
-            
-            if len(mods) == 0:
-                self.logger.info("No mods to process.")
-                self.stats.end_time = datetime.now()
-                self.signals.finished.emit(self.stats)
-                return
-            
-            self.logger.info(f"Found {len(mods)} mods to process.")
-            
-            for i, mod_path in enumerate(mods):
-                if self.should_stop:
-                    self.logger.warning("Processing stopped by user.")
-                    break
-                
-                self.signals.progress.emit(i + 1, len(mods), mod_path.name)
-                
-                success = self.process_mod(mod_path)
+            output_path = Path(path)
+            if output_path.is_dir():
+                shutil.rmtree(output_path)
+        except Exception:
+            pass
+    job.output_path = ''
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SHARED JOB DIRECTORY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def parse_shard(shard: str) -> Optional[tuple]:
+    """Parse a static shard 'i/N' (1 <= i <= N) into (i, N). Returns None if invalid."""
+    match = SHARD_REGEX.match(shard.strip())
+    if match is None:
+        return None
+    index, count = int(match.group(1)), int(match.group(2))
+    return (index, count) if 1 <= index <= count else None
+
+
+def mod_key(mod_name: str) -> str:
+    """Key of a mod that is the same on every node, whatever the share is mounted as."""
+    return hashlib.blake2b(mod_name.lower().encode('utf-8'), digest_size=10).hexdigest()
+
+
+def in_shard(mod_name: str, shard: str) -> bool:
+    """Check if a mod belongs to a static shard. An empty or invalid shard holds every mod."""
+    parsed = parse_shard(shard) if shard else None
+    if parsed is None:
+        return True
+    index, count = parsed
+    return int(mod_key(mod_name), 16) % count == index - 1
+
+
+class SharedJobDirectory:
+    """Claims on mods, shared by several PBRify instances through a common folder.
+    
+    A node claims a mod by exclusively creating claims/<key>.lock and keeps
+    the claim alive by touching it. A claim that has not been touched for
+    the lease time belongs to a dead node: the first node to rename it away
+    takes the mod over. Ages are measured against the node's own heartbeat
+    file in nodes/, so the clocks of the machines do not need to agree.
+    
+    Another node may create the new lock between the rename and the taking
+    node's own attempt, so the expired claim is left next to the lock as
+    <key>.lock.<node>.expired and collected by whichever node ends up
+    holding the lock.
+    """
+    
+    def __init__(self, path: Path, node: str = '', lease: int = DEFAULT_CLAIM_LEASE):
+        self.path = path
+        self.node = node or f'{socket.gethostname()}-{os.getpid()}'
+        self.lease = lease
+        self.claims_path = path / 'claims'
+        self.nodes_path = path / 'nodes'
+        self.held: dict[str, Path] = {}  # mod name -> lock file
+        self.lock = threading.Lock()
+        os.makedirs(self.claims_path, exist_ok=True)
+        os.makedirs(self.nodes_path, exist_ok=True)
+    
+    def lock_path(self, mod_name: str) -> Path:
+        return self.claims_path / f'{mod_key(mod_name)}.lock'
+    
+    def now(self) -> float:
+        """Touch this node's heartbeat file and return its mtime, the clock of the share."""
+        node_path = self.nodes_path / self.node
+        node_path.touch()
+        return node_path.stat().st_mtime
+    
+    @staticmethod
+    def read_claim(lock_path: Path) -> dict:
+        try:
+            with open(lock_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}  # gone, or created but not written yet
+    
+    def claim(self, mod_name: str) -> Optional[dict]:
+        """Try to claim a mod.
+        
+        Returns None if a live node holds it. Otherwise returns the expired
+        claim that was taken over, or an empty dict if there was none.
+        """
+        lock_path = self.lock_path(mod_name)
+        claim = {
+            'mod': mod_name,
+            'node': self.node,
+            'claimed_at': datetime.now().isoformat(timespec='seconds'),
+            'created_output': False,
+        }
+        for _ in range(3):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = self.now() - lock_path.stat().st_mtime
+                except FileNotFoundError:
+                    continue  # released in the meantime
+                if age <= self.lease:
+                    return None
                 
-                if success:
-                    self.stats.processed_mods += 1
-                elif self.should_stop:
-                    break
-                else:
-                    self.stats.failed_mods += 1
-                    
+                # Renaming is atomic, so only one node takes over an expired claim
+                expired_path = lock_path.with_name(f'{lock_path.name}.{self.node}.expired')
+                try:
+                    os.rename(lock_path, expired_path)
+                except OSError:
+                    continue
+                try:
+                    moved_age = self.now() - expired_path.stat().st_mtime
+                except FileNotFoundError:
+                    continue  # another node already holds the new lock and collected it
+                if moved_age <= self.lease:
+                    # another node took it over first and we moved its fresh claim, put it back
+                    try:
+                        os.link(expired_path, lock_path)
+                    except OSError:
+                        pass
+                    expired_path.unlink(missing_ok=True)
+                    return None
+                continue  # the expired claim stays until a node holds the lock
+            
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(claim, f)
+            with self.lock:
+                self.held[mod_name] = lock_path
+            return self.collect_expired(lock_path)
+        return None
+    
+    def expired_paths(self, lock_path: Path) -> list:
+        """Get the expired claims renamed away from a lock by nodes taking its mod over."""
+        prefix = lock_path.name + '.'
+        try:
+            return [self.claims_path / name for name in os.listdir(self.claims_path)
+                    if name.startswith(prefix) and name.endswith('.expired')]
+        except OSError:
+            return []
+    
+    def collect_expired(self, lock_path: Path) -> dict:
+        """Take the expired claims of a lock this node now holds. Returns them merged, or {} if there were none."""
+        expired = {}
+        for expired_path in self.expired_paths(lock_path):
+            try:
+                stale = self.now() - expired_path.stat().st_mtime > self.lease
+            except FileNotFoundError:
+                continue
+            # a fresh one is a live claim a node moved by mistake and is putting back
+            if stale:
+                claim = self.read_claim(expired_path)
+                if claim:
+                    claim['created_output'] = claim.get('created_output', False) or expired.get('created_output', False)
+                    expired = claim
+                expired_path.unlink(missing_ok=True)
+        return expired
+    
+    def is_abandoned(self, mod_name: str) -> bool:
+        """Check if a dead node left a claim and a partial output of a mod behind."""
+        lock_path = self.lock_path(mod_name)
+        # a node that died while taking the mod over leaves the expired claim without a lock
+        for path in [lock_path] + self.expired_paths(lock_path):
+            try:
+                age = self.now() - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age > self.lease and self.read_claim(path).get('created_output', False):
+                return True
+        return False
+    
+    def owns(self, lock_path: Path) -> bool:
+        return self.read_claim(lock_path).get('node') == self.node
+    
+    def mark_output_created(self, mod_name: str):
+        """Note in the claim that this node created the mod's output folder.
+        
+        If the node dies, whoever takes the mod over removes the partial output.
+        """
+        lock_path = self.lock_path(mod_name)
+        claim = self.read_claim(lock_path)
+        if claim.get('node') != self.node:
+            return
+        claim['created_output'] = True
+        tmp_path = lock_path.with_name(f'{lock_path.name}.{self.node}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(claim, f)
+        os.replace(tmp_path, lock_path)
+    
+    def heartbeat(self) -> list:
+        """Touch every held claim. Returns the mods whose claims were lost to other nodes."""
+        self.now()
+        lost = []
+        with self.lock:
+            for mod_name, lock_path in list(self.held.items()):
+                try:
+                    if not self.owns(lock_path):
+                        raise FileNotFoundError(lock_path)
+                    os.utime(lock_path)
+                except OSError:
+                    lost.append(mod_name)
+                    del self.held[mod_name]
+        return lost
+    
+    def release(self, mod_name: str):
+        """Give up the claim on a mod."""
+        with self.lock:
+            lock_path = self.held.pop(mod_name, None)
+        if lock_path is not None and self.owns(lock_path):
+            lock_path.unlink(missing_ok=True)
+    
+    def release_all(self):
+        with self.lock:
+            held = list(self.held.values())
+            self.held.clear()
+        for lock_path in held:
+            if self.owns(lock_path):
+                lock_path.unlink(missing_ok=True)
+        (self.nodes_path / self.node).unlink(missing_ok=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# OUTPUT MANIFESTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def conversion_settings(settings: Settings) -> dict:
+    """The settings that affect create_pbr.exe's output."""
+    return {
+        'checkpoint': settings.checkpoint,
+        'texture_format': settings.texture_format,
+        'max_tile_size': settings.max_tile_size,
+    }
+
+
+def pair_key(mod_path: Path, pair: TexturePair) -> str:
+    """Identify a pair by its normal map path relative to the mod, case-insensitively."""
+    return pair.normal.relative_to(mod_path).as_posix().lower()
+
+
+def pbr_output_paths(mod_path: Path, pair: TexturePair, texture_format: str) -> list:
+    """Get the output paths create_pbr.exe writes for a pair, relative to the output folder."""
+    parts = pair.normal.relative_to(mod_path).parts
+    base = NORMAL_MAP_REGEX.sub('', pair.normal.stem)
+    folder = Path('textures', 'pbr', *parts[1:-1])
+    return [(folder / f'{base}{suffix}.{texture_format}').as_posix() for suffix in PBR_OUTPUT_MAP_SUFFIXES]
+
+
+def file_record(path: Path, with_hash: bool = False) -> dict:
+    st = path.stat()
+    record = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if with_hash:
+        record['hash'] = hash_file(path)
+    return record
+
+
+class OutputManifest:
+    """Record of the inputs and settings that produced a '<Mod> PBR' folder.
+    
+    Each converted pair is stored under its key with the size, mtime and
+    optionally the hash of its diffuse and normal maps, the settings it was
+    converted with and the output files it produced.
+    """
+    
+    def __init__(self, output_path: Path):
+        self.path = output_path / MANIFEST_FILE_NAME
+        self.entries: dict[str, dict] = {}
+    
+    @classmethod
+    def load(cls, output_path: Path) -> Optional[OutputManifest]:
+        """Load the manifest of an output folder. Returns None if it has none."""
+        manifest = cls(output_path)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                manifest.entries = json.load(f).get('pairs', {})
+            return manifest
+        except Exception:
+            return None
+    
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'pairs': self.entries}, f, indent=1)
+        os.replace(tmp_path, self.path)
+    
+    def record(self, mod_path: Path, pair: TexturePair, settings: Settings, output_path: Path,
+               synthesized: bool = False):
+        """Store a freshly converted pair along with the outputs that exist for it."""
+        outputs = [rel for rel in pbr_output_paths(mod_path, pair, settings.texture_format)
+                   if (output_path / rel).is_file()]
+        self.entries[pair_key(mod_path, pair)] = {
+            'diffuse': file_record(pair.diffuse, settings.manifest_hashes),
+            'normal': file_record(pair.normal, settings.manifest_hashes),
+            'settings': conversion_settings(settings),
+            'outputs': outputs,
+        }
+        if synthesized:
+            self.entries[pair_key(mod_path, pair)]['synthesized'] = True
+    
+    def record_quarantined(self, mod_path: Path, pair: TexturePair, settings: Settings):
+        """Store a pair that create_pbr.exe fails on, so it is only retried once it changes."""
+        self.entries[pair_key(mod_path, pair)] = {
+            'diffuse': file_record(pair.diffuse, settings.manifest_hashes),
+            'normal': file_record(pair.normal, settings.manifest_hashes),
+            'settings': conversion_settings(settings),
+            'outputs': [],
+            'quarantined': True,
+        }
+    
+    def is_current(self, mod_path: Path, pair: TexturePair, settings: Settings) -> bool:
+        """Check if a pair was converted from identical inputs with the same settings."""
+        entry = self.entries.get(pair_key(mod_path, pair))
+        if entry is None or entry.get('settings') != conversion_settings(settings):
+            return False
+        if entry.get('synthesized') and settings.trivial_textures != TRIVIAL_SYNTHESIZE:
+            return False  # create_pbr.exe is wanted for it now
+        for path, old in ((pair.diffuse, entry['diffuse']), (pair.normal, entry['normal'])):
+            try:
+                new = file_record(path)
+            except OSError:
+                return False
+            if new == {'size': old['size'], 'mtime_ns': old['mtime_ns']}:
+                continue
+            # a touched file with the same content does not need converting again
+            if 'hash' not in old or new['size'] != old['size'] or hash_file(path) != old['hash']:
+                return False
+        return True
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# OUTPUT VERIFICATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def read_png_header(path: Path) -> Optional[tuple]:
+    """Read (width, height) from a PNG's IHDR chunk. Returns None if invalid."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(24)
+        if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+            return None
+        return struct.unpack_from('>II', header, 16)
+    except Exception:
+        return None
+
+
+def dds_data_size(info: DDSInfo) -> Optional[int]:
+    """Get the size of a DDS texture's pixel data, all mips included. None for unknown formats."""
+    block_bytes = DDS_BLOCK_BYTES.get(info.fourcc) or DXGI_BLOCK_BYTES.get(info.dxgi_format)
+    if block_bytes is None and (info.fourcc or info.bit_count % 8):
+        return None
+    size = 0
+    width, height = info.width, info.height
+    for _ in range(info.mip_count):
+        if block_bytes is not None:
+            size += max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_bytes
+        else:
+            size += width * height * info.bit_count // 8
+        width, height = max(1, width // 2), max(1, height // 2)
+    return size
+
+
+def verify_output_file(path: Path) -> str:
+    """Check an output texture for damage. Returns a description of the problem, or '' if it is fine."""
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return "missing"
+    if size == 0:
+        return "empty"
+    
+    if path.suffix.lower() == '.png':
+        dimensions = read_png_header(path)
+        if dimensions is None:
+            return "invalid PNG header"
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-len(PNG_END), os.SEEK_END)
+                if f.read() != PNG_END:
+                    return "truncated"
+        except OSError:
+            return "unreadable"
+    else:
+        info = read_dds_header(path)
+        if info is None:
+            return "invalid DDS header"
+        dimensions = (info.width, info.height)
+        data_size = dds_data_size(info)
+        header_size = 148 if info.fourcc == 'DX10' else 128
+        if data_size is not None and size < header_size + data_size:
+            return f"truncated ({size} of {header_size + data_size} bytes)"
+    
+    width, height = dimensions
+    if not (0 < width <= MAX_TEXTURE_DIMENSION and 0 < height <= MAX_TEXTURE_DIMENSION):
+        return f"bad dimensions {width}x{height}"
+    return ''
+
+
+def verify_pair_outputs(mod_path: Path, output_path: Path, pair: TexturePair, texture_format: str) -> list:
+    """Check every output map of a pair. Returns the problems found as 'path: problem' strings."""
+    problems = []
+    for rel in pbr_output_paths(mod_path, pair, texture_format):
+        problem = verify_output_file(output_path / rel)
+        if problem:
+            problems.append(f"{rel}: {problem}")
+    return problems
+
+
+def verify_outputs(mod_path: Path, output_path: Path, pairs: list, texture_format: str,
+                   max_workers: Optional[int] = None) -> list:
+    """Check the outputs of many pairs in a thread pool. Returns (pair, problems) for every pair with gaps."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda pair: verify_pair_outputs(mod_path, output_path, pair, texture_format), pairs)
+        return [(pair, problems) for pair, problems in zip(pairs, results) if problems]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCRATCH OUTPUT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def move_file(source: Path, target: Path):
+    """Move a file over another one, so target always holds either the old or the new file in full.
+
+    Across filesystems the file is copied next to target first and renamed from there.
+    """
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        tmp_path = target.with_name(target.name + '.tmp')
+        try:
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        source.unlink()
+
+
+def commit_output(scratch_path: Path, final_path: Path, commit_path: Path) -> bool:
+    """Move a finished output folder from the scratch directory to its final location.
+
+    A new folder is renamed into place in one step. Across filesystems it is
+    copied to commit_path first, which has to be on the drive of final_path,
+    and renamed from there. If final_path exists (an update), the files are
+    moved into it one at a time instead. Returns whether the data was copied.
+    """
+    if final_path.exists():
+        copied = False
+        for source in sorted(p for p in scratch_path.rglob('*') if p.is_file()):
+            target = final_path / source.relative_to(scratch_path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            copied |= source.stat().st_dev != target.parent.stat().st_dev
+            move_file(source, target)
+        shutil.rmtree(scratch_path)
+        return copied
+
+    try:
+        os.rename(scratch_path, final_path)
+        return False
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    if commit_path.exists():
+        shutil.rmtree(commit_path)  # left behind by an interrupted commit
+    commit_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        shutil.copytree(scratch_path, commit_path)
+        os.rename(commit_path, final_path)
+    except BaseException:
+        shutil.rmtree(commit_path, ignore_errors=True)
+        raise
+    shutil.rmtree(scratch_path)
+    return True
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# OUTPUT DEDUPLICATION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class DedupResult:
+    """Result of an output deduplication pass."""
+    files_scanned: int = 0
+    files_hashed: int = 0
+    files_linked: int = 0
+    bytes_reclaimed: int = 0
+
+
+def deduplicate_outputs(output_directory: Path, logger: logging.Logger,
+                        max_workers: Optional[int] = None) -> DedupResult:
+    """Replace identical files in the output directory with hardlinks.
+    
+    Only files that share their size with another file on the same volume are
+    hashed, and hashes are cached in an index keyed by size and mtime, so a
+    rerun only hashes outputs that are new or changed since the last pass.
+    """
+    result = DedupResult()
+    work_dir = output_directory / WORK_DIR_NAME
+    index_path = work_dir / DEDUP_INDEX_FILE_NAME
+    
+    # Load the hash cache from the previous pass
+    index = {}
+    try:
+        if index_path.is_file():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+    except Exception:
+        index = {}
+    
+    # Collect every output file, grouped by (volume, size)
+    groups: dict[tuple, list] = {}
+    for root, dirs, files in os.walk(output_directory):
+        if Path(root) == output_directory and WORK_DIR_NAME in dirs:
+            dirs.remove(WORK_DIR_NAME)
+        for name in files:
+            path = Path(root) / name
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if st.st_size == 0:
+                continue
+            result.files_scanned += 1
+            groups.setdefault((st.st_dev, st.st_size), []).append((path, st))
+    
+    # Files that already share an inode are one file, only hash one path per inode
+    to_hash = {}
+    hashes = {}
+    new_index = {}
+    for (dev, size), entries in groups.items():
+        if len({st.st_ino for _, st in entries}) < 2:
+            continue
+        for path, st in entries:
+            rel = path.relative_to(output_directory).as_posix()
+            cached = index.get(rel)
+            if cached and cached.get('size') == st.st_size and cached.get('mtime_ns') == st.st_mtime_ns:
+                hashes[path] = cached['hash']
+            elif (dev, st.st_ino) not in to_hash:
+                to_hash[(dev, st.st_ino)] = path
+    
+    # Hash in parallel, hashlib releases the GIL on large buffers
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+        inode_paths = list(to_hash.items())
+        digests = executor.map(lambda item: _hash_or_none(item[1]), inode_paths)
+        inode_hashes = {}
+        for (inode, path), digest in zip(inode_paths, digests):
+            if digest is not None:
+                inode_hashes[inode] = digest
+                result.files_hashed += 1
+    for (dev, size), entries in groups.items():
+        for path, st in entries:
+            if path not in hashes and (dev, st.st_ino) in inode_hashes:
+                hashes[path] = inode_hashes[(dev, st.st_ino)]
+    
+    # Link duplicates to the first copy of each content
+    for (dev, size), entries in groups.items():
+        by_hash: dict[str, list] = {}
+        for path, st in sorted(entries, key=lambda e: str(e[0])):
+            if path in hashes:
+                by_hash.setdefault(hashes[path], []).append((path, st))
+        for digest, copies in by_hash.items():
+            canonical, canonical_st = copies[0]
+            # links to an inode from outside this group keep its data alive
+            seen_links: dict[int, int] = {}
+            for _, st in copies:
+                seen_links[st.st_ino] = seen_links.get(st.st_ino, 0) + 1
+            for path, st in copies[1:]:
+                if st.st_ino == canonical_st.st_ino:
+                    continue
+                tmp_path = path.with_name(path.name + '.pbrify-link')
+                try:
+                    os.link(canonical, tmp_path)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    # e.g. the filesystem's hardlink limit was reached, continue from this copy
+                    logger.debug(f"Could not hardlink {path}: {e}")
+                    try:
+                        tmp_path.unlink(missing_ok=True)
+                    except OSError:
+                        pass
+                    canonical, canonical_st = path, st
+                    continue
+                result.files_linked += 1
+                seen_links[st.st_ino] -= 1
+                if seen_links[st.st_ino] == 0 and st.st_nlink == sum(1 for _, s in copies if s.st_ino == st.st_ino):
+                    result.bytes_reclaimed += size
+    
+    # Save the hash cache with fresh stats (linking changes a path's mtime)
+    for path, digest in hashes.items():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        new_index[path.relative_to(output_directory).as_posix()] = {
+            'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': digest
+        }
+    try:
+        work_dir.mkdir(exist_ok=True)
+        tmp_path = index_path.with_name(index_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(new_index, f)
+        os.replace(tmp_path, index_path)
+    except Exception as e:
+        logger.warning(f"Could not save deduplication index: {e}")
+    
+    return result
+
+
+def _hash_or_none(path: Path) -> Optional[str]:
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MOD ORGANIZER 2 PROFILES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MO2Profile:
+    """Enabled mods and texture overwrite order of a Mod Organizer 2 profile.
+    
+    modlist.txt lists mods from highest to lowest priority. Enabled mods are
+    prefixed with '+', disabled ones with '-' and unmanaged ones with '*'.
+    """
+    
+    def __init__(self, modlist_path: Path):
+        self.modlist_path = modlist_path
+        self.enabled_mods: list[str] = []  # lowest priority first
+        self.winners: Optional[dict[str, str]] = None
+        
+        with open(modlist_path, 'r', encoding='utf-8-sig') as f:
+            lines = f.readlines()
+        for line in reversed(lines):
+            line = line.strip()
+            if line.startswith('+') and len(line) > 1:
+                self.enabled_mods.append(line[1:])
+        self.enabled_lookup = {name.lower() for name in self.enabled_mods}
+    
+    @staticmethod
+    def find_modlist(path: Path) -> Optional[Path]:
+        """Accept either a modlist.txt or the profile folder containing it."""
+        if path.is_file() and path.name.lower() == 'modlist.txt':
+            return path
+        if path.is_dir():
+            return next((p for p in path.iterdir() if p.is_file() and p.name.lower() == 'modlist.txt'), None)
+        return None
+    
+    def is_enabled(self, mod_name: str) -> bool:
+        return mod_name.lower() in self.enabled_lookup
+    
+    def build_winners(self, mods_directory: Path):
+        """Resolve which mod provides each texture file in the virtual file system.
+        
+        Mods are applied from lowest to highest priority, so the last mod to
+        provide a path wins. The overwrite folder next to the mods directory
+        wins over every mod.
+        """
+        winners = {}
+        sources = [(name, mods_directory / name) for name in self.enabled_mods]
+        sources.append(('overwrite', mods_directory.parent / 'overwrite'))
+        for mod_name, mod_path in sources:
+            textures_folder = PATH_INDEX.find_dir(mod_path, 'textures')
+            if textures_folder is None:
+                continue
+            for directory, listing in PATH_INDEX.walk(textures_folder):
+                rel_root = directory.relative_to(mod_path).as_posix().lower()
+                for folded in listing.files:
+                    if folded.endswith('.dds'):
+                        winners[f'{rel_root}/{folded}'] = mod_name
+        self.winners = winners
+    
+    def is_winner(self, mod_path: Path, texture_path: Path) -> bool:
+        """Check if a mod's copy of a texture is the one the game will load."""
+        if self.winners is None:
+            return True
+        rel = texture_path.relative_to(mod_path).as_posix().lower()
+        return self.winners.get(rel, mod_path.name) == mod_path.name
+
+
+def stage_texture_pairs(mod_path: Path, pairs: list, staging_path: Path) -> int:
+    """Mirror the given pairs into a staging folder that create_pbr.exe can use as input.
+    
+    Files are hardlinked where possible and copied otherwise. Glow maps that
+    belong to a pair are staged with it. Returns the number of staged files.
+    """
+    if staging_path.exists():
+        shutil.rmtree(staging_path)
+    staged = 0
+    for pair in pairs:
+        base = NORMAL_MAP_REGEX.sub('', pair.normal.stem)
+        glow_maps = [p for suffix in ALLOWED_GLOW_SUFFIXES
+                     if (p := PATH_INDEX.find_file(pair.folder, f'{base}_{suffix}.dds')) is not None]
+        for source in [pair.diffuse, pair.normal] + glow_maps:
+            target = staging_path / source.relative_to(mod_path)
+            if target.exists():
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            staged += 1
+    return staged
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PBR COVERAGE INDEX
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class PBRCoverageIndex:
+    """Library-wide index of textures that already have PBR versions.
+    
+    Holds the lowercased paths of every file below a textures/pbr folder,
+    relative to that folder, from all mods and all previous outputs.
+    """
+    
+    def __init__(self):
+        self.paths: set[str] = set()
+    
+    def add_mod(self, mod_path: Path):
+        """Index the textures/pbr tree of a mod or output folder, if it has one."""
+        textures_folder = PATH_INDEX.find_dir(mod_path, 'textures')
+        if textures_folder is None:
+            return
+        pbr_folder = PATH_INDEX.find_dir(textures_folder, 'pbr')
+        if pbr_folder is None:
+            return
+        for directory, listing in PATH_INDEX.walk(pbr_folder):
+            rel_root = directory.relative_to(pbr_folder).as_posix().lower()
+            prefix = '' if rel_root == '.' else rel_root + '/'
+            for folded in listing.files:
+                self.paths.add(prefix + folded)
+    
+    def build(self, mods_directory: Path, output_directory: Path):
+        for parent in (mods_directory, output_directory):
+            for folder in parent.iterdir():
+                if folder.is_dir() and folder.name != WORK_DIR_NAME:
+                    self.add_mod(folder)
+    
+    def covers(self, mod_path: Path, pair: TexturePair) -> bool:
+        """Check if a PBR texture exists for a pair, keyed by the pair's base name."""
+        # parts[0] is the textures folder itself
+        parts = pair.normal.relative_to(mod_path).parts
+        base = NORMAL_MAP_REGEX.sub('', pair.normal.stem).lower()
+        prefix = ''.join(part.lower() + '/' for part in parts[1:-1])
+        return f'{prefix}{base}.dds' in self.paths or f'{prefix}{base}.png' in self.paths
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRIVIAL TEXTURES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def decode_bc1(blocks, four_colour: bool = False):
+    """Decode BC1 blocks, an (n, 8) uint8 array, to (n * 16, 4) RGBA pixels in block order."""
+    endpoints = np.ascontiguousarray(blocks[:, :4]).view('<u2').astype(np.int32)  # (n, 2) RGB565
+    colours = np.stack([(endpoints >> 11 & 31) * 255 // 31, (endpoints >> 5 & 63) * 255 // 63,
+                        (endpoints & 31) * 255 // 31, np.full_like(endpoints, 255)], axis=2)
+    c0, c1 = colours[:, 0], colours[:, 1]
+    palette = np.stack([c0, c1, (2 * c0 + c1) // 3, (c0 + 2 * c1) // 3], axis=1)
+    if not four_colour:
+        # c0 <= c1 selects three colours and transparent black
+        three = endpoints[:, 0] <= endpoints[:, 1]
+        palette[three, 2] = (c0[three] + c1[three]) // 2
+        palette[three, 3] = 0
+    indices = np.ascontiguousarray(blocks[:, 4:8]).view('<u4') >> (2 * np.arange(16, dtype=np.uint32)) & 3
+    return palette[np.arange(len(blocks))[:, None], indices].reshape(-1, 4)
+
+
+def decode_bc4(blocks):
+    """Decode BC4 blocks (the alpha of BC3, each half of BC5), an (n, 8) uint8 array, to n * 16 values."""
+    a0, a1 = blocks[:, 0:1].astype(np.int32), blocks[:, 1:2].astype(np.int32)
+    seven = np.arange(1, 7)
+    five = np.arange(1, 5)
+    eight_values = ((7 - seven) * a0 + seven * a1) // 7
+    six_values = np.concatenate([((5 - five) * a0 + five * a1) // 5, np.zeros_like(a0), np.full_like(a0, 255)], axis=1)
+    palette = np.concatenate([a0, a1, np.where(a0 > a1, eight_values, six_values)], axis=1)
+    bits = np.zeros((len(blocks), 8), np.uint8)
+    bits[:, :6] = blocks[:, 2:8]  # 16 indices of 3 bits
+    indices = bits.view('<u8') >> (3 * np.arange(16, dtype=np.uint64)) & 7
+    return palette[np.arange(len(blocks))[:, None], indices.astype(np.intp)].reshape(-1)
+
+
+def decode_masked(data: bytes, bit_count: int, masks: tuple):
+    """Decode uncompressed pixels with 8 to 32 bits and channel masks to (n, 4) RGBA pixels."""
+    if bit_count == 32:
+        values = np.frombuffer(data, '<u4')
+    else:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, bit_count // 8)
+        values = np.zeros(len(raw), np.uint32)
+        for i in range(raw.shape[1]):
+            values |= raw[:, i].astype(np.uint32) << (8 * i)
+    channels = []
+    for mask, missing in zip(masks, (0, 0, 0, 255)):
+        if mask == 0:
+            channels.append(np.full(len(values), missing, np.uint32))
+            continue
+        shift = (mask & -mask).bit_length() - 1
+        width = (mask >> shift).bit_length()
+        channel = values >> shift & (mask >> shift)
+        channels.append(channel if width == 8 else channel * 255 // ((1 << width) - 1))
+    return np.stack(channels, axis=1)
+
+
+def read_dds_pixels(path: Path, max_size: int = TRIVIAL_ANALYSIS_SIZE):
+    """Decode the largest mip of a DDS texture that fits in max_size to an (n, 4) uint8 array of RGBA.
+    
+    Handles uncompressed textures, BC1, BC3 and BC5. Block compressed pixels
+    come out in block order, which is all a check for constant colour needs.
+    BC5 holds the X and Y of a normal map, Z is reconstructed. Returns None
+    for other formats and damaged files.
+    """
+    info = read_dds_header(path)
+    if info is None or info.width == 0 or info.height == 0 or dds_data_size(info) is None:
+        return None
+    kind = TRIVIAL_DDS_FORMATS.get(info.fourcc) or TRIVIAL_DXGI_FORMATS.get(info.dxgi_format)
+    if kind is None and (info.fourcc or info.bit_count not in (8, 16, 24, 32)):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(128)
+            # a small mip is enough to tell, but not one smaller than a block
+            level, width, height = 0, info.width, info.height
+            while level + 1 < info.mip_count and max(width, height) > max_size and min(width, height) >= 8:
+                level, width, height = level + 1, max(1, width // 2), max(1, height // 2)
+            f.seek((148 if info.fourcc == 'DX10' else 128) + dds_data_size(replace(info, mip_count=level)))
+            size = dds_data_size(replace(info, width=width, height=height, mip_count=1))
+            data = f.read(size)
+        if len(data) < size:
+            return None
+        
+        if kind is None:
+            pf_flags = struct.unpack_from('<I', header, 80)[0]
+            masks = struct.unpack_from('<IIII', header, 92)
+            if not pf_flags & 0x1:  # DDPF_ALPHAPIXELS
+                masks = masks[:3] + (0,)
+            pixels = decode_masked(data, info.bit_count, masks)
+        else:
+            blocks = np.frombuffer(data, np.uint8).reshape(-1, 8 if kind == 'bc1' else 16)
+            if kind == 'bc1':
+                pixels = decode_bc1(blocks)
+            elif kind == 'bc3':
+                pixels = decode_bc1(blocks[:, 8:], four_colour=True)
+                pixels[:, 3] = decode_bc4(blocks[:, :8])
+            else:
+                x, y = decode_bc4(blocks[:, :8]), decode_bc4(blocks[:, 8:])
+                z = np.sqrt(np.clip(1 - (x / 127.5 - 1) ** 2 - (y / 127.5 - 1) ** 2, 0, 1))
+                pixels = np.stack([x, y, np.rint(z * 127.5 + 127.5).astype(np.int32), np.full_like(x, 255)], axis=1)
+        return pixels.astype(np.uint8)
+    except Exception:
+        return None
+
+
+def constant_colour(pixels, tolerance: int) -> Optional[tuple]:
+    """Get the RGBA of pixels whose channels all stay within tolerance, or None."""
+    if len(pixels) == 0:
+        return None
+    channels = np.ascontiguousarray(pixels.T)  # reducing contiguous rows is much faster than columns
+    low, high = channels.min(axis=1).astype(np.int32), channels.max(axis=1).astype(np.int32)
+    if int((high - low).max()) > tolerance:
+        return None
+    return tuple(int(c) for c in (low + high + 1) // 2)
+
+
+def write_constant_dds(path: Path, width: int, height: int, rgba: tuple):
+    """Write an uncompressed 32-bit DDS of a single colour with a full mip chain."""
+    mips = max(width, height).bit_length()
+    header = bytearray(128)
+    header[:4] = b'DDS '
+    # caps, height, width, pitch, pixel format and mip count
+    struct.pack_into('<IIIIIII', header, 4, 124, 0x2100F, height, width, width * 4, 0, mips)
+    struct.pack_into('<IIIIIIII', header, 76, 32, 0x41, 0, 32, 0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000)
+    struct.pack_into('<I', header, 108, 0x401008)  # texture, mipmap, complex
+    pixel = bytes((rgba[2], rgba[1], rgba[0], rgba[3]))
+    with open(path, 'wb') as f:
+        f.write(header)
+        for _ in range(mips):
+            f.write(pixel * (width * height))
+            width, height = max(1, width // 2), max(1, height // 2)
+
+
+def write_constant_png(path: Path, width: int, height: int, rgba: tuple):
+    """Write an RGBA PNG of a single colour."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    row = b'\x00' + bytes(rgba) * width
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(row * height)))
+        f.write(chunk(b'IEND', b''))
+
+
+def synthesize_pair_outputs(mod_path: Path, output_path: Path, pair: TexturePair, diffuse_colour: tuple,
+                            normal_colour: tuple, texture_format: str):
+    """Write the maps create_pbr.exe would produce for a pair whose diffuse and normal maps are constant.
+    
+    The colours are kept as they are, the RMAOS map gets TRIVIAL_RMAOS. The
+    maps are at most TRIVIAL_OUTPUT_SIZE wide, a constant needs no detail.
+    """
+    width, height = (pair.width, pair.height) if pair.pixels else (TRIVIAL_OUTPUT_SIZE, TRIVIAL_OUTPUT_SIZE)
+    scale = max(1, max(width, height) / TRIVIAL_OUTPUT_SIZE)
+    width, height = max(1, int(width / scale)), max(1, int(height / scale))
+    write = write_constant_png if texture_format == 'png' else write_constant_dds
+    for rel, colour in zip(pbr_output_paths(mod_path, pair, texture_format),
+                           (diffuse_colour, normal_colour, TRIVIAL_RMAOS)):
+        target = output_path / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        write(target, width, height, colour)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TEXTURE POLICY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+FILTER_EXCLUDED_MOD = 'excluded mods'
+FILTER_EXCLUDE_GLOB = 'exclude globs'
+FILTER_INCLUDE_GLOB = 'not matching include globs'
+FILTER_TOO_SMALL = 'below the minimum size'
+FILTER_TOO_LARGE = 'above the maximum size'
+FILTER_TRIVIAL = 'constant textures'
+
+
+def glob_matches(rel_path: str, patterns: list) -> bool:
+    """Check if a lowercased posix path matches one of the given globs, ignoring case."""
+    return any(fnmatch.fnmatchcase(rel_path, pattern.replace('\\', '/').lower()) for pattern in patterns)
+
+
+class TexturePolicy:
+    """Which mods and texture pairs the user wants converted at all.
+    
+    Globs are matched against the path of a pair's diffuse texture, both
+    relative to the mod (textures/lod/x.dds) and relative to its textures
+    folder (lod/x.dds). '*' matches across folders, so textures/lod/** and
+    textures/lod/* are the same. Sizes are read from the DDS headers; pairs
+    without a usable header are kept. Pairs whose diffuse and normal maps are
+    both a single colour are trivial, they are found by decoding a small mip.
+    """
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+    
+    @property
+    def active(self) -> bool:
+        s = self.settings
+        return bool(s.min_texture_size or s.max_texture_size or s.include_globs or s.exclude_globs
+                    or self.detects_trivial)
+    
+    @property
+    def detects_trivial(self) -> bool:
+        return np is not None and self.settings.trivial_textures != TRIVIAL_CONVERT
+    
+    def excludes_mod(self, mod_name: str) -> bool:
+        return glob_matches(mod_name.lower(), self.settings.excluded_mods)
+    
+    def filter(self, mod_path: Path, pair: TexturePair) -> Optional[str]:
+        """Get the first filter that removes a pair, or None to convert it."""
+        s = self.settings
+        if s.include_globs or s.exclude_globs:
+            rel_path = pair.diffuse.relative_to(mod_path).as_posix().lower()
+            paths = (rel_path, rel_path.partition('/')[2])
+            if any(glob_matches(path, s.exclude_globs) for path in paths):
+                return FILTER_EXCLUDE_GLOB
+            if s.include_globs and not any(glob_matches(path, s.include_globs) for path in paths):
+                return FILTER_INCLUDE_GLOB
+        if (s.min_texture_size or s.max_texture_size) and pair.pixels:
+            if s.min_texture_size and min(pair.width, pair.height) < s.min_texture_size:
+                return FILTER_TOO_SMALL
+            if s.max_texture_size and max(pair.width, pair.height) > s.max_texture_size:
+                return FILTER_TOO_LARGE
+        return None
+    
+    def trivial_colours(self, pair: TexturePair) -> Optional[tuple]:
+        """Get the (diffuse, normal) colours of a pair whose maps are both constant, or None."""
+        colours = []
+        for path in (pair.diffuse, pair.normal):  # most diffuse maps are not constant, so the normal is rarely read
+            pixels = read_dds_pixels(path)
+            colour = constant_colour(pixels, self.settings.trivial_tolerance) if pixels is not None else None
+            if colour is None:
+                return None
+            colours.append(colour)
+        return tuple(colours)
+
+
+def estimated_seconds(pixels: int) -> float:
+    """Rough create_pbr.exe time for the given number of pixels."""
+    return pixels / 1_000_000 * ESTIMATED_SECONDS_PER_MEGAPIXEL
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TEXTURE PREFETCH
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def set_background_io(enabled: bool):
+    """Lower (or restore) the I/O priority of the calling thread. Only has an effect on Windows."""
+    if os.name != 'nt':
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        mode = THREAD_MODE_BACKGROUND_BEGIN if enabled else THREAD_MODE_BACKGROUND_END
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), mode)
+    except Exception:
+        pass
+
+
+def read_ahead(path: Path, should_stop=lambda: False):
+    """Pull a file into the page cache.
+    
+    Where posix_fadvise exists this is a WILLNEED hint: the kernel reads the
+    file in the background and the call returns at once. Elsewhere the file
+    is read sequentially and thrown away, in chunks, so it can be abandoned.
+    """
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        return
+    buffer = bytearray(PREFETCH_CHUNK_SIZE)
+    with open(path, 'rb', buffering=0) as f:
+        while not should_stop() and f.readinto(buffer):
+            pass
+
+
+class TexturePrefetcher:
+    """Warms the page cache with the input textures of upcoming mods.
+    
+    Bytes prefetched for a mod count against the budget until the mod starts
+    converting, so prefetching never runs more than the budget ahead of
+    create_pbr.exe and cannot push the running mod's textures out of memory.
+    """
+    
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.outstanding: dict[str, int] = {}  # mod path -> bytes prefetched for it
+        self.resume: dict[str, int] = {}  # mod path -> files requested before the budget ran out
+        self.started: set = set()  # mods consumed while a prefetch was running, which must not add them back
+        self.running = 0  # prefetch calls in progress
+        self.lock = threading.Lock()
+        self.stopped = False
+    
+    def prefetch(self, mods: list) -> int:
+        """Prefetch the textures of (mod_path, pairs) in order. Pairs may be None to find them here.
+        
+        Returns the number of bytes requested.
+        """
+        total = 0
+        with self.lock:
+            self.running += 1
+        set_background_io(True)
+        try:
+            for mod_path, pairs in mods:
+                key = str(mod_path)
+                with self.lock:
+                    if key in self.started or (key in self.outstanding and key not in self.resume):
+                        continue  # converting, or already prefetched
+                    self.outstanding.setdefault(key, 0)
+                    start = self.resume.pop(key, 0)
+                if pairs is None:
+                    pairs = list(iter_texture_pairs(mod_path))
+                paths = [p for pair in pairs for p in (pair.normal, pair.diffuse)]
+                for index in range(start, len(paths)):
+                    if self.stopped:
+                        return total
+                    path = paths[index]
+                    try:
+                        size = path.stat().st_size
+                        with self.lock:
+                            if key not in self.outstanding:
+                                break  # create_pbr.exe is reading it already
+                            if sum(self.outstanding.values()) + size > self.budget:
+                                self.resume[key] = index  # continued once converting mods free some budget
+                                return total
+                            self.outstanding[key] += size
+                        read_ahead(path, lambda: self.stopped)
+                        total += size
+                    except OSError:
+                        pass
+        finally:
+            set_background_io(False)
+            with self.lock:
+                self.running -= 1
+                if self.running == 0:
+                    self.started.clear()
+        return total
+    
+    def consumed(self, mod_path: Path):
+        """Return a mod's share of the budget once create_pbr.exe is reading its textures."""
+        with self.lock:
+            self.outstanding.pop(str(mod_path), None)
+            self.resume.pop(str(mod_path), None)
+            if self.running:
+                self.started.add(str(mod_path))
+    
+    def stop(self):
+        self.stopped = True
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DISK SPACE PREDICTION
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SizeHistory:
+    """Correction factors for output size predictions, learned from past runs.
+    
+    For each texture format the ratio of actual to predicted output size is kept
+    as an exponential moving average and applied to future predictions.
+    """
+    
+    SMOOTHING = 0.3
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.ratios: dict[str, dict] = {}
+        try:
+            if path is not None and path.is_file():
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.ratios = json.load(f)
+        except Exception:
+            self.ratios = {}
+    
+    def ratio(self, texture_format: str) -> float:
+        with self.lock:
+            return self.ratios.get(texture_format, {}).get('ratio', 1.0)
+    
+    def record(self, texture_format: str, predicted: int, actual: int):
+        """Update the correction factor with a finished mod's real output size."""
+        if predicted <= 0 or actual <= 0:
+            return
+        with self.lock:
+            entry = self.ratios.setdefault(texture_format, {'ratio': 1.0, 'samples': 0})
+            # predicted already includes the old ratio, undo it to get the raw ratio
+            raw_ratio = actual / (predicted / entry['ratio'])
+            if entry['samples'] == 0:
+                entry['ratio'] = raw_ratio
+            else:
+                entry['ratio'] += self.SMOOTHING * (raw_ratio - entry['ratio'])
+            entry['samples'] += 1
+            if self.path is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(self.path.name + '.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.ratios, f, indent=1)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                pass
+
+
+def estimate_pair_output_size(pair: TexturePair, texture_format: str) -> int:
+    """Estimate the output size of one pair from the diffuse texture's dimensions."""
+    if pair.pixels:
+        return int(pair.pixels * OUTPUT_BYTES_PER_PIXEL.get(texture_format, 4.0))
+    # no usable header, fall back to the size of the inputs
+    try:
+        return 2 * (pair.diffuse.stat().st_size + pair.normal.stat().st_size)
+    except OSError:
+        return 0
+
+
+def predict_output_size(pairs: list, texture_format: str, history: Optional[SizeHistory] = None) -> int:
+    """Predict the size of the PBR output of the given pairs in bytes."""
+    total = sum(estimate_pair_output_size(pair, texture_format) for pair in pairs)
+    if history is not None:
+        total = int(total * history.ratio(texture_format))
+    return total
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SETTINGS MATRIX
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def parse_variant(variant: str) -> Optional[tuple]:
+    """Parse a variant 'checkpoint:format:tile' into (checkpoint, format, tile). Returns None if invalid."""
+    parts = tuple(part.strip() for part in variant.split(':'))
+    if len(parts) != 3:
+        return None
+    checkpoint, texture_format, max_tile_size = parts
+    if (checkpoint not in ALLOWED_CHECKPOINTS or texture_format not in ALLOWED_TEXTURE_FORMATS or
+            max_tile_size not in ALLOWED_TILE_SIZES):
+        return None
+    return parts
+
+
+@dataclass
+class VariantCost:
+    """What one variant of a settings matrix took over a run."""
+    variant: str
+    mods: int = 0
+    failed_mods: int = 0
+    textures: int = 0
+    seconds: float = 0.0  # converting, verification and retries included
+    written_bytes: int = 0
+    
+    def summary(self) -> str:
+        per_texture = f"{self.seconds / self.textures:.2f}s" if self.textures else "N/A"
+        return (f"Variant {self.variant}: {self.mods} mods, {self.textures} textures in {self.seconds:.1f}s "
+                f"({per_texture} per texture), {format_bytes(self.written_bytes)} written, "
+                f"{self.failed_mods} mods failed")
+
+
+class VariantLogger(logging.LoggerAdapter):
+    """Prefixes the messages of a variant's engine with the variant."""
+    
+    def process(self, msg, kwargs):
+        return f"[{self.extra['variant']}] {msg}", kwargs
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# METRICS EXPORT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class Metric:
+    """One counter or gauge."""
+    name: str
+    kind: str  # 'counter' or 'gauge'
+    help: str
+    value: float = 0
+
+
+class MetricsRegistry:
+    """Counters and gauges by name, rendered in the Prometheus text format or as a dict."""
+    
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+    
+    def counter(self, name: str, help: str, value: float):
+        self.metrics[name] = Metric(METRICS_PREFIX + name, 'counter', help, value)
+    
+    def gauge(self, name: str, help: str, value: float):
+        self.metrics[name] = Metric(METRICS_PREFIX + name, 'gauge', help, value)
+    
+    def to_prometheus(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.append(f"{metric.name} {metric.value}")
+        return "\n".join(lines) + "\n"
+    
+    def to_dict(self) -> dict:
+        return {name: metric.value for name, metric in self.metrics.items()}
+
+
+def collect_metrics(stats: ProcessingStats, queue_depth: int, active_children: int,
+                    textures_per_second: float, running: bool) -> MetricsRegistry:
+    """Gather the metrics of a run. Counters start over with every run."""
+    registry = MetricsRegistry()
+    registry.gauge('running', "1 while a run is in progress", int(running))
+    registry.gauge('run_start_time_seconds', "Unix time the run started",
+                   stats.start_time.timestamp() if stats.start_time is not None else 0)
+    registry.gauge('mods', "Mods found to process in this run", stats.total_mods)
+    registry.counter('mods_processed_total', "Mods converted", stats.processed_mods)
+    registry.counter('mods_updated_total', "Converted mods that were updates", stats.updated_mods)
+    registry.counter('mods_skipped_total', "Mods skipped", stats.skipped_mods)
+    registry.counter('mods_failed_total', "Mods failed", stats.failed_mods)
+    registry.counter('textures_processed_total', "Textures converted", stats.processed_textures)
+    registry.counter('textures_skipped_total', "Textures create_pbr.exe skipped", stats.skipped_textures)
+    registry.counter('textures_quarantined_total', "Textures create_pbr.exe fails on", stats.quarantined_textures)
+    registry.counter('textures_incomplete_total', "Textures left with missing or damaged outputs",
+                     stats.incomplete_textures)
+    registry.counter('hung_processes_total', "Hung create_pbr.exe processes killed", stats.hung_processes)
+    registry.counter('written_bytes_total', "Bytes of output maps written", stats.written_bytes)
+    registry.gauge('textures_per_second', "Textures converted per second since the last export",
+                   round(textures_per_second, 3))
+    registry.gauge('queue_depth', "Mods waiting in the queue", queue_depth)
+    registry.gauge('active_children', "create_pbr.exe processes running", active_children)
+    return registry
+
+
+def write_atomically(path: Path, text: str):
+    """Replace a file in one step, so readers never see a partial write."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """Writes the metrics of a run to a Prometheus textfile and a JSON status file.
+    
+    The textures per second are measured between two exports.
+    """
+    
+    def __init__(self, metrics_path: Optional[Path] = None, status_path: Optional[Path] = None):
+        self.metrics_path = metrics_path
+        self.status_path = status_path
+        self.last_sample: Optional[tuple] = None  # (time.monotonic(), processed textures)
+    
+    def export(self, stats: ProcessingStats, queue_depth: int, active_children: int, state: str):
+        """Write both files. state is 'running', 'finished' or 'stopped'."""
+        now = time.monotonic()
+        rate = 0.0
+        if self.last_sample is not None and now > self.last_sample[0]:
+            rate = (stats.processed_textures - self.last_sample[1]) / (now - self.last_sample[0])
+        self.last_sample = (now, stats.processed_textures)
+        
+        registry = collect_metrics(stats, queue_depth, active_children, rate, state == 'running')
+        if self.metrics_path is not None:
+            write_atomically(self.metrics_path, registry.to_prometheus())
+        if self.status_path is not None:
+            status = {
+                'state': state,
+                'started_at': stats.start_time.isoformat(timespec='seconds') if stats.start_time else None,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                'metrics': registry.to_dict(),
+            }
+            write_atomically(self.status_path, json.dumps(status, indent=1))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LOAD CONTROL
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class LoadSample:
+    """One reading of the machine's load. Signals the platform does not provide are None."""
+    cpu_load: float  # percent
+    free_memory: Optional[int]  # bytes
+    user_idle: Optional[float] = None  # seconds since the last keyboard or mouse input
+    fullscreen: Optional[bool] = None  # a game or presentation is in the foreground
+    
+    def describe(self) -> str:
+        parts = [f"CPU {self.cpu_load:.0f}%"]
+        if self.free_memory is not None:
+            parts.append(f"{format_bytes(self.free_memory)} free")
+        if self.user_idle is not None:
+            parts.append(f"last input {format_duration(self.user_idle)} ago")
+        if self.fullscreen:
+            parts.append("full screen app")
+        return ", ".join(parts)
+
+
+class SystemMonitor:
+    """Samples the load of the machine.
+    
+    On Windows the CPU load is measured between two samples with GetSystemTimes,
+    and the time since the last input and full screen apps come from the shell.
+    Elsewhere the one minute load average per CPU stands in for the CPU load and
+    there are no foreground signals.
+    """
+    
+    def __init__(self):
+        self.last_times: Optional[tuple] = None  # (idle, total) CPU time of the previous sample on Windows
+    
+    def sample(self) -> LoadSample:
+        if os.name == 'nt':
+            return self.sample_windows()
+        return LoadSample(cpu_load=os.getloadavg()[0] / (os.cpu_count() or 1) * 100, free_memory=self.free_memory())
+    
+    @staticmethod
+    def free_memory() -> Optional[int]:
+        """Memory available to new processes without swapping, on Linux and other POSIX systems."""
+        try:
+            with open('/proc/meminfo', 'r', encoding='ascii') as f:
+                for line in f:
+                    if line.startswith('MemAvailable:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        try:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return None
+    
+    def sample_windows(self) -> LoadSample:
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = ctypes.windll.kernel32
+        
+        # FILETIMEs are 64-bit counts of 100 ns, kernel time includes the idle time
+        idle, kernel, user = ctypes.c_ulonglong(), ctypes.c_ulonglong(), ctypes.c_ulonglong()
+        kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user))
+        times = (idle.value, kernel.value + user.value)
+        cpu_load = 0.0
+        if self.last_times is not None and times[1] > self.last_times[1]:
+            cpu_load = 100 * (1 - (times[0] - self.last_times[0]) / (times[1] - self.last_times[1]))
+        self.last_times = times
+        
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [('dwLength', wintypes.DWORD), ('dwMemoryLoad', wintypes.DWORD),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+        memory = MEMORYSTATUSEX(dwLength=ctypes.sizeof(MEMORYSTATUSEX))
+        free_memory = memory.ullAvailPhys if kernel32.GlobalMemoryStatusEx(ctypes.byref(memory)) else None
+        
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [('cbSize', wintypes.UINT), ('dwTime', wintypes.DWORD)]
+        last_input = LASTINPUTINFO(cbSize=ctypes.sizeof(LASTINPUTINFO))
+        user_idle = None
+        if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(last_input)):
+            # both are milliseconds since boot that wrap around after 49 days
+            user_idle = ((kernel32.GetTickCount() - last_input.dwTime) & 0xFFFFFFFF) / 1000
+        
+        state = ctypes.c_int()
+        fullscreen = None
+        if ctypes.windll.shell32.SHQueryUserNotificationState(ctypes.byref(state)) == 0:
+            fullscreen = state.value in FOREGROUND_BUSY_STATES
+        return LoadSample(cpu_load, free_memory, user_idle, fullscreen)
+
+
+def windows_process_tree(pid: int) -> list:
+    """Ids of a process and every process it started, from a snapshot of the running processes."""
+    import ctypes
+    from ctypes import wintypes
+    
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [('dwSize', wintypes.DWORD), ('cntUsage', wintypes.DWORD), ('th32ProcessID', wintypes.DWORD),
+                    ('th32DefaultHeapID', ctypes.c_void_p), ('th32ModuleID', wintypes.DWORD),
+                    ('cntThreads', wintypes.DWORD), ('th32ParentProcessID', wintypes.DWORD),
+                    ('pcPriClassBase', wintypes.LONG), ('dwFlags', wintypes.DWORD),
+                    ('szExeFile', ctypes.c_wchar * 260)]
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateToolhelp32Snapshot.restype = ctypes.c_void_p
+    snapshot = ctypes.c_void_p(kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0))
+    children: dict[int, list] = {}
+    try:
+        entry = PROCESSENTRY32W(dwSize=ctypes.sizeof(PROCESSENTRY32W))
+        more = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while more:
+            children.setdefault(entry.th32ParentProcessID, []).append(entry.th32ProcessID)
+            more = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+    tree = [pid]
+    for parent in tree:
+        # parent ids are not cleared when a parent exits, a reused id must not loop back
+        tree.extend(child for child in children.get(parent, []) if child not in tree)
+    return tree
+
+
+def suspend_process_tree(process, suspend: bool):
+    """Suspend (or resume) a child process together with every process it started."""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            ntdll = ctypes.windll.ntdll
+            kernel32.OpenProcess.restype = ctypes.c_void_p
+            for pid in windows_process_tree(process.pid):
+                handle = kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, pid)
+                if handle:
+                    (ntdll.NtSuspendProcess if suspend else ntdll.NtResumeProcess)(ctypes.c_void_p(handle))
+                    kernel32.CloseHandle(ctypes.c_void_p(handle))
+        else:
+            # the child leads its own session, see run_create_pbr
+            os.killpg(process.pid, signal.SIGSTOP if suspend else signal.SIGCONT)
+    except Exception:
+        pass
+
+
+class LoadController:
+    """Decides how many create_pbr.exe processes may run from samples of the machine's load.
+    
+    A worker takes a slot before it starts create_pbr.exe. When the CPU is busy
+    or someone is using the machine, fewer slots hold new processes back while
+    the running ones finish their mod, and while the machine is idle slots are
+    added one at a time up to max_concurrent_mods. A full screen app or low
+    memory suspends the running processes until it is over.
+    """
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.limit = max(1, settings.max_concurrent_mods)
+        self.allowed = 1
+        self.running = 0
+        self.suspended = False
+        self.resumed_at = 0.0  # time.monotonic() of the last resume
+        self.changed = asyncio.Event()
+        self.monitor = SystemMonitor()
+    
+    async def acquire(self, stop_event: asyncio.Event) -> bool:
+        """Wait for a slot to start create_pbr.exe in. Returns False if stopped while waiting."""
+        while self.suspended or self.running >= self.allowed:
+            if stop_event.is_set():
+                return False
+            self.changed.clear()
+            waiters = [asyncio.ensure_future(self.changed.wait()), asyncio.ensure_future(stop_event.wait())]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+        self.running += 1
+        return True
+    
+    def release(self):
+        self.running -= 1
+        self.changed.set()
+    
+    def interrupted_since(self, since: float) -> bool:
+        """Check if the processes were suspended at some point after a time.monotonic() value."""
+        return self.suspended or self.resumed_at > since
+    
+    def decide(self, sample: LoadSample) -> tuple:
+        """Work out (allowed, suspended, reason) for a sample."""
+        min_free = self.settings.min_free_memory_mb * 1024 * 1024
+        if self.suspended:
+            min_free *= LOAD_RESUME_MARGIN  # do not resume just to be suspended again
+        if self.settings.pause_for_fullscreen and sample.fullscreen:
+            return self.allowed, True, "a full screen app is running"
+        if sample.free_memory is not None and sample.free_memory < min_free:
+            return self.allowed, True, f"less than {format_bytes(min_free)} of memory free"
+        if (self.settings.user_idle_seconds > 0 and sample.user_idle is not None
+                and sample.user_idle < self.settings.user_idle_seconds):
+            return 1, False, "someone is using the machine"
+        if sample.cpu_load > self.settings.max_cpu_load:
+            return max(1, self.allowed - 1), False, f"CPU load above {self.settings.max_cpu_load}%"
+        if sample.cpu_load < self.settings.max_cpu_load * LOAD_RAISE_FRACTION:
+            return min(self.limit, self.allowed + 1), False, "the machine is idle"
+        return self.allowed, False, "load within limits"
+    
+    def apply(self, allowed: int, suspended: bool):
+        if self.suspended and not suspended:
+            self.resumed_at = time.monotonic()
+        self.allowed = allowed
+        self.suspended = suspended
+        self.changed.set()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# WORKER THREAD SIGNALS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class WorkerSignals(QObject):
+    """Signals for the processing worker thread."""
+    progress = Signal(int, int, str)  # current, total, mod_name
+    total = Signal(int, int)          # current, total
+    mod_progress = Signal(int, int)   # current, total
+    finished = Signal(object)         # ProcessingStats
+    error = Signal(str)
+    paused = Signal(bool, str)        # paused, reason
+
+
+class ScanSignals(QObject):
+    """Signals for the scan worker thread."""
+    progress = Signal(int, int, int)  # folders visited, total folders, mods found
+    results = Signal(list)            # ScanResults found since the last update
+    finished = Signal(bool)           # completed, False if cancelled or failed
+    error = Signal(str)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONVERSION ENGINE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+EVENT_PROGRESS = 'progress'          # a mod was started: current, total, mod_name
+EVENT_TOTAL = 'total'                # the scan found another mod: current, total
+EVENT_MOD_PROGRESS = 'mod_progress'  # a texture of a mod finished: current, total, mod_name
+EVENT_PAUSED = 'paused'              # processing paused or resumed: paused, message
+EVENT_ERROR = 'error'                # critical error: message
+EVENT_FINISHED = 'finished'          # the run is over: stats
+
+
+@dataclass
+class EngineEvent:
+    """Something that happened during a run, for the UI or the CLI to display."""
+    kind: str
+    mod_name: str = ''
+    current: int = 0
+    total: int = 0
+    paused: bool = False
+    message: str = ''
+    stats: Optional[ProcessingStats] = None
+
+
+class EventStream:
+    """Async iterator over the events of one engine run. Ends after the finished event."""
+    
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> EngineEvent:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+@dataclass
+class PreparedMod:
+    """A mod whose output folder, texture names and plan are ready for create_pbr.exe."""
+    mod_path: Path
+    output_path: Path
+    manifest: OutputManifest
+    plan: ModPlan
+    input_path: Optional[Path] = None  # what create_pbr.exe reads: the mod, or its staged pairs
+    final_path: Optional[Path] = None  # where output_path is committed to, if it is in the scratch directory
+    keep_input: bool = False  # input_path is staged for the next variant as well
+    variants: Optional[list] = None  # (engine, PreparedMod) of each variant of a settings matrix still to convert
+
+
+@dataclass
+class ChildResult:
+    """Outcome of one create_pbr.exe run."""
+    success: bool
+    hung_on: Optional[str] = None  # texture the watchdog killed it on, '' if unknown
+    skipped: list = field(default_factory=list)  # textures create_pbr.exe chose to skip
+
+
+def pair_matches(mod_path: Path, pair: TexturePair, reported: str) -> bool:
+    """Check if a texture path printed by create_pbr.exe, possibly below a staging folder, belongs to a pair."""
+    reported = reported.replace('\\', '/').lower()
+    return bool(reported) and any(reported.endswith(t.relative_to(mod_path).as_posix().lower()) or
+                                  reported.endswith('/' + t.name.lower()) for t in (pair.diffuse, pair.normal))
+
+
+def pair_finished(mod_path: Path, output_path: Path, pair: TexturePair, texture_format: str) -> bool:
+    """Check if every output map of a pair has been written."""
+    return all((output_path / rel).is_file() for rel in pbr_output_paths(mod_path, pair, texture_format))
+
+
+class ConversionEngine:
+    """Scans, stages and converts mods on a single asyncio event loop.
+    
+    The engine does not depend on Qt. Blocking filesystem work runs in worker
+    threads through asyncio.to_thread, and the output of every create_pbr.exe
+    child is read with asyncio.subprocess, so any number of children share one
+    thread. Progress is published as EngineEvents to every stream returned by
+    events(), which the Qt worker and the CLI consume.
+    """
+    
+    def __init__(self, settings: Settings, logger: logging.Logger,
+                 job_queue: Optional[JobQueue] = None, lane: Optional[str] = None,
+                 mods: Optional[list] = None):
+        self.settings = settings
+        self.logger = logger
+        self.job_queue = job_queue if job_queue is not None else JobQueue()
+        self.lane = lane  # None drains every lane (high first) after scanning
+        self.mods = mods  # picked from scan results, enqueued instead of scanning again
+        self.policy = TexturePolicy(settings)
+        self.stats = ProcessingStats()
+        self.should_stop = False
+        self.streams: list[EventStream] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.children: set = set()
+        self.started_mods = 0
+        self.reserved_bytes = 0  # predicted output of mods in progress
+        self.size_history: Optional[SizeHistory] = None
+        self.predicted_sizes: dict[str, int] = {}
+        self.plans: dict[str, ModPlan] = {}  # of queued mods, dropped once they are finished
+        self.unqueued_filtered: dict[str, dict] = {}  # what the policy removed from mods left with no work
+        self.mo2_profile: Optional[MO2Profile] = None
+        self.coverage_index: Optional[PBRCoverageIndex] = None
+        self.shared_jobs: Optional[SharedJobDirectory] = None
+        self.prefetcher: Optional[TexturePrefetcher] = None
+        self.prefetches: set = set()
+        self.load_lock = threading.Lock()  # the scan and mod preparation may plan at the same time
+        self.scanning = False
+        self.queue_changed: Optional[asyncio.Event] = None
+        self.found_mods: list = []  # found by the scan, waiting to be queued in one write
+        self.queueing: Optional[asyncio.Task] = None
+        self.metrics: Optional[MetricsExporter] = None
+        self.load_controller: Optional[LoadController] = None
+        self.run_start = 0.0
+        self.parent: Optional[ConversionEngine] = None  # the engine running the settings matrix this variant is part of
+        self.cost: Optional[VariantCost] = None
+        # with a settings matrix, mods are checked and sanitized once and then converted by each variant's engine
+        self.variant_engines = [self.variant_engine(variant) for variant in dict.fromkeys(settings.variants)]
+    
+    def variant_engine(self, variant: str) -> ConversionEngine:
+        """Create the engine of one variant. It shares the queue, the children, the events and the stats."""
+        engine = ConversionEngine(self.settings.for_variant(variant), VariantLogger(self.logger, {'variant': variant}),
+                                  self.job_queue, self.lane)
+        engine.parent = self
+        engine.children = self.children
+        engine.streams = self.streams
+        engine.stats = self.stats
+        return engine
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Events and control
+    # ─────────────────────────────────────────────────────────────────────
+    
+    def events(self) -> EventStream:
+        """Subscribe to the events of the next run. Call before starting run()."""
+        stream = EventStream()
+        self.streams.append(stream)
+        return stream
+    
+    def emit(self, kind: str, **data):
+        """Publish an event. Must be called on the engine's event loop."""
+        event = EngineEvent(kind, **data)
+        for stream in self.streams:
+            stream.queue.put_nowait(event)
+    
+    def stop(self):
+        """Request to stop processing. Safe to call from any thread."""
+        self.should_stop = True
+        if self.loop is not None and self.stop_event is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            except RuntimeError:
+                pass  # the loop already closed
+        for child in list(self.children):
+            kill_process_tree(child)
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        for engine in self.variant_engines:
+            engine.stop()
+    
+    async def sleep(self, seconds: float):
+        """Sleep, waking up early if processing is stopped."""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Scanning and planning
+    # ─────────────────────────────────────────────────────────────────────
+    
+    def get_mods_to_process(self) -> list:
+        """Get list of mods that need processing."""
+        try:
+            return list(self.iter_mods_to_process())
+        except Exception as e:
+            self.logger.error(f"Error scanning mods directory: {e}")
+            return [] # in case of error, return empty list to avoid processing
+    
+    def iter_mods_to_process(self, progress=None):
+        """Yield the mods that need processing, each as soon as it is confirmed.
+        
+        progress is called with the number of folders visited and the total
+        before each folder is checked. Stops early when processing is stopped.
+        """
+        if (self.settings.mods_directory is None or
+            not self.settings.mods_directory.is_dir()
+            or self.settings.output_directory is None or
+            not self.settings.output_directory.is_dir()):
+            return
+        
+        all_folders = [f for f in self.settings.mods_directory.iterdir() if f.is_dir()]
+        
+        profile = self.load_mo2_profile()
+        if profile is not None:
+            all_folders = [f for f in all_folders if profile.is_enabled(f.name)]
+        all_folders = [f for f in all_folders if not self.policy.excludes_mod(f.name)]
+        filtered = profile is not None or self.settings.skip_covered_textures or self.policy.active
+        
+        if self.settings.shard:
+            all_folders = [f for f in all_folders if in_shard(f.name, self.settings.shard)]
+        
+        for visited, folder in enumerate(all_folders):
+            if self.should_stop:
+                return
+            if progress is not None:
+                progress(visited, len(all_folders))
+            if len(PATH_INDEX.find_dirs(folder, 'textures')) > 1:
+                self.logger.warning(f"Skipping {folder.name}: it has several textures folders that only differ in case.")
+                self.stats.case_collisions += 1
+                continue
+            if has_textures_but_no_pbr(folder, allow_pbr=self.settings.skip_covered_textures):
+                if has_valid_pairs(folder):
+                    if any(engine.needs_conversion(folder, filtered) for engine in self.variant_engines or [self]):
+                        yield folder
+        if progress is not None:
+            progress(len(all_folders), len(all_folders))
+    
+    def needs_conversion(self, mod_path: Path, filtered: bool) -> bool:
+        """Check if a mod with valid pairs has work left for this engine's output folder."""
+        output_path = self.output_path(mod_path)
+        if not output_path.exists():
+            # with filtered set, every texture may be overridden or already covered
+            return not filtered or self.has_planned_work(mod_path)
+        if (output_path / MANIFEST_FILE_NAME).is_file() and self.has_planned_work(mod_path):
+            return True  # converted before, but its textures changed
+        # a dead node left a partial output behind
+        return self.shared_jobs is not None and self.shared_jobs.is_abandoned(mod_path.name)
+    
+    def has_planned_work(self, mod_path: Path) -> bool:
+        """Plan a scanned mod and keep the plan only if it has work, so it gets queued."""
+        plan = self.plan_mod(mod_path)
+        if plan.has_work:
+            return True
+        self.plans.pop(str(mod_path), None)
+        if plan.filtered:
+            self.unqueued_filtered[str(mod_path)] = plan.filtered
+        return False
+    
+    def forget_plan(self, mod_path: Path):
+        """Drop the plans of a mod that left the queue. Claiming it again plans it anew."""
+        for engine in [self, *self.variant_engines]:
+            engine.plans.pop(str(mod_path), None)
+    
+    def describe_mod(self, mod_path: Path) -> ScanResult:
+        """Summarize the work a scanned mod needs for the scan results table.
+        
+        With a settings matrix, every variant converts its pairs again and counts towards the cost.
+        """
+        plans = [engine.plan_mod(mod_path) for engine in self.variant_engines or [self]]
+        pixels = sum(pair.pixels for plan in plans for pair in plan.pairs)
+        plan = next((plan for plan in plans if plan.has_work), plans[0])
+        if plan.update:
+            status = SCAN_STATUS_UPDATE
+        elif plan.is_partial:
+            status = SCAN_STATUS_PARTIAL
+        else:
+            status = SCAN_STATUS_NEW
+        return ScanResult(mod_path=mod_path, textures=sum(len(plan.pairs) for plan in plans), pixels=pixels,
+                          output_size=self.predicted_size(mod_path), status=status)
+    
+    def dry_run(self) -> str:
+        """Plan every mod without changing anything and report the work left and what the texture policy removes."""
+        mods = self.get_mods_to_process()
+        engines = self.variant_engines or [self]
+        planned = [engine.plan_mod(mod_path) for mod_path in mods for engine in engines]
+        pixels = sum(pair.pixels for plan in planned for pair in plan.pairs)
+        lines = [f"Dry run: {len(mods)} mods with {sum(len(plan.pairs) for plan in planned)} texture pairs to convert, "
+                 f"{pixels / 1_000_000:.1f} megapixels, about {format_duration(estimated_seconds(pixels))}."]
+        trivial = [pair for plan in planned for pair, _, _ in plan.trivial]
+        if trivial:
+            trivial_pixels = sum(pair.pixels for pair in trivial)
+            lines.append(f"{len(trivial)} pairs with constant textures are synthesized instead, "
+                         f"{trivial_pixels / 1_000_000:.1f} megapixels, "
+                         f"about {format_duration(estimated_seconds(trivial_pixels))} saved.")
+        
+        removed: dict[str, tuple] = {}
+        excluded = [f for f in self.settings.mods_directory.iterdir() if f.is_dir() and self.policy.excludes_mod(f.name)]
+        if excluded:
+            pairs = [pair for folder in excluded for pair in iter_texture_pairs(folder)]
+            removed[f'{FILTER_EXCLUDED_MOD} ({len(excluded)})'] = (len(pairs) * len(engines),
+                                                                   sum(pair.pixels for pair in pairs) * len(engines))
+        # mods the policy removed every pair of were planned too, but not listed
+        queued = {str(mod_path) for mod_path in mods}
+        unqueued = [filtered for engine in engines
+                    for key, filtered in engine.unqueued_filtered.items() if key not in queued]
+        for filtered in [plan.filtered for plan in planned] + unqueued:
+            for reason, (count, reason_pixels) in filtered.items():
+                total_count, total_pixels = removed.get(reason, (0, 0))
+                removed[reason] = (total_count + count, total_pixels + reason_pixels)
+        if not removed:
+            lines.append("The texture policy removes nothing.")
+            return "\n".join(lines)
+        lines.append("Removed by the texture policy:")
+        for reason, (count, reason_pixels) in removed.items():
+            lines.append(f"  {reason}: {count} pairs, {reason_pixels / 1_000_000:.1f} megapixels, "
+                         f"about {format_duration(estimated_seconds(reason_pixels))}")
+        return "\n".join(lines)
+    
+    def output_folder_name(self, mod_path: Path) -> str:
+        """Get the name of a mod's output folder. A variant's settings are appended to it."""
+        if self.settings.variant:
+            return f'{mod_path.name} PBR ({self.settings.variant.replace(":", " ")})'
+        return f'{mod_path.name} PBR'
+    
+    def output_path(self, mod_path: Path) -> Path:
+        """Get the output folder of a mod, matching an existing one regardless of case."""
+        name = self.output_folder_name(mod_path)
+        return PATH_INDEX.find_dir(self.settings.output_directory, name) or self.settings.output_directory / name
+    
+    def report_case_collisions(self, mod_path: Path):
+        """Warn about files and folders of a mod whose names only differ in case."""
+        for directory, names in PATH_INDEX.collisions(mod_path):
+            where = directory.relative_to(mod_path).as_posix()
+            self.logger.warning(f"{mod_path.name}: {', '.join(names)} in {where} only differ in case, "
+                                f"only {names[0]} is used.")
+            self.stats.case_collisions += 1
+    
+    def load_mo2_profile(self) -> Optional[MO2Profile]:
+        """Load the configured MO2 profile and resolve its texture winners, once per engine."""
+        if self.settings.mo2_profile is None or self.settings.mods_directory is None:
+            return None
+        if self.parent is not None:
+            self.mo2_profile = self.parent.load_mo2_profile()
+            return self.mo2_profile
+        with self.load_lock:
+            if self.mo2_profile is None:
+                profile = MO2Profile(self.settings.mo2_profile)
+                profile.build_winners(self.settings.mods_directory)
+                self.mo2_profile = profile
+                self.logger.info(f"Using MO2 profile {self.settings.mo2_profile.parent.name}: "
+                                 f"{len(self.mo2_profile.enabled_mods)} enabled mods.")
+        return self.mo2_profile
+    
+    def load_coverage_index(self) -> Optional[PBRCoverageIndex]:
+        """Index the existing PBR textures of the library, once per engine."""
+        if not self.settings.skip_covered_textures:
+            return None
+        if self.parent is not None:
+            self.coverage_index = self.parent.load_coverage_index()
+            return self.coverage_index
+        with self.load_lock:
+            if self.coverage_index is None and self.settings.mods_directory and self.settings.output_directory:
+                index = PBRCoverageIndex()
+                index.build(self.settings.mods_directory, self.settings.output_directory)
+                self.coverage_index = index
+                self.logger.info(f"Indexed {len(self.coverage_index.paths)} existing PBR texture files.")
+        return self.coverage_index
+    
+    def plan_mod(self, mod_path: Path, refresh: bool = False) -> ModPlan:
+        """Decide which texture pairs of a mod to convert."""
+        key = str(mod_path)
+        if key in self.plans and not refresh:
+            return self.plans[key]
+        
+        pairs = list(iter_texture_pairs(mod_path))
+        plan = ModPlan(mod_path=mod_path, pairs=pairs, total_pairs=len(pairs))
+        # its _n maps are outputs of another conversion, which create_pbr.exe would pick up as inputs
+        textures_path = PATH_INDEX.find_dir(mod_path, 'textures')
+        plan.has_pbr_dir = textures_path is not None and len(PATH_INDEX.find_dirs(textures_path, 'pbr')) > 0
+        
+        manifest = None
+        if self.settings.output_directory is not None:
+            output_path = self.output_path(mod_path)
+            manifest = OutputManifest.load(output_path) if output_path.is_dir() else None
+        converted = set()
+        if manifest is not None:
+            # Only pairs that are new or changed since the last conversion are planned
+            plan.update = True
+            keys = {pair_key(mod_path, p) for p in pairs}
+            plan.removed_keys = [k for k in manifest.entries if k not in keys]
+            changed = []
+            for p in pairs:
+                key = pair_key(mod_path, p)
+                if key in manifest.entries:
+                    converted.add(key)
+                    if not manifest.is_current(mod_path, p, self.settings):
+                        changed.append(key)
+            for key in plan.removed_keys + changed:
+                plan.stale_outputs.extend(manifest.entries[key].get('outputs', []))
+            plan.pairs = [p for p in pairs if pair_key(mod_path, p) not in converted or pair_key(mod_path, p) in changed]
+            plan.current_pairs = len(converted) - len(changed)
+        
+        profile = self.load_mo2_profile()
+        if profile is not None:
+            winning = [p for p in plan.pairs
+                       if profile.is_winner(mod_path, p.diffuse) and profile.is_winner(mod_path, p.normal)]
+            plan.overridden_pairs = len(plan.pairs) - len(winning)
+            plan.pairs = winning
+        
+        coverage = self.load_coverage_index()
+        if coverage is not None:
+            # a changed pair is covered by its own earlier output, which does not count
+            remaining = [p for p in plan.pairs
+                         if pair_key(mod_path, p) in converted or not coverage.covers(mod_path, p)]
+            plan.covered_pairs = len(plan.pairs) - len(remaining)
+            plan.pairs = remaining
+        
+        if self.policy.active:
+            remaining = []
+            for pair in plan.pairs:
+                reason = self.policy.filter(mod_path, pair)
+                if reason is None and self.policy.detects_trivial:
+                    colours = self.policy.trivial_colours(pair)
+                    if colours is not None and self.settings.trivial_textures == TRIVIAL_SYNTHESIZE:
+                        plan.trivial.append((pair, *colours))
+                        continue
+                    if colours is not None:
+                        reason = FILTER_TRIVIAL
+                if reason is None:
+                    remaining.append(pair)
+                else:
+                    pairs, pixels = plan.filtered.get(reason, (0, 0))
+                    plan.filtered[reason] = (pairs + 1, pixels + pair.pixels)
+            plan.pairs = remaining
+        
+        self.plans[str(mod_path)] = plan
+        return plan
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Run loop
+    # ─────────────────────────────────────────────────────────────────────
+    
+    async def run(self) -> ProcessingStats:
+        """Main processing loop."""
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        if self.should_stop:
+            self.stop_event.set()  # stopped before the loop was up
+        self.queue_changed = asyncio.Event()
+        self.started_mods = 0
+        self.stats.reset()
+        self.run_start = time.monotonic()
+        if self.settings.trivial_textures != TRIVIAL_CONVERT and np is None and self.lane is None:
+            self.logger.warning("Detecting constant textures needs NumPy (pip install numpy), converting them instead.")
+        if self.settings.prefetch_textures:
+            self.prefetcher = TexturePrefetcher(self.settings.prefetch_budget_mb * 1024 * 1024)
+        self.stats.start_time = datetime.now()
+        heartbeat = None
+        exporter = None
+        load_control = None
+        
+        try:
+            # interactive lanes run beside the batch engine, which exports for both
+            if self.lane is None and (self.settings.metrics_file or self.settings.status_file):
+                self.metrics = MetricsExporter(self.settings.metrics_file, self.settings.status_file)
+                exporter = asyncio.create_task(self.keep_metrics_exported())
+            if self.lane is None and self.settings.adaptive_concurrency:
+                self.load_controller = LoadController(self.settings)
+                load_control = asyncio.create_task(self.keep_load_adapted())
+                self.logger.info(f"Adapting to the system load, up to {self.load_controller.limit} "
+                                 f"create_pbr.exe processes at a time.")
+            if self.settings.job_directory is not None and self.shared_jobs is None:
+                self.shared_jobs = await asyncio.to_thread(SharedJobDirectory, self.settings.job_directory,
+                                                           self.settings.node_name, self.settings.claim_lease)
+                self.logger.info(f"Sharing work through {self.settings.job_directory} as node {self.shared_jobs.node}.")
+            if self.shared_jobs is not None:
+                heartbeat = asyncio.create_task(self.keep_claims_alive())
+            if self.variant_engines:
+                self.start_variants()
+            
+            # Only the batch engine scans, interactive lanes just drain the queue
+            if self.lane is None and self.mods is not None:
+                await asyncio.to_thread(self.job_queue.enqueue_many, self.mods, PRIORITY_NORMAL)
+            
+            self.stats.total_mods = self.job_queue.pending_count(self.lane)
+            
+            workers = max(1, self.settings.max_concurrent_mods)
+            if self.lane is None and self.mods is None:
+                # convert from the first mod found on, the total grows as the scan goes on
+                self.scanning = True
+                await asyncio.gather(self.scan_into_queue(), *(self.work() for _ in range(workers)))
+            else:
+                if self.stats.total_mods == 0:
+                    self.logger.info("No mods to process.")
+                    return self.stats
+                
+                self.logger.info(f"Found {self.stats.total_mods} mods to process.")
+                
+                if self.lane is None:
+                    await asyncio.to_thread(self.preflight_disk_space)
+                
+                await asyncio.gather(*(self.work() for _ in range(workers)))
+            
+            if self.should_stop:
+                self.logger.warning("Processing stopped by user.")
+            elif self.settings.deduplicate_outputs and self.lane is None:
+                if self.shared_jobs is not None:
+                    # other nodes may still be writing outputs
+                    self.logger.info("Skipping deduplication while sharing work, run it once all nodes are done.")
+                else:
+                    await asyncio.to_thread(self.deduplicate_outputs)
+                    
+        except Exception as e:
+            self.logger.error(f"Critical error during processing: {e}")
+            self.emit(EVENT_ERROR, message=str(e))
+        finally:
+            if self.prefetches:
+                await asyncio.gather(*self.prefetches)
+            if heartbeat is not None:
+                heartbeat.cancel()
+                await asyncio.to_thread(self.shared_jobs.release_all)
+            if load_control is not None:
+                load_control.cancel()
+                if self.load_controller.suspended:
+                    for child in list(self.children):
+                        suspend_process_tree(child, False)
+            self.stats.end_time = datetime.now()
+            if exporter is not None:
+                exporter.cancel()
+                await self.export_metrics('stopped' if self.should_stop else 'finished')
+            self.logger.info(self.stats.get_summary())
+            self.emit(EVENT_FINISHED, stats=self.stats)
+            for stream in self.streams:
+                stream.queue.put_nowait(None)
+        return self.stats
+    
+    def start_variants(self):
+        """Hand this run's event loop and shared job directory to the variants and reset their costs."""
+        for engine in self.variant_engines:
+            engine.loop, engine.stop_event = self.loop, self.stop_event
+            engine.should_stop = self.should_stop
+            engine.shared_jobs = self.shared_jobs
+            engine.load_controller = self.load_controller
+            engine.cost = VariantCost(engine.settings.variant)
+        self.stats.variant_costs = [engine.cost for engine in self.variant_engines]
+        self.logger.info(f"Converting every mod with {len(self.variant_engines)} variants: "
+                         f"{', '.join(engine.settings.variant for engine in self.variant_engines)}")
+    
+    async def scan_into_queue(self):
+        """Scan the library on a thread and queue each mod needing work as soon as it is found."""
+        start = time.monotonic()
+        found = 0
+        
+        def scan():
+            nonlocal found
+            for mod_path in self.iter_mods_to_process():
+                if self.should_stop:
+                    break
+                found += 1
+                self.loop.call_soon_threadsafe(self.queue_found, mod_path)
+        
+        try:
+            await asyncio.to_thread(scan)
+        except Exception as e:
+            self.logger.error(f"Error scanning mods directory: {e}")
+        finally:
+            if self.queueing is not None:
+                await self.queueing
+            self.scanning = False
+            self.queue_changed.set()
+        self.stats.scan_time = time.monotonic() - start
+        
+        if found == 0 and self.started_mods == 0 and self.job_queue.pending_count(self.lane) == 0:
+            self.logger.info("No mods to process.")
+            return
+        self.logger.info(f"Scan finished: found {found} mods to process in {self.stats.scan_time:.1f}s.")
+        if not self.should_stop:
+            await asyncio.to_thread(self.preflight_disk_space)
+    
+    def queue_found(self, mod_path: Path):
+        """Take a mod the scan found. It is queued with the others found while the last write was going on."""
+        self.found_mods.append(mod_path)
+        if self.queueing is None:
+            self.queueing = asyncio.create_task(self.queue_found_mods())
+    
+    async def queue_found_mods(self):
+        """Queue the mods found by the scan in batches, writing the queue off the event loop, and grow the total."""
+        try:
+            while self.found_mods:
+                batch, self.found_mods = self.found_mods, []
+                try:
+                    queued = await asyncio.to_thread(self.job_queue.enqueue_many, batch, PRIORITY_NORMAL)
+                except Exception as e:
+                    self.logger.error(f"Error queuing mods: {e}")
+                    continue
+                if queued:
+                    self.stats.total_mods += queued
+                    self.emit(EVENT_TOTAL, current=self.started_mods, total=self.stats.total_mods)
+                self.queue_changed.set()
+        finally:
+            self.queueing = None
+    
+    async def wait_for_queue(self):
+        """Wait until the scan queues another mod or ends, or processing is stopped."""
+        self.queue_changed.clear()
+        waiters = [asyncio.ensure_future(self.queue_changed.wait()), asyncio.ensure_future(self.stop_event.wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+    
+    async def work(self):
+        """Claim and process jobs until the queue is empty or processing is stopped.
+        
+        Mods go through a pipeline: while one converts, the next is claimed and
+        prepared (validated, renamed, staged, checked for disk space) and the
+        previous one is recorded, so the next create_pbr.exe starts as soon as
+        the current one exits.
+        """
+        upcoming = asyncio.create_task(self.claim_and_prepare())
+        recording = None
+        last_exit = None
+        try:
+            while True:
+                ready = await upcoming
+                upcoming = None
+                if ready is None:
+                    break
+                job, prepared = ready
+                if self.should_stop:
+                    await self.complete_job(job, prepared, False)
+                    break
+                upcoming = asyncio.create_task(self.claim_and_prepare())
+                
+                self.report_started(job)
+                if last_exit is not None:
+                    gap = time.monotonic() - last_exit
+                    self.stats.idle_gaps += 1
+                    self.stats.idle_time += gap
+                    self.stats.max_idle_gap = max(self.stats.max_idle_gap, gap)
+                self.logger.info(f"Processing: {prepared.mod_path.name}")
+                if self.stats.first_conversion_time is None:
+                    self.stats.first_conversion_time = time.monotonic() - self.run_start
+                if self.prefetcher is not None:
+                    self.prefetcher.consumed(prepared.mod_path)
+                try:
+                    outcome = await self.convert_mod(prepared)
+                except Exception as e:
+                    self.logger.error(f"Error processing {prepared.mod_path.name}: {e}")
+                    outcome = (False, [], [])
+                last_exit = time.monotonic()
+                
+                if recording is not None:
+                    await recording
+                recording = asyncio.create_task(self.complete_job(job, prepared, *outcome))
+        finally:
+            if recording is not None:
+                await recording
+            if upcoming is not None:
+                # stopped while the next mod was being prepared
+                ready = await upcoming
+                if ready is not None:
+                    await self.complete_job(*ready, False)
+    
+    async def claim_and_prepare(self) -> Optional[tuple]:
+        """Claim the next job and prepare its mod for conversion.
+        
+        Jobs that turn out to have nothing to convert, or that fail before
+        conversion, are completed right here. Returns (job, PreparedMod), or
+        None when the queue is empty or processing is stopped.
+        """
+        while not self.should_stop:
+            job = self.job_queue.claim_next(self.lane)
+            if job is None:
+                if not self.scanning:
+                    return None
+                await self.wait_for_queue()  # the scan has not found the next mod yet
+                continue
+            if not await self.claim_shared(job):
+                continue
+            
+            mod_path = Path(job.mod_path)
+            if not await self.wait_for_disk_space(mod_path):
+                self.job_queue.release(job)
+                await self.release_mod(mod_path, reserved=False)
+                return None
+            
+            self.reserved_bytes += self.predicted_size(mod_path)
+            try:
+                prepared = await asyncio.to_thread(self.prepare_mod, mod_path, job)
+            except Exception as e:
+                self.logger.error(f"Error processing {mod_path.name}: {e}")
+                prepared = False
+            if prepared:
+                self.prefetch_upcoming(prepared)
+                return job, prepared
+            
+            self.report_started(job)
+            self.forget_plan(mod_path)
+            await self.release_mod(mod_path)
+            if prepared is None:
+                # nothing left to convert is not a failure
+                self.job_queue.finish(job, True)
+            elif self.should_stop:
+                self.job_queue.release(job)
+            else:
+                self.stats.failed_mods += 1
+                self.job_queue.finish(job, False, "See log for details")
+        return None
+    
+    async def complete_job(self, job: Job, prepared: PreparedMod, success: bool,
+                           converted: list = (), quarantined: list = ()):
+        """Record a converted mod and settle its job."""
+        try:
+            success = await asyncio.to_thread(self.finish_mod, prepared, success, list(converted), list(quarantined))
+        except Exception as e:
+            self.logger.error(f"Error processing {prepared.mod_path.name}: {e}")
+            success = False
+        finally:
+            await self.release_mod(prepared.mod_path)
+        
+        if success:
+            self.stats.processed_mods += 1
+            self.job_queue.finish(job, True)
+        elif self.should_stop:
+            self.job_queue.release(job)
+        else:
+            self.stats.failed_mods += 1
+            self.job_queue.finish(job, False, "See log for details")
+    
+    def prefetch_upcoming(self, prepared: PreparedMod):
+        """Start reading a prepared mod and the next queued one into the page cache."""
+        if self.prefetcher is None:
+            return
+        upcoming = [(prepared.mod_path, prepared.plan.pairs)]
+        upcoming += [(mod_path, None) for mod_path in self.job_queue.pending_paths(self.lane)[:PREFETCH_AHEAD_MODS - 1]]
+        task = asyncio.create_task(asyncio.to_thread(self.prefetcher.prefetch, upcoming))
+        self.prefetches.add(task)
+        task.add_done_callback(self.prefetches.discard)
+    
+    def report_started(self, job: Job):
+        """Count a job as started and publish the overall progress."""
+        self.started_mods += 1
+        # mods queued while running grow the total
+        self.stats.total_mods = max(self.stats.total_mods, self.started_mods + self.job_queue.pending_count(self.lane))
+        self.emit(EVENT_PROGRESS, current=self.started_mods, total=self.stats.total_mods, mod_name=job.mod_name)
+    
+    async def release_mod(self, mod_path: Path, reserved: bool = True):
+        """Give back the disk space reserved for a mod and its claim in the shared job directory."""
+        if reserved:
+            self.reserved_bytes -= self.predicted_size(mod_path)
+        if self.shared_jobs is not None:
+            await asyncio.to_thread(self.shared_jobs.release, mod_path.name)
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Work sharing
+    # ─────────────────────────────────────────────────────────────────────
+    
+    async def claim_shared(self, job: Job) -> bool:
+        """Claim a job's mod in the shared job directory. Returns False if another node has it."""
+        if self.shared_jobs is None:
+            return True
+        mod_path = Path(job.mod_path)
+        expired = await asyncio.to_thread(self.shared_jobs.claim, mod_path.name)
+        if expired is None:
+            self.logger.info(f"{mod_path.name} is being converted by another node, skipping.")
+            self.job_queue.remove(job)
+            self.stats.total_mods -= 1
+            return False
+        if expired:
+            self.logger.warning(f"Taking over {mod_path.name} from node {expired.get('node', 'unknown')}, "
+                                "its claim expired.")
+            if expired.get('created_output') and self.settings.output_directory is not None:
+                # the dead node's partial output would be mistaken for a finished one
+                for engine in self.variant_engines or [self]:
+                    await asyncio.to_thread(shutil.rmtree, engine.output_path(mod_path), ignore_errors=True)
+        return True
+    
+    async def keep_claims_alive(self):
+        """Touch the claims of this node until the run ends."""
+        while True:
+            await asyncio.sleep(self.shared_jobs.lease / CLAIM_HEARTBEATS_PER_LEASE)
+            try:
+                for mod_name in await asyncio.to_thread(self.shared_jobs.heartbeat):
+                    self.logger.warning(f"Lost the claim on {mod_name} to another node, it may be converted twice.")
+            except Exception as e:
+                self.logger.error(f"Error refreshing claims: {e}")
+    
+    async def keep_metrics_exported(self):
+        """Export the metrics at the configured interval until the run ends."""
+        while True:
+            await self.export_metrics('running')
+            await asyncio.sleep(self.settings.metrics_interval)
+    
+    async def keep_load_adapted(self):
+        """Sample the system load and adapt the create_pbr.exe processes to it until the run ends.
+        
+        Every change is logged with the textures per second converted since the previous one.
+        """
+        controller = self.load_controller
+        last_change = (time.monotonic(), self.stats.processed_textures)
+        while True:
+            await asyncio.sleep(LOAD_CONTROL_INTERVAL)
+            try:
+                sample = await asyncio.to_thread(controller.monitor.sample)
+            except Exception as e:
+                self.logger.error(f"Error reading the system load: {e}")
+                continue
+            allowed, suspended, reason = controller.decide(sample)
+            if (allowed, suspended) == (controller.allowed, controller.suspended):
+                continue
+            
+            now = time.monotonic()
+            rate = (self.stats.processed_textures - last_change[1]) / max(now - last_change[0], 1e-6)
+            if suspended:
+                decision = f"suspending create_pbr.exe, {reason}"
+            elif controller.suspended:
+                decision = f"resuming create_pbr.exe with up to {allowed} at a time, {reason}"
+            else:
+                decision = f"up to {allowed} create_pbr.exe at a time, {reason}"
+            self.logger.info(f"Load control ({sample.describe()}): {decision}. "
+                             f"{rate:.2f} textures/s over the last {format_duration(now - last_change[0])}.")
+            last_change = (now, self.stats.processed_textures)
+            
+            if suspended != controller.suspended:
+                for child in list(self.children):
+                    suspend_process_tree(child, suspended)
+                if suspended:
+                    self.emit(EVENT_PAUSED, paused=True, message=f"System busy: {reason}")
+                else:
+                    self.emit(EVENT_PAUSED, paused=False)
+            controller.apply(allowed, suspended)
+    
+    async def export_metrics(self, state: str):
+        try:
+            await asyncio.to_thread(self.metrics.export, self.stats, self.job_queue.pending_count(self.lane),
+                                    len(self.children), state)
+        except Exception as e:
+            self.logger.error(f"Error exporting metrics: {e}")
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Disk space
+    # ─────────────────────────────────────────────────────────────────────
+    
+    def predicted_size(self, mod_path: Path) -> int:
+        """Get the predicted output size of a mod, computed once per run."""
+        if self.variant_engines:
+            return sum(engine.predicted_size(mod_path) for engine in self.variant_engines)
+        key = str(mod_path)
+        if key not in self.predicted_sizes:
+            try:
+                pairs = self.plan_mod(mod_path).pairs
+                self.predicted_sizes[key] = predict_output_size(pairs, self.settings.texture_format,
+                                                                self.load_size_history())
+            except Exception:
+                self.predicted_sizes[key] = 0
+        return self.predicted_sizes[key]
+    
+    def load_size_history(self) -> Optional[SizeHistory]:
+        """Load the corrections of size predictions, once for all variants."""
+        if self.size_history is None:
+            if self.parent is not None:
+                self.size_history = self.parent.load_size_history()
+            elif self.settings.output_directory is not None:
+                self.size_history = SizeHistory(self.settings.output_directory / WORK_DIR_NAME / SIZE_HISTORY_FILE_NAME)
+        return self.size_history
+    
+    def preflight_disk_space(self):
+        """Compare the predicted size of all queued mods against the free space."""
+        if self.settings.output_directory is None:
+            return
+        try:
+            mods = self.job_queue.pending_paths(self.lane)
+            predicted = sum(self.predicted_size(mod_path) for mod_path in mods)
+            free = shutil.disk_usage(self.settings.output_directory).free
+            self.logger.info(f"Predicted output size: {format_bytes(predicted)} for {len(mods)} mods, "
+                             f"free space: {format_bytes(free)}")
+            if predicted + DISK_SPACE_RESERVE > free:
+                self.logger.warning("The output drive may not have enough space for all queued mods. "
+                                    "Processing will pause before any mod that does not fit.")
+        except Exception as e:
+            self.logger.error(f"Error predicting output size: {e}")
+    
+    async def wait_for_disk_space(self, mod_path: Path) -> bool:
+        """Wait until the output drive has room for a mod. Returns False if stopped while waiting."""
+        if self.settings.output_directory is None:
+            return True
+        required = await asyncio.to_thread(self.predicted_size, mod_path) + DISK_SPACE_RESERVE
+        # mods are converted in the scratch directory and then take up the same space in the output directory
+        directories = [d for d in (self.settings.output_directory, self.settings.scratch_directory) if d is not None]
+        paused = False
+        while not self.should_stop:
+            try:
+                # mods that are still converting will need their share too
+                free = min(shutil.disk_usage(d).free for d in directories) - self.reserved_bytes
+            except OSError:
+                free = required
+            if free >= required:
+                if paused:
+                    self.logger.info("Enough disk space available, resuming.")
+                    self.emit(EVENT_PAUSED, paused=False)
+                return True
+            if not paused:
+                paused = True
+                reason = (f"Low disk space: {mod_path.name} needs about {format_bytes(required)}, "
+                          f"{format_bytes(free)} free")
+                self.logger.warning(f"{reason}. Paused until space is freed.")
+                self.emit(EVENT_PAUSED, paused=True, message=reason)
+            await self.sleep(DISK_SPACE_POLL_SECONDS)
+        return False
+    
+    def deduplicate_outputs(self):
+        """Hardlink identical files across all output folders."""
+        if self.settings.output_directory is None or not self.settings.output_directory.is_dir():
+            return
+        self.logger.info("Deduplicating output files...")
+        try:
+            result = deduplicate_outputs(self.settings.output_directory, self.logger)
+            self.stats.deduplicated_files += result.files_linked
+            self.stats.reclaimed_bytes += result.bytes_reclaimed
+            self.logger.info(
+                f"Deduplication: scanned {result.files_scanned} files, hashed {result.files_hashed}, "
+                f"linked {result.files_linked} duplicates, reclaimed {format_bytes(result.bytes_reclaimed)}."
+            )
         except Exception as e:
-            self.logger.error(f"Critical error during processing: {e}")
-            self.signals.error.emit(str(e))
-        finally:
-            self.stats.end_time = datetime.now()
-            self.logger.info(self.stats.get_summary())
-            self.signals.finished.emit(self.stats)
+            self.logger.error(f"Error deduplicating outputs: {e}")
+    
+    # ─────────────────────────────────────────────────────────────────────
+    # Mod processing
+    # ─────────────────────────────────────────────────────────────────────
     
-    def process_mod(self, mod_path: Path) -> bool:
-        """Process a single mod. Returns True on success."""
+    def prepare_mod(self, mod_path: Path, job: Optional[Job] = None) -> Optional[PreparedMod]:
+        """Create the output folder, sanitize texture names, plan and stage a mod. Returns None to skip it."""
         mod_name = mod_path.name
-        self.logger.info(f"Processing: {mod_name}")
+        if self.settings.output_directory is None or not self.settings.output_directory.is_dir():
+            raise RuntimeError("Output directory is not set.")
         
-        try:
-            if self.settings.output_directory is None or not self.settings.output_directory.is_dir():
-                self.logger.error("Output directory is not set.")
-                return False
-    
+        # a variant's mod has been checked and sanitized by the engine of its settings matrix
+        if self.parent is None:
             # Find textures folder
-            textures_paths = [p for p in mod_path.iterdir() if p.is_dir() and p.name.lower() == 'textures']
+            textures_paths = PATH_INDEX.find_dirs(mod_path, 'textures')
             if not textures_paths:
                 self.logger.warning(f"No textures folder found in {mod_name}")
                 self.stats.skipped_mods += 1
-                return False
-            
-            output_path = self.settings.output_directory / f'{mod_name} PBR'
-            
-            # Check if already processed
-            if output_path is not None and output_path.is_dir():
-                self.logger.info(f"{mod_name} already processed, skipping.")
+                return None
+            self.report_case_collisions(mod_path)
+        if self.variant_engines:
+            return self.prepare_variants(mod_path, job)
+        
+        output_path = self.output_path(mod_path)
+        manifest = OutputManifest.load(output_path) if output_path.is_dir() else None
+        
+        # Check if already processed
+        if output_path is not None and output_path.is_dir() and manifest is None:
+            self.logger.info(f"{mod_name} already processed, skipping.")
+            if self.parent is None:  # a matrix counts a mod once, when no variant has work left
                 self.stats.skipped_mods += 1
-                return False
-            
-            # Create output directory
+            return None
+        
+        # Create output directory
+        final_path = None
+        if self.settings.scratch_directory is not None:
+            # create_pbr.exe writes to the scratch directory, the final folder only ever gets whole mods
+            final_path, output_path = output_path, self.scratch_output_path(mod_path)
+            if output_path.exists():
+                shutil.rmtree(output_path)  # left behind by an interrupted run
+            os.makedirs(output_path)
+            if manifest is None:
+                manifest = OutputManifest(output_path)
+            if job is not None:
+                self.remember_output(job, output_path)
+        elif manifest is None:
             os.makedirs(output_path, exist_ok=False) # explicitly fail if the directory exists to avoid overwriting in case of an error
-            
-            # Sanitize texture names
+            manifest = OutputManifest(output_path)
+            if job is not None:
+                # remember the folder we created so an interrupted job can clean it up
+                self.remember_output(job, output_path)
+            if self.shared_jobs is not None:
+                self.shared_jobs.mark_output_created(mod_name)
+        
+        # Sanitize texture names
+        if self.parent is None:
             self.sanitize_textures(mod_path)
+        
+        # Plan after renaming so the staged paths match the files on disk
+        plan = self.plan_mod(mod_path, refresh=True)
+        if not plan.has_work:
+            self.logger.info(f"{mod_name} has no textures left to convert, skipping.")
+            if final_path is not None:
+                shutil.rmtree(output_path, ignore_errors=True)
+            if self.parent is None:
+                self.stats.skipped_mods += 1
+            return None
+        if plan.update:
+            self.logger.info(f"{mod_name}: updating {len(plan.pairs)} pairs, {plan.current_pairs} unchanged, "
+                             f"{len(plan.removed_keys)} removed.")
+            if final_path is None:  # with a scratch directory they go once the new outputs are committed
+                for rel in plan.stale_outputs:
+                    (output_path / rel).unlink(missing_ok=True)
+            for key in plan.removed_keys:
+                manifest.entries.pop(key, None)
+        if plan.overridden_pairs:
+            self.logger.info(f"{mod_name}: {plan.overridden_pairs} of {plan.total_pairs} pairs are overridden by other mods.")
+            self.stats.overridden_textures += plan.overridden_pairs
+        if plan.covered_pairs:
+            self.logger.info(f"{mod_name}: {plan.covered_pairs} of {plan.total_pairs} pairs "
+                             f"({100 * plan.covered_pairs // plan.total_pairs}%) already have PBR textures.")
+            self.stats.covered_textures += plan.covered_pairs
+        if plan.filtered:
+            self.logger.info(f"{mod_name}: {plan.filtered_pairs} of {plan.total_pairs} pairs are filtered out by "
+                             f"the texture policy ({', '.join(f'{n} {r}' for r, (n, _) in plan.filtered.items())}).")
+            self.stats.filtered_textures += plan.filtered_pairs
+            self.stats.trivial_textures += plan.filtered.get(FILTER_TRIVIAL, (0, 0))[0]
+        if plan.trivial:
+            self.logger.info(f"{mod_name}: {len(plan.trivial)} of {plan.total_pairs} pairs have constant textures, "
+                             "their PBR maps are synthesized.")
+            for pair, diffuse_colour, normal_colour in plan.trivial:
+                self.logger.debug(f"{mod_name}: {pair.diffuse.relative_to(mod_path).as_posix()} is constant, "
+                                  f"diffuse {diffuse_colour}, normal {normal_colour}")
+        
+        input_path = mod_path
+        if plan.pairs and plan.needs_staging and self.parent is None:  # variants are staged when their turn comes
+            input_path = self.staging_path(mod_path)
+            count = stage_texture_pairs(mod_path, plan.pairs, input_path)
+            self.logger.debug(f"Staged {count} files for {mod_name} in {input_path}")
+        
+        return PreparedMod(mod_path=mod_path, output_path=output_path, manifest=manifest, plan=plan,
+                           input_path=input_path, final_path=final_path)
+    
+    def prepare_variants(self, mod_path: Path, job: Optional[Job] = None) -> Optional[PreparedMod]:
+        """Sanitize a mod once and prepare it for every variant with work left on it. Returns None to skip it."""
+        self.sanitize_textures(mod_path)
+        variants = []
+        for engine in self.variant_engines:
+            prepared = engine.prepare_mod(mod_path, job)
+            if prepared is not None:
+                variants.append((engine, prepared))
+        if not variants:
+            self.stats.skipped_mods += 1
+            return None
+        first = variants[0][1]
+        return PreparedMod(mod_path=mod_path, output_path=first.output_path, manifest=first.manifest,
+                           plan=first.plan, variants=variants)
+    
+    def remember_output(self, job: Job, output_path: Path):
+        """Record a folder a job created, so an interrupted job can clean it up."""
+        job.output_path = '\n'.join(filter(None, [job.output_path, str(output_path)]))
+        self.job_queue.update(job)
+    
+    async def convert_mod(self, prepared: PreparedMod) -> tuple:
+        """Run create_pbr.exe on a prepared mod, isolating failing textures if it fails.
+        
+        Returns whether the mod succeeded, its converted pairs and its quarantined pairs.
+        """
+        if prepared.variants is not None:
+            return await self.convert_variants(prepared)
+        mod_path, output_path, plan = prepared.mod_path, prepared.output_path, prepared.plan
+        success = True
+        converted = plan.pairs
+        quarantined = []
+        
+        if plan.trivial:
+            await asyncio.to_thread(self.synthesize_trivial, prepared)
+        
+        # Run create_pbr.exe (an update may only have had stale outputs to remove)
+        if plan.pairs:
+            result = await self.convert_pairs(mod_path, output_path, plan.pairs, input_path=prepared.input_path,
+                                              keep_input=prepared.keep_input)
+            success = result.success
+            skipped = result.skipped
             
-            # Run create_pbr.exe
-            success = self.run_create_pbr(mod_path, output_path, mod_name)
+            if not success and not self.should_stop and result.hung_on is not None:
+                success, converted, quarantined = await self.recover_from_hang(mod_path, output_path, plan.pairs,
+                                                                               result.hung_on)
             
-            if success:
-                self.logger.info(f"Finished processing: {mod_name}")
+            # Narrow a failure down to the textures that cause it instead of failing the whole mod
+            if not success and not self.should_stop and self.settings.max_bisect_runs > 0:
+                converted, bisected = await self.isolate_failures(mod_path, output_path, converted)
+                quarantined += bisected
+                success = len(converted) > 0 and not self.should_stop
             
+            # A zero exit code does not mean every map was written in full
+            if success and converted:
+                converted = await self.verify_converted(mod_path, output_path, converted, skipped)
+                success = len(converted) > 0
+        
+        if plan.trivial:
+            converted = converted + [pair for pair, _, _ in plan.trivial]
+        return success, converted, quarantined
+    
+    def synthesize_trivial(self, prepared: PreparedMod):
+        """Write the PBR maps of a mod's pairs with constant textures, instead of running create_pbr.exe on them."""
+        for pair, diffuse_colour, normal_colour in prepared.plan.trivial:
+            synthesize_pair_outputs(prepared.mod_path, prepared.output_path, pair, diffuse_colour, normal_colour,
+                                    self.settings.texture_format)
+        self.stats.trivial_textures += len(prepared.plan.trivial)
+        self.stats.synthesized_textures += len(prepared.plan.trivial)
+    
+    async def convert_variants(self, prepared: PreparedMod) -> tuple:
+        """Convert a mod with each variant in turn, recording every variant as soon as it is done.
+        
+        Variants that convert the same pairs share one staging folder.
+        Returns whether all variants succeeded, shaped like convert_mod's result.
+        """
+        mod_path = prepared.mod_path
+        staging_path = self.staging_path(mod_path)
+        staged = None  # pairs in the staging folder
+        success = True
+        try:
+            while prepared.variants and not self.should_stop:
+                engine, variant = prepared.variants.pop(0)
+                if variant.plan.pairs and variant.plan.needs_staging:
+                    # a retry of the previous variant may have staged other pairs and removed them
+                    if variant.plan.pairs != staged or not staging_path.is_dir():
+                        count = await asyncio.to_thread(stage_texture_pairs, mod_path, variant.plan.pairs, staging_path)
+                        engine.logger.debug(f"Staged {count} files for {mod_path.name} in {staging_path}")
+                        staged = variant.plan.pairs
+                    variant.input_path = staging_path
+                    variant.keep_input = True
+                
+                start = time.monotonic()
+                try:
+                    converted = await engine.convert_mod(variant)
+                except Exception as e:
+                    engine.logger.error(f"Error processing {mod_path.name}: {e}")
+                    converted = (False, [], [])
+                engine.cost.seconds += time.monotonic() - start
+                try:
+                    finished = await asyncio.to_thread(engine.finish_mod, variant, *converted)
+                except Exception as e:
+                    engine.logger.error(f"Error processing {mod_path.name}: {e}")
+                    finished = False
+                
+                if finished:
+                    engine.cost.mods += 1
+                    engine.cost.textures += len(converted[1])
+                elif not self.should_stop:
+                    engine.cost.failed_mods += 1
+                success = success and finished
+        finally:
+            await asyncio.to_thread(shutil.rmtree, staging_path, ignore_errors=True)
+        return success and not prepared.variants, [], []
+    
+    async def verify_converted(self, mod_path: Path, output_path: Path, pairs: list, skipped: list) -> list:
+        """Verify the outputs of converted pairs and reconvert the ones with gaps once.
+        
+        Pairs create_pbr.exe reported as skipped are not expected to have
+        outputs. Returns the pairs whose outputs are complete. Outputs of the
+        others are removed and the pairs are left out of the manifest, so the
+        next run converts just them again.
+        """
+        fmt = self.settings.texture_format
+        expected = [p for p in pairs if not any(pair_matches(mod_path, p, texture) for texture in skipped)]
+        gaps = await asyncio.to_thread(verify_outputs, mod_path, output_path, expected, fmt)
+        if not gaps:
+            return pairs
+        for pair, problems in gaps:
+            self.logger.debug(f"{mod_path.name}: {'; '.join(problems)}")
+        self.logger.warning(f"{mod_path.name}: {len(gaps)} of {len(pairs)} pairs have missing or damaged outputs, "
+                            "reconverting them.")
+        
+        incomplete = [pair for pair, _ in gaps]
+        await asyncio.to_thread(self.remove_outputs, mod_path, output_path, incomplete)
+        if not self.should_stop:
+            await self.convert_pairs(mod_path, output_path, incomplete, log_mode='a')
+            gaps = await asyncio.to_thread(verify_outputs, mod_path, output_path, incomplete, fmt)
+            incomplete = [pair for pair, _ in gaps]
+            await asyncio.to_thread(self.remove_outputs, mod_path, output_path, incomplete)
+        
+        if incomplete:
+            self.logger.warning(f"{mod_path.name}: {len(incomplete)} pairs are still incomplete, "
+                                "they will be converted again on the next run.")
+            self.stats.incomplete_textures += len(incomplete)
+        return [pair for pair in pairs if pair not in incomplete]
+    
+    def remove_outputs(self, mod_path: Path, output_path: Path, pairs: list):
+        """Delete every output map of the given pairs."""
+        for pair in pairs:
+            for rel in pbr_output_paths(mod_path, pair, self.settings.texture_format):
+                (output_path / rel).unlink(missing_ok=True)
+    
+    def finish_mod(self, prepared: PreparedMod, success: bool, converted: list, quarantined: list) -> bool:
+        """Record the result of a mod in its manifest and the run's bookkeeping."""
+        self.plans.pop(str(prepared.mod_path), None)
+        if prepared.variants is not None:
+            # converted variants are recorded right away, the ones left were never started
+            for engine, variant in prepared.variants:
+                engine.finish_mod(variant, False, [], [])
             return success
-            
-        except Exception as e:
-            self.logger.error(f"Error processing {mod_name}: {e}")
+        mod_path, output_path, plan, manifest = prepared.mod_path, prepared.output_path, prepared.plan, prepared.manifest
+        # the manifest of an updated mod stays in its final folder
+        committed_update = prepared.final_path is not None and plan.update
+        for pair in quarantined:
+            manifest.record_quarantined(mod_path, pair, self.settings)
+        if quarantined:
+            self.write_quarantine_report(prepared.final_path if committed_update else output_path, mod_path, quarantined)
+        
+        if not success:
+            if prepared.final_path is not None:
+                shutil.rmtree(output_path, ignore_errors=True)
             return False
+        
+        written = 0
+        synthesized = {pair_key(mod_path, pair) for pair, _, _ in plan.trivial}
+        for pair in converted:
+            manifest.record(mod_path, pair, self.settings, output_path, pair_key(mod_path, pair) in synthesized)
+            for rel in manifest.entries[pair_key(mod_path, pair)]['outputs']:
+                written += (output_path / rel).stat().st_size
+        self.stats.written_bytes += written
+        if self.cost is not None:
+            self.cost.written_bytes += written
+        if not committed_update:
+            manifest.save()
+        if self.size_history is not None and not plan.update:
+            self.size_history.record(self.settings.texture_format, self.predicted_size(mod_path),
+                                     directory_size(output_path))
+        if prepared.final_path is not None:
+            self.commit_output(prepared)
+            output_path = prepared.final_path
+            if committed_update:
+                manifest.save()  # only once the outputs it lists are in place
+        if plan.update:
+            self.stats.updated_mods += 1
+        self.logger.info(f"Finished processing: {mod_path.name}")
+        if self.coverage_index is not None:
+            # later mods providing the same textures are covered now
+            self.coverage_index.add_mod(output_path)
+        
+        return True
+    
+    def commit_output(self, prepared: PreparedMod):
+        """Move the verified output of a mod from the scratch directory to the output directory."""
+        start = time.monotonic()
+        commit_path = self.settings.output_directory / WORK_DIR_NAME / COMMIT_DIR_NAME / prepared.final_path.name
+        # outputs of changed and removed pairs that were not converted again
+        stale = [rel for rel in prepared.plan.stale_outputs if not (prepared.output_path / rel).is_file()]
+        copied = commit_output(prepared.output_path, prepared.final_path, commit_path)
+        for rel in stale:
+            (prepared.final_path / rel).unlink(missing_ok=True)
+        if copied:
+            self.logger.debug(f"Copied {prepared.mod_path.name} to the output directory "
+                              f"in {time.monotonic() - start:.1f}s")
+    
+    def staging_path(self, mod_path: Path) -> Path:
+        return self.settings.output_directory / WORK_DIR_NAME / STAGING_DIR_NAME / mod_path.name
+    
+    def scratch_output_path(self, mod_path: Path) -> Path:
+        return self.settings.scratch_directory / self.output_folder_name(mod_path)
+    
+    async def convert_pairs(self, mod_path: Path, output_path: Path, pairs: list, staged: bool = True,
+                            log_mode: str = 'w', input_path: Optional[Path] = None,
+                            keep_input: bool = False) -> ChildResult:
+        """Run create_pbr.exe on the given pairs of a mod, staging them if needed.
+        
+        An input_path staged ahead of time is used as is. A staging folder is
+        removed once create_pbr.exe is done with it, unless keep_input is set.
+        """
+        if input_path is None:
+            input_path = mod_path
+            if staged:
+                input_path = self.staging_path(mod_path)
+                count = await asyncio.to_thread(stage_texture_pairs, mod_path, pairs, input_path)
+                self.logger.debug(f"Staged {count} files for {mod_path.name} in {input_path}")
+        try:
+            return await self.run_create_pbr(input_path, output_path, mod_path.name, log_mode)
+        finally:
+            if input_path != mod_path and not keep_input:
+                await asyncio.to_thread(shutil.rmtree, input_path, ignore_errors=True)
+    
+    async def recover_from_hang(self, mod_path: Path, output_path: Path, pairs: list, hung_on: str) -> tuple:
+        """Quarantine the texture a hung run was stuck on and retry the rest once.
+        
+        Returns whether the retry succeeded, the pairs to keep converting or
+        recording, and the quarantined pairs.
+        """
+        hung = [p for p in pairs if pair_matches(mod_path, p, hung_on)]
+        if not hung:
+            return False, pairs, []
+        fmt = self.settings.texture_format
+        
+        hung = hung[:1]
+        self.remove_outputs(mod_path, output_path, hung)
+        self.stats.quarantined_textures += 1
+        self.logger.warning(f"{mod_path.name}: quarantined {hung[0].diffuse.name}, create_pbr.exe hung on it.")
+        
+        rest = [p for p in pairs if p is not hung[0]]
+        remaining = [p for p in rest if not pair_finished(mod_path, output_path, p, fmt)]
+        if not remaining:
+            return True, rest, hung
+        self.logger.info(f"{mod_path.name}: retrying the {len(remaining)} remaining pairs.")
+        result = await self.convert_pairs(mod_path, output_path, remaining, log_mode='a')
+        return result.success, rest, hung
+    
+    async def isolate_failures(self, mod_path: Path, output_path: Path, pairs: list) -> tuple:
+        """Bisect the pairs of a failed run until the failing textures are isolated.
+        
+        Pairs whose outputs were all written before the failure count as good.
+        The rest is split in halves and rerun, depth first, until a failing half
+        is a single pair, which is quarantined. At most max_bisect_runs reruns
+        are made; pairs that are still unresolved after that are left out.
+        Returns the good pairs and the quarantined pairs.
+        """
+        fmt = self.settings.texture_format
+        
+        def finished(pair: TexturePair) -> bool:
+            return pair_finished(mod_path, output_path, pair, fmt)
+        
+        def halves(group: list) -> list:
+            middle = (len(group) + 1) // 2
+            return [g for g in (group[:middle], group[middle:]) if g]
+        
+        good = [p for p in pairs if finished(p)]
+        suspects = [p for p in pairs if not finished(p)]
+        bad = []
+        unresolved = []
+        runs = 0
+        self.logger.warning(f"{mod_path.name}: create_pbr.exe failed, isolating the failing textures "
+                            f"among {len(suspects)} of {len(pairs)} pairs...")
+        
+        groups = halves(suspects)
+        while groups and not self.should_stop:
+            group = groups.pop(0)
+            if runs >= self.settings.max_bisect_runs:
+                unresolved.extend(group)
+                continue
+            runs += 1
+            if (await self.convert_pairs(mod_path, output_path, group, log_mode='a')).success:
+                good.extend(group)
+                continue
+            good.extend(p for p in group if finished(p))
+            rest = [p for p in group if not finished(p)]
+            if len(rest) == 1:
+                bad.extend(rest)
+            elif rest:
+                groups[0:0] = halves(rest)
+        
+        # Partial outputs of pairs that never converted are removed
+        self.remove_outputs(mod_path, output_path, bad + unresolved)
+        
+        if bad:
+            self.logger.warning(f"{mod_path.name}: quarantined {len(bad)} textures that create_pbr.exe fails on.")
+            self.stats.quarantined_textures += len(bad)
+        if unresolved:
+            self.logger.warning(f"{mod_path.name}: gave up on {len(unresolved)} pairs after {runs} retries, "
+                                "they will be retried on the next run.")
+        return good, bad
+    
+    def write_quarantine_report(self, output_path: Path, mod_path: Path, pairs: list):
+        """List quarantined pairs in the output folder."""
+        try:
+            with open(output_path / QUARANTINE_FILE_NAME, 'a', encoding='utf-8') as f:
+                f.write(f"# {datetime.now().isoformat(timespec='seconds')}: create_pbr.exe failed on these textures\n")
+                for pair in pairs:
+                    f.write(f"{pair.diffuse.relative_to(mod_path).as_posix()}\t{pair.normal.relative_to(mod_path).as_posix()}\n")
+        except Exception as e:
+            self.logger.error(f"Error writing quarantine report: {e}")
     
     def sanitize_textures(self, mod_path: Path):
         """Sanitize texture file names."""
         try:
-            all_textures = list(mod_path.rglob('*.dds', case_sensitive=False))
-            for texture_path in all_textures:
-                if texture_path.is_file():
-                    sanitized_name = fix_suffix_case(texture_path.name, ALLOWED_SUFFIXES)
-                    if sanitized_name != texture_path.name:
-                        new_path = texture_path.with_name(sanitized_name)
-                        self.logger.debug(f"Renaming: {texture_path} -> {sanitized_name}")
-                        os.rename(texture_path, new_path)
-                        self.stats.renamed_files += 1
+            renamed_in = []
+            for directory, listing in PATH_INDEX.walk(mod_path):
+                for folded, name in listing.files.items():
+                    # renaming one of several case variants would overwrite another
+                    if folded.endswith('.dds') and folded not in listing.collisions:
+                        sanitized_name = fix_suffix_case(name, ALLOWED_SUFFIXES)
+                        if sanitized_name != name:
+                            texture_path = directory / name
+                            self.logger.debug(f"Renaming: {texture_path} -> {sanitized_name}")
+                            os.rename(texture_path, directory / sanitized_name)
+                            self.stats.renamed_files += 1
+                            renamed_in.append(directory)
+            for directory in renamed_in:
+                PATH_INDEX.invalidate(directory)
         except Exception as e:
             self.logger.error(f"Error sanitizing textures: {e}")
     
-    def run_create_pbr(self, mod_path: Path, output_path: Path, mod_name: str) -> bool:
+    # ─────────────────────────────────────────────────────────────────────
+    # create_pbr.exe children
+    # ─────────────────────────────────────────────────────────────────────
+    
+    def texture_timeout(self, texture: Path, input_path: Path) -> float:
+        """Get the watchdog timeout for one texture, scaled by its size."""
+        if self.settings.texture_timeout <= 0:
+            return 0
+        info = read_dds_header(texture if texture.is_absolute() else input_path / texture)
+        megapixels = info.pixels / 1_000_000 if info is not None else 0
+        return self.settings.texture_timeout + TEXTURE_TIMEOUT_PER_MEGAPIXEL * megapixels
+    
+    async def run_create_pbr(self, mod_path: Path, output_path: Path, mod_name: str, log_mode: str = 'w') -> ChildResult:
         """Run create_pbr.exe on a mod."""
+        process = None
+        acquired = False
         try:
             # check paths for sanity
             if self.settings.create_pbr_path is None or not self.settings.create_pbr_path.is_file() or not self.settings.create_pbr_path.name.lower() == 'create_pbr.exe':
                 self.logger.error("create_pbr.exe path is not set or invalid.")
-                return False
+                return ChildResult(False)
             if self.settings.mods_directory is None or not self.settings.mods_directory.is_dir():
                 self.logger.error(f"Mod path is invalid: {mod_path}")
-                return False
+                return ChildResult(False)
             if self.settings.output_directory is None or not self.settings.output_directory.is_dir():
                 self.logger.error(f"Output path is invalid: {output_path}")
-                return False
+                return ChildResult(False)
+            if self.should_stop:
+                return ChildResult(False)
+            if self.load_controller is not None:
+                acquired = await self.load_controller.acquire(self.stop_event)
+                if not acquired:
+                    return ChildResult(False)
             cmd = [
                 str(self.settings.create_pbr_path.resolve()),
                 '--input_dir', str(mod_path.resolve()),
@@ -750,33 +4471,83 @@ class ProcessorWorker(QThread):
                 '--create_jsons', 'true'
             ]
             
-            self.current_process = subprocess.Popen(
-                cmd,
-                bufsize=1,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                limit=CHILD_LINE_LIMIT,
+                start_new_session=(os.name != 'nt')  # own process group, so the whole tree can be killed
             )
+            self.children.add(process)
+            if self.load_controller is not None and self.load_controller.suspended:
+                suspend_process_tree(process, True)  # suspended while it was starting
             
-            if self.current_process.stdout is None:
+            if process.stdout is None:
                 self.logger.error("Failed to create pipe for create_pbr.exe")
-                return False
+                return ChildResult(False)
             
             # Create mod-specific log
             mod_log_path = output_path / f'{mod_name}_LOG.txt'
+            child_log_level = CHILD_LOG_LEVELS[self.settings.child_log_level]
+            encoding = locale.getpreferredencoding(False)
             texture_count = 0
             processed_count = 0
+            skipped = []
+            last_output = time.monotonic()
+            texture_started = last_output
+            texture_timeout = self.settings.texture_timeout
+            current_texture = None
             
-            with open(mod_log_path, 'w', encoding='utf-8') as mod_log:
-                while self.current_process.poll() is None:
+            with open(mod_log_path, log_mode, encoding='utf-8') as mod_log:
+                while True:
                     if self.should_stop:
-                        self.current_process.terminate()
-                        return False
+                        kill_process_tree(process)
+                        await process.wait()
+                        return ChildResult(False)
                     
-                    line = self.current_process.stdout.readline().strip()
+                    # Watchdog: sleep until the next deadline unless a line arrives first
+                    deadlines = []
+                    if self.settings.no_output_timeout > 0:
+                        deadlines.append(last_output + self.settings.no_output_timeout)
+                    if texture_timeout > 0:
+                        deadlines.append(texture_started + texture_timeout)
+                    timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                    
+                    try:
+                        raw = await asyncio.wait_for(process.stdout.readline(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        now = time.monotonic()
+                        if self.load_controller is not None and self.load_controller.interrupted_since(texture_started):
+                            # the time it was suspended for the system load does not count
+                            last_output = texture_started = now
+                            continue
+                        if self.settings.no_output_timeout > 0 and now - last_output >= self.settings.no_output_timeout:
+                            reason = f"no output for {self.settings.no_output_timeout}s"
+                        else:
+                            reason = f"no progress for {int(texture_timeout)}s"
+                        self.logger.error(f"create_pbr.exe hung on {mod_name} ({reason}), "
+                                          f"last texture: {current_texture or 'unknown'}. Killing it.")
+                        mod_log.write(f"PBRify: killed hung create_pbr.exe ({reason}), last texture: {current_texture}\n")
+                        kill_process_tree(process)
+                        await process.wait()
+                        self.stats.hung_processes += 1
+                        return ChildResult(False, hung_on=current_texture or '')
+                    
+                    if not raw:
+                        break
+                    line = raw.decode(encoding, errors='replace').strip()
+                    last_output = time.monotonic()
                     if line:
                         mod_log.write(line + '\n')
-                        self.logger.debug(line)
+                        if child_log_level:
+                            self.logger.log(child_log_level, line)
+                        
+                        match = DDS_PATH_REGEX.search(line)
+                        if match:
+                            # a new texture is being worked on, scale its timeout by its size
+                            current_texture = match.group(1)
+                            texture_started = last_output
+                            texture_timeout = self.texture_timeout(Path(current_texture), mod_path)
                         
                         if ': found' in line:
                             match = DIGITS_AT_END_REGEX.search(line)
@@ -786,21 +4557,262 @@ class ProcessorWorker(QThread):
                         elif 'PBR inference complete' in line:
                             processed_count += 1
                             self.stats.processed_textures += 1
+                            texture_started = last_output
                             if texture_count > 0:
-                                self.signals.mod_progress.emit(processed_count, texture_count)
+                                self.emit(EVENT_MOD_PROGRESS, current=processed_count, total=texture_count,
+                                          mod_name=mod_name)
                         elif ' Skipping ' in line:
                             texture_count -= 1
                             self.stats.skipped_textures += 1
+                            if match:
+                                skipped.append(match.group(1))
             
-            self.current_process.wait()
-            return_code = self.current_process.returncode
-            self.current_process = None
+            return_code = await process.wait()
+            if self.should_stop:
+                return ChildResult(False)
             
-            return return_code == 0 or return_code is None
+            return ChildResult(return_code == 0 or return_code is None, skipped=skipped)
             
         except Exception as e:
             self.logger.error(f"Error running create_pbr.exe: {e}")
+            return ChildResult(False)
+        finally:
+            if process is not None:
+                if process.returncode is None:
+                    # left running by an error or cancellation, it would go on writing into a failed output
+                    kill_process_tree(process)
+                    await process.wait()
+                self.children.discard(process)
+            if acquired:
+                self.load_controller.release()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROCESSOR WORKER THREAD
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ProcessorWorker(QThread):
+    """Worker thread that runs a ConversionEngine and forwards its events as Qt signals."""
+    
+    def __init__(self, settings: Settings, logger: logging.Logger,
+                 job_queue: Optional[JobQueue] = None, lane: Optional[str] = None,
+                 mods: Optional[list] = None):
+        super().__init__()
+        self.engine = ConversionEngine(settings, logger, job_queue, lane, mods)
+        self.signals = WorkerSignals()
+    
+    @property
+    def stats(self) -> ProcessingStats:
+        return self.engine.stats
+    
+    @property
+    def should_stop(self) -> bool:
+        return self.engine.should_stop
+    
+    def stop(self):
+        """Request to stop processing."""
+        self.engine.stop()
+    
+    def run(self):
+        """Run the engine on this thread's own event loop."""
+        asyncio.run(self.forward_events())
+    
+    async def forward_events(self):
+        events = self.engine.events()
+        engine_task = asyncio.create_task(self.engine.run())
+        async for event in events:
+            if event.kind == EVENT_PROGRESS:
+                self.signals.progress.emit(event.current, event.total, event.mod_name)
+            elif event.kind == EVENT_TOTAL:
+                self.signals.total.emit(event.current, event.total)
+            elif event.kind == EVENT_MOD_PROGRESS:
+                self.signals.mod_progress.emit(event.current, event.total)
+            elif event.kind == EVENT_PAUSED:
+                self.signals.paused.emit(event.paused, event.message)
+            elif event.kind == EVENT_ERROR:
+                self.signals.error.emit(event.message)
+            elif event.kind == EVENT_FINISHED:
+                self.signals.finished.emit(event.stats)
+        await engine_task
+
+class ScanWorker(QThread):
+    """Worker thread that scans the library for the scan results table.
+    
+    Results and progress are batched, so a large library does not flood the
+    GUI thread with one signal per folder.
+    """
+    
+    def __init__(self, settings: Settings, logger: logging.Logger):
+        super().__init__()
+        self.engine = ConversionEngine(settings, logger)
+        self.signals = ScanSignals()
+    
+    def stop(self):
+        """Request to cancel the scan."""
+        self.engine.stop()
+    
+    def run(self):
+        pending = []
+        found = 0
+        visited = total = 0
+        last_report = 0.0
+        
+        def report(force: bool = False):
+            nonlocal pending, last_report
+            if not force and time.monotonic() - last_report < SCAN_REPORT_INTERVAL:
+                return
+            last_report = time.monotonic()
+            if pending:
+                self.signals.results.emit(pending)
+                pending = []
+            self.signals.progress.emit(visited, total, found)
+        
+        def progress(folders_visited: int, folders: int):
+            nonlocal visited, total
+            visited, total = folders_visited, folders
+            report()
+        
+        completed = False
+        try:
+            for mod_path in self.engine.iter_mods_to_process(progress):
+                pending.append(self.engine.describe_mod(mod_path))
+                found += 1
+            completed = not self.engine.should_stop
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        report(force=True)
+        self.signals.finished.emit(completed)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SCAN RESULTS TABLE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+SCAN_COLUMNS = [
+    # header, sort key
+    ("Mod", lambda r: r.mod_path.name.lower()),
+    ("Textures", lambda r: r.textures),
+    ("Cost (MP)", lambda r: r.pixels),
+    ("Output Size", lambda r: r.output_size),
+    ("Status", lambda r: r.status),
+]
+
+
+class ScanResultsModel(QAbstractTableModel):
+    """Table of the mods found by a scan, with a checkbox to include each one.
+    
+    Cells are only formatted when the view paints them, so the table stays
+    responsive with tens of thousands of mods. Sorting reorders the records
+    themselves instead of going through a proxy's per-row comparisons.
+    """
+    
+    included_changed = Signal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.results: list[ScanResult] = []
+    
+    def set_results(self, results: list):
+        self.beginResetModel()
+        self.results = results
+        self.endResetModel()
+        self.included_changed.emit()
+    
+    def append_results(self, results: list):
+        self.beginInsertRows(QModelIndex(), len(self.results), len(self.results) + len(results) - 1)
+        self.results.extend(results)
+        self.endInsertRows()
+        self.included_changed.emit()
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.results)
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(SCAN_COLUMNS)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return SCAN_COLUMNS[section][0]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        result = self.results[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return result.mod_path.name
+            if column == 1:
+                return str(result.textures)
+            if column == 2:
+                return f"{result.pixels / 1_000_000:.1f}"
+            if column == 3:
+                return format_bytes(result.output_size)
+            return result.status
+        if role == Qt.ItemDataRole.CheckStateRole and column == 0:
+            return Qt.CheckState.Checked if result.included else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.TextAlignmentRole and column in (1, 2, 3):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ForegroundRole and not result.included:
+            return QColor('#6a6a6a')
+        return None
+    
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == 0:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+    
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.CheckStateRole or index.column() != 0:
             return False
+        self.set_included([index.row()], Qt.CheckState(value) == Qt.CheckState.Checked)
+        return True
+    
+    def set_included(self, rows: list, included: bool):
+        """Include or exclude many rows with a single update of the view."""
+        for row in rows:
+            self.results[row].included = included
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), len(SCAN_COLUMNS) - 1))
+        self.included_changed.emit()
+    
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        moved = [self.results[index.row()] for index in old]
+        self.results.sort(key=SCAN_COLUMNS[column][1], reverse=order == Qt.SortOrder.DescendingOrder)
+        rows = {id(result): row for row, result in enumerate(self.results)}
+        self.changePersistentIndexList(old, [self.index(rows[id(result)], index.column())
+                                             for result, index in zip(moved, old)])
+        self.layoutChanged.emit()
+    
+    def included(self) -> list:
+        return [result for result in self.results if result.included]
+
+
+class ScanResultsFilter(QSortFilterProxyModel):
+    """Filters scan results by mod name or status and leaves sorting to the model."""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ''
+    
+    def set_text(self, text: str):
+        self.text = text.strip().lower()
+        self.invalidateFilter()
+    
+    def filterAcceptsRow(self, source_row, source_parent) -> bool:
+        if not self.text:
+            return True
+        result = self.sourceModel().results[source_row]
+        return self.text in result.mod_path.name.lower() or self.text == result.status.lower()
+    
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+    
+    def source_rows(self) -> list:
+        """Get the model rows that pass the filter."""
+        return [self.mapToSource(self.index(row, 0)).row() for row in range(self.rowCount())]
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # MAIN WINDOW
@@ -820,8 +4832,17 @@ class PBRifyWindow(QMainWindow):
         self.config_path = Path.cwd() / CONFIG_FILE_NAME
         self.settings = Settings.load(self.config_path)
         
-        # Worker thread
+        # Persistent job queue
+        self.job_queue = JobQueue(Path.cwd() / QUEUE_FILE_NAME)
+        
+        # Worker threads
         self.worker: Optional[ProcessorWorker] = None
+        self.priority_worker: Optional[ProcessorWorker] = None
+        self.scan_worker: Optional[ScanWorker] = None
+        
+        # Results of the last scan, used by Start Processing while the settings are unchanged
+        self.scan_model = ScanResultsModel()
+        self.scan_settings: Optional[dict] = None
         
         # Setup logging signals
         self.log_signals = LogSignals()
@@ -834,6 +4855,13 @@ class PBRifyWindow(QMainWindow):
         self.logger = setup_logging(self.log_signals)
         self.logger.info("PBRify initialized.")
         
+        recovered = self.job_queue.recover()
+        for job in recovered:
+            self.logger.warning(f"Requeued interrupted job: {job.mod_name}")
+        pending = self.job_queue.pending_count()
+        if pending > 0:
+            self.logger.info(f"{pending} mods are waiting in the queue. Click 'Start Processing' to resume.")
+        
     def setup_ui(self):
         """Setup the user interface."""
         # Central widget
@@ -937,6 +4965,23 @@ class PBRifyWindow(QMainWindow):
         pbr_browse_btn.clicked.connect(self.browse_create_pbr)
         paths_layout.addWidget(pbr_browse_btn, 2, 2)
 
+        # MO2 Profile (optional)
+        profile_label = QLabel("MO2 Profile:")
+        profile_label.setFixedWidth(110)
+        paths_layout.addWidget(profile_label, 3, 0, Qt.AlignmentFlag.AlignLeft)
+
+        self.mo2_profile_edit = QLineEdit()
+        self.mo2_profile_edit.setText(str(self.settings.mo2_profile or ""))
+        self.mo2_profile_edit.setPlaceholderText("Optional: modlist.txt of a profile, to convert only enabled mods and winning textures...")
+        self.mo2_profile_edit.setMinimumHeight(30)
+        paths_layout.addWidget(self.mo2_profile_edit, 3, 1)
+
+        profile_browse_btn = QPushButton("Browse...")
+        profile_browse_btn.setProperty("class", "secondary")
+        profile_browse_btn.setFixedWidth(90)
+        profile_browse_btn.clicked.connect(self.browse_mo2_profile)
+        paths_layout.addWidget(profile_browse_btn, 3, 2)
+
         paths_layout.setColumnStretch(0, 0)
         paths_layout.setColumnStretch(1, 1)
         paths_layout.setColumnStretch(2, 0)
@@ -987,6 +5032,35 @@ class PBRifyWindow(QMainWindow):
         info_label.setStyleSheet("color: #d19a66;")
         options_layout.addWidget(info_label, 1, 3, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
+        # Deduplication
+        self.dedup_check = QCheckBox("Hardlink identical output files after processing")
+        self.dedup_check.setChecked(self.settings.deduplicate_outputs)
+        self.dedup_check.setToolTip("Identical files in the output folders are replaced by hardlinks to a single copy.\n"
+                                    "Editing one linked file in place changes all of its copies.")
+        options_layout.addWidget(self.dedup_check, 2, 0, 1, 4, Qt.AlignmentFlag.AlignLeft)
+
+        # Coverage
+        self.skip_covered_check = QCheckBox("Skip textures that already have PBR versions in any mod or output")
+        self.skip_covered_check.setChecked(self.settings.skip_covered_textures)
+        self.skip_covered_check.setToolTip("Mods that ship their own textures/pbr folder are converted too,\n"
+                                           "but only for the textures that are not covered yet.")
+        options_layout.addWidget(self.skip_covered_check, 3, 0, 1, 4, Qt.AlignmentFlag.AlignLeft)
+
+        # Prefetch
+        self.prefetch_check = QCheckBox("Read the next mods' textures into memory ahead of time")
+        self.prefetch_check.setChecked(self.settings.prefetch_textures)
+        self.prefetch_check.setToolTip("Helps when the mods are stored on a hard drive.\n"
+                                       f"At most prefetch_budget_mb (config.txt, {self.settings.prefetch_budget_mb} MB) is read ahead.")
+        options_layout.addWidget(self.prefetch_check, 4, 0, 1, 4, Qt.AlignmentFlag.AlignLeft)
+
+        # Adaptive concurrency
+        self.adaptive_check = QCheckBox("Hold back or suspend create_pbr.exe while the PC is busy")
+        self.adaptive_check.setChecked(self.settings.adaptive_concurrency)
+        self.adaptive_check.setToolTip("Fewer processes run while the CPU is busy or someone is using the PC,\n"
+                                       "and they are suspended during full screen games or when memory runs low.\n"
+                                       "The thresholds are in config.txt.")
+        options_layout.addWidget(self.adaptive_check, 5, 0, 1, 4, Qt.AlignmentFlag.AlignLeft)
+
         main_layout.addWidget(options_group)
 
         # ─────────────────────────────────────────────────────────────────────
@@ -1066,6 +5140,15 @@ class PBRifyWindow(QMainWindow):
         self.start_btn.clicked.connect(self.start_processing)
         buttons_layout.addWidget(self.start_btn)
 
+        self.queue_btn = QPushButton("➕ Queue Mod")
+        self.queue_btn.setProperty("class", "secondary")
+        self.queue_btn.setMinimumHeight(35)
+        self.queue_btn.setMinimumWidth(120)
+        self.queue_btn.setToolTip("Queue a single mod with high priority.\n"
+                                  "If processing is running, it starts right away alongside the batch.")
+        self.queue_btn.clicked.connect(self.queue_mod)
+        buttons_layout.addWidget(self.queue_btn)
+
         self.stop_btn = QPushButton("⬛ Stop")
         self.stop_btn.setProperty("class", "danger")
         self.stop_btn.setMinimumHeight(35)
@@ -1085,6 +5168,62 @@ class PBRifyWindow(QMainWindow):
 
         main_layout.addWidget(buttons_widget)
 
+        # ─────────────────────────────────────────────────────────────────────
+        # Scan Results Section
+        # ─────────────────────────────────────────────────────────────────────
+        scan_group = QGroupBox("Scan Results")
+        scan_layout = QVBoxLayout(scan_group)
+        scan_layout.setContentsMargins(10, 20, 10, 10)
+        scan_layout.setSpacing(8)
+
+        scan_tools_layout = QHBoxLayout()
+        scan_tools_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.scan_filter_edit = QLineEdit()
+        self.scan_filter_edit.setPlaceholderText("Filter by mod name or status...")
+        self.scan_filter_edit.setMinimumHeight(28)
+        scan_tools_layout.addWidget(self.scan_filter_edit, 1)
+
+        include_btn = QPushButton("Include Shown")
+        include_btn.setProperty("class", "secondary")
+        include_btn.setMinimumHeight(28)
+        include_btn.clicked.connect(lambda: self.include_shown(True))
+        scan_tools_layout.addWidget(include_btn)
+
+        exclude_btn = QPushButton("Exclude Shown")
+        exclude_btn.setProperty("class", "secondary")
+        exclude_btn.setMinimumHeight(28)
+        exclude_btn.clicked.connect(lambda: self.include_shown(False))
+        scan_tools_layout.addWidget(exclude_btn)
+
+        scan_layout.addLayout(scan_tools_layout)
+
+        self.scan_filter = ScanResultsFilter()
+        self.scan_filter.setSourceModel(self.scan_model)
+        self.scan_filter_edit.textChanged.connect(self.scan_filter.set_text)
+
+        self.scan_table = QTableView()
+        self.scan_table.setModel(self.scan_filter)
+        self.scan_table.setSortingEnabled(True)
+        self.scan_table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)  # keep the scan order until a header is clicked
+        self.scan_table.setAlternatingRowColors(True)
+        self.scan_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.scan_table.setWordWrap(False)
+        self.scan_table.verticalHeader().hide()
+        # fixed row heights let the view skip measuring rows it does not show
+        self.scan_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.scan_table.verticalHeader().setDefaultSectionSize(22)
+        self.scan_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        for column in range(1, len(SCAN_COLUMNS)):
+            self.scan_table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeMode.Fixed)
+            self.scan_table.setColumnWidth(column, 95)
+        scan_layout.addWidget(self.scan_table, 1)
+
+        self.scan_summary_label = QLabel("Click 'Scan Mods' to list the mods that need processing.")
+        self.scan_summary_label.setStyleSheet("color: #808080;")
+        scan_layout.addWidget(self.scan_summary_label)
+        self.scan_model.included_changed.connect(self.update_scan_summary)
+
         # ─────────────────────────────────────────────────────────────────────
         # Log Section
         # ─────────────────────────────────────────────────────────────────────
@@ -1113,7 +5252,11 @@ class PBRifyWindow(QMainWindow):
 
         log_layout.addLayout(clear_btn_layout)
 
-        main_layout.addWidget(log_group, 1)
+        results_splitter = QSplitter(Qt.Orientation.Vertical)
+        results_splitter.setChildrenCollapsible(False)
+        results_splitter.addWidget(scan_group)
+        results_splitter.addWidget(log_group)
+        main_layout.addWidget(results_splitter, 1)
 
         # ─────────────────────────────────────────────────────────────────────
         # Status Bar
@@ -1122,6 +5265,25 @@ class PBRifyWindow(QMainWindow):
         self.setStatusBar(self.statusbar)
         self.statusbar.showMessage("Ready")
     
+    def update_scan_summary(self):
+        """Show how many scanned mods are included and what they add up to."""
+        if self.scan_settings is None:
+            return
+        included = self.scan_model.included()
+        textures = sum(result.textures for result in included)
+        size = sum(result.output_size for result in included)
+        self.scan_summary_label.setText(f"{len(included)} of {len(self.scan_model.results)} mods included, "
+                                        f"{textures} textures, about {format_bytes(size)} of output")
+    
+    def include_shown(self, included: bool):
+        """Include or exclude every scan result that passes the filter."""
+        self.scan_model.set_included(self.scan_filter.source_rows(), included)
+    
+    def clear_scan_results(self):
+        self.scan_settings = None
+        self.scan_model.set_results([])
+        self.scan_summary_label.setText("Click 'Scan Mods' to list the mods that need processing.")
+    
     def append_log(self, message: str):
         """Append a message to the log text widget."""
         self.log_text.append(message)
@@ -1163,6 +5325,18 @@ class PBRifyWindow(QMainWindow):
             else:
                 QMessageBox.critical(self, "Invalid File", "Please select create_pbr.exe")
     
+    def browse_mo2_profile(self):
+        """Browse for an MO2 profile's modlist.txt."""
+        initial = self.mo2_profile_edit.text() or str(self.settings.mods_directory or Path.cwd())
+        if initial and Path(initial).is_file():
+            initial = str(Path(initial).parent)
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Select modlist.txt", initial, "MO2 Mod List (modlist.txt)"
+        )
+        if path:
+            self.mo2_profile_edit.setText(path)
+            self.logger.info(f"MO2 profile set to: {path}")
+    
     def update_settings_from_ui(self):
         """Update settings from UI values."""
         mods_dir = self.mods_dir_edit.text()
@@ -1186,6 +5360,13 @@ class PBRifyWindow(QMainWindow):
         self.settings.checkpoint = self.checkpoint_combo.currentText()
         self.settings.texture_format = self.format_combo.currentText()
         self.settings.max_tile_size = self.tile_combo.currentText()
+        self.settings.deduplicate_outputs = self.dedup_check.isChecked()
+        self.settings.skip_covered_textures = self.skip_covered_check.isChecked()
+        self.settings.prefetch_textures = self.prefetch_check.isChecked()
+        self.settings.adaptive_concurrency = self.adaptive_check.isChecked()
+        
+        mo2_profile = self.mo2_profile_edit.text()
+        self.settings.mo2_profile = MO2Profile.find_modlist(Path(mo2_profile)) if mo2_profile else None
     
     def validate_settings(self) -> bool:
         """Validate current settings. Returns True if valid."""
@@ -1208,6 +5389,9 @@ class PBRifyWindow(QMainWindow):
             if self.settings.mods_directory.resolve() == self.settings.output_directory.resolve():
                 errors.append("• Mods directory and output directory cannot be the same!")
         
+        if self.mo2_profile_edit.text() and self.settings.mo2_profile is None:
+            errors.append("• MO2 profile must be a modlist.txt or a folder containing one.")
+        
         if errors:
             QMessageBox.critical(self, "Invalid Settings", "\n".join(errors))
             return False
@@ -1225,61 +5409,117 @@ class PBRifyWindow(QMainWindow):
             QMessageBox.critical(self, "Error", "Failed to save settings.")
     
     def scan_mods(self):
-        """Scan for mods that need processing."""
+        """Scan for mods that need processing on a worker thread."""
         if not self.validate_settings():
             return
             
         self.logger.info("Scanning for mods...")
         self.statusbar.showMessage("Scanning...")
-        QApplication.processEvents()
+        self.clear_scan_results()
+        self.scan_settings = asdict(self.settings)
         
-        try:
-            temp_worker = ProcessorWorker(self.settings, self.logger)
-            mods = temp_worker.get_mods_to_process()
-            
-            self.logger.info(f"Found {len(mods)} mods to process:")
-            for mod in mods:
-                self.logger.info(f"  → {mod.name}")
-            
-            self.overall_progress.setMaximum(max(len(mods), 1))
-            self.overall_progress.setValue(0)
-            self.overall_label.setText(f"0 / {len(mods)}")
-            
-            self.statusbar.showMessage(f"Found {len(mods)} mods to process.")
-            
-            if len(mods) == 0:
-                QMessageBox.information(self, "Scan Complete", 
-                    "No mods found that need processing.\n\n"
-                    "Mods are skipped if:\n"
-                    "• They don't have a 'textures' folder\n"
-                    "• They already have a 'pbr' folder\n"
-                    "• Diffuse and normal names do not match\n"
-                    "• Output already exists")
-            else:
-                QMessageBox.information(self, "Scan Complete", 
-                    f"Found {len(mods)} mods to process.\n\n"
-                    "Click 'Start Processing' to begin.")
-                
-        except Exception as e:
-            self.logger.error(f"Error scanning mods: {e}")
-            QMessageBox.critical(self, "Error", f"Error scanning mods:\n{e}")
+        # Update UI
+        self.start_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.scan_btn.setEnabled(False)
+        self.status_label.setText("● Scanning...")
+        self.status_label.setStyleSheet("color: #4fc1ff; font-weight: bold;")
+        self.overall_progress.setMaximum(0)  # busy until the number of folders is known
+        self.overall_progress.setValue(0)
+        self.overall_label.setText("")
+        
+        self.scan_worker = ScanWorker(self.settings, self.logger)
+        self.scan_worker.signals.progress.connect(self.on_scan_progress)
+        self.scan_worker.signals.results.connect(self.scan_model.append_results)
+        self.scan_worker.signals.error.connect(self.on_scan_error)
+        self.scan_worker.signals.finished.connect(self.on_scan_finished)
+        self.scan_worker.start()
+    
+    def on_scan_progress(self, visited: int, total: int, found: int):
+        """Handle scan progress updates."""
+        self.overall_progress.setMaximum(total)
+        self.overall_progress.setValue(visited)
+        self.overall_label.setText(f"{visited} / {total}")
+        self.statusbar.showMessage(f"Scanning: {visited} of {total} folders checked, {found} mods to process.")
+    
+    def on_scan_error(self, error_msg: str):
+        self.logger.error(f"Error scanning mods: {error_msg}")
+        QMessageBox.critical(self, "Error", f"Error scanning mods:\n{error_msg}")
+    
+    def on_scan_finished(self, completed: bool):
+        """Handle the end of a scan."""
+        self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.scan_btn.setEnabled(True)
+        self.scan_worker.wait()  # finished is its last signal, the thread is about to end
+        self.scan_worker = None
+        self.overall_progress.setMaximum(1)
+        self.overall_progress.setValue(0)
+        
+        if not completed:
+            # a partial list would silently leave mods out of the next run
+            self.clear_scan_results()
+            self.overall_label.setText("0 / 0")
+            self.status_label.setText("● Ready")
+            self.status_label.setStyleSheet("color: #4ec9b0; font-weight: bold;")
+            self.statusbar.showMessage("Scan cancelled.")
+            self.logger.warning("Scan cancelled.")
+            return
+        
+        mods = len(self.scan_model.results)
+        header = self.scan_table.horizontalHeader()
+        if header.sortIndicatorSection() >= 0:
+            # rows were appended in scan order
+            self.scan_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        
+        self.logger.info(f"Found {mods} mods to process.")
+        self.overall_progress.setMaximum(max(mods, 1))
+        self.overall_label.setText(f"0 / {mods}")
+        self.status_label.setText("● Ready")
+        self.status_label.setStyleSheet("color: #4ec9b0; font-weight: bold;")
+        self.statusbar.showMessage(f"Found {mods} mods to process.")
+        
+        if mods == 0:
+            QMessageBox.information(self, "Scan Complete", 
+                "No mods found that need processing.\n\n"
+                "Mods are skipped if:\n"
+                "• They don't have a 'textures' folder\n"
+                "• They already have a 'pbr' folder (unless skipping covered textures)\n"
+                "• Diffuse and normal names do not match\n"
+                "• Output already exists\n"
+                "• They are disabled or fully overridden in the MO2 profile")
+        else:
+            QMessageBox.information(self, "Scan Complete", 
+                f"Found {mods} mods to process.\n\n"
+                "Click 'Start Processing' to begin.")
     
     def start_processing(self):
         """Start the processing worker thread."""
         if not self.validate_settings():
             return
         
-        # Get mods count
-        temp_worker = ProcessorWorker(self.settings, self.logger)
-        mods = temp_worker.get_mods_to_process()
-        
-        if len(mods) == 0:
-            QMessageBox.information(self, "No Mods", "No mods found to process.")
-            return
+        # Get mods count, including jobs still queued from a previous session
+        picked = None  # mods included in the scan results, if they are still current
+        if self.scan_settings is not None and self.scan_settings != asdict(self.settings):
+            self.logger.info("Settings changed since the last scan, the mods will be scanned again.")
+            self.clear_scan_results()
+        mods = {JobQueue.key(p) for p in self.job_queue.pending_paths()}
+        if self.scan_settings is not None:
+            picked = [result.mod_path for result in self.scan_model.included()]
+            mods |= {JobQueue.key(p) for p in picked}
+            if len(mods) == 0:
+                QMessageBox.information(self, "No Mods", "No mods found to process.")
+                return
+            ready = f"Ready to process {len(mods)} mods."
+        else:
+            # the engine scans while it converts, starting with the first mod it finds
+            ready = "Ready to scan the mods and process the ones that need it."
+            if mods:
+                ready += f"\n{len(mods)} mods are still queued from before."
         
         # Confirm
         reply = QMessageBox.question(self, "Confirm Processing",
-            f"Ready to process {len(mods)} mods.\n\n"
+            f"{ready}\n\n"
             f"Source: {self.settings.mods_directory}\n"
             f"Output: {self.settings.output_directory}\n\n"
             "Continue?",
@@ -1290,6 +5530,7 @@ class PBRifyWindow(QMainWindow):
         
         # Save settings
         self.settings.save(self.config_path)
+        self.job_queue.clear_finished()
         
         # Update UI
         self.start_btn.setEnabled(False)
@@ -1299,26 +5540,65 @@ class PBRifyWindow(QMainWindow):
         self.status_label.setStyleSheet("color: #4fc1ff; font-weight: bold;")
         
         # Reset progress
-        self.overall_progress.setMaximum(len(mods))
+        self.overall_progress.setMaximum(max(len(mods), 1))
         self.overall_progress.setValue(0)
         self.mod_progress.setValue(0)
         self.mod_progress.setMaximum(100)
         
         # Create and start worker
-        self.worker = ProcessorWorker(self.settings, self.logger)
+        self.worker = ProcessorWorker(self.settings, self.logger, self.job_queue, mods=picked)
         self.worker.signals.progress.connect(self.on_progress)
+        self.worker.signals.total.connect(self.on_total)
         self.worker.signals.mod_progress.connect(self.on_mod_progress)
         self.worker.signals.finished.connect(self.on_finished)
         self.worker.signals.error.connect(self.on_error)
+        self.worker.signals.paused.connect(self.on_paused)
         self.worker.start()
     
+    def queue_mod(self):
+        """Queue a single mod in the high-priority lane."""
+        if not self.validate_settings():
+            return
+        
+        initial = str(self.settings.mods_directory or Path.cwd())
+        path = QFileDialog.getExistingDirectory(self, "Select Mod to Queue", initial)
+        if not path:
+            return
+        
+        mod_path = Path(path)
+        if not has_textures_but_no_pbr(mod_path) or not has_valid_pairs(mod_path):
+            QMessageBox.warning(self, "Cannot Queue Mod",
+                f"{mod_path.name} has no textures that can be converted.")
+            return
+        
+        if not self.job_queue.enqueue(mod_path, PRIORITY_HIGH):
+            self.logger.info(f"{mod_path.name} is already queued.")
+            return
+        self.logger.info(f"Queued with high priority: {mod_path.name}")
+        
+        # Run the high-priority lane right away if a batch is busy, otherwise
+        # wait for Start Processing like any other queued mod
+        if self.worker and self.worker.isRunning():
+            if self.priority_worker is None or not self.priority_worker.isRunning():
+                self.priority_worker = ProcessorWorker(self.settings, self.logger, self.job_queue, PRIORITY_HIGH)
+                self.priority_worker.signals.finished.connect(self.on_priority_finished)
+                self.priority_worker.signals.error.connect(self.on_error)
+                self.priority_worker.start()
+        else:
+            self.statusbar.showMessage(f"Queued {mod_path.name}. Click 'Start Processing' to begin.")
+    
     def stop_processing(self):
-        """Stop the processing."""
+        """Stop the processing, or cancel a running scan."""
+        if self.scan_worker:
+            self.statusbar.showMessage("Cancelling scan...")
+            self.scan_worker.stop()
         if self.worker:
             self.logger.warning("Stopping processing...")
             self.status_label.setText("● Stopping...")
             self.status_label.setStyleSheet("color: #d19a66; font-weight: bold;")
             self.worker.stop()
+        if self.priority_worker:
+            self.priority_worker.stop()
     
     def on_progress(self, current: int, total: int, mod_name: str):
         """Handle overall progress updates."""
@@ -1329,12 +5609,27 @@ class PBRifyWindow(QMainWindow):
         self.mod_progress.setValue(0)
         self.mod_label.setText("0 / 0")
     
+    def on_total(self, current: int, total: int):
+        """Handle the total growing while the scan runs."""
+        self.overall_progress.setMaximum(total)
+        self.overall_label.setText(f"{current} / {total}")
+    
     def on_mod_progress(self, current: int, total: int):
         """Handle current mod progress updates."""
         self.mod_progress.setMaximum(total)
         self.mod_progress.setValue(current)
         self.mod_label.setText(f"{current} / {total}")
     
+    def on_paused(self, paused: bool, reason: str):
+        """Handle the worker pausing for disk space."""
+        if paused:
+            self.status_label.setText("● Paused: low disk space")
+            self.status_label.setStyleSheet("color: #d19a66; font-weight: bold;")
+            self.statusbar.showMessage(reason)
+        else:
+            self.status_label.setText("● Processing...")
+            self.status_label.setStyleSheet("color: #4fc1ff; font-weight: bold;")
+    
     def on_finished(self, stats: ProcessingStats):
         """Handle processing completion."""
         self.start_btn.setEnabled(True)
@@ -1358,24 +5653,39 @@ class PBRifyWindow(QMainWindow):
             f"Mods skipped: {stats.skipped_mods}\n"
             f"Mods failed: {stats.failed_mods}\n"
             f"Files renamed: {stats.renamed_files}\n"
-            f"Textures processed: {stats.processed_textures}")
+            f"Textures processed: {stats.processed_textures}\n"
+            f"Space reclaimed by hardlinks: {format_bytes(stats.reclaimed_bytes)}")
         
+        # the results no longer match the output folder
+        self.clear_scan_results()
         self.worker = None
     
+    def on_priority_finished(self, stats: ProcessingStats):
+        """Handle completion of the high-priority lane."""
+        self.logger.info(f"High-priority lane finished: {stats.processed_mods} processed, {stats.failed_mods} failed.")
+        self.priority_worker = None
+    
     def on_error(self, error_msg: str):
         """Handle processing errors."""
         QMessageBox.critical(self, "Processing Error", f"An error occurred:\n{error_msg}")
     
     def closeEvent(self, event):
         """Handle window close event."""
-        if self.worker and self.worker.isRunning():
+        if self.scan_worker and self.scan_worker.isRunning():
+            self.scan_worker.stop()
+            self.scan_worker.wait(3000)
+        workers = [w for w in (self.worker, self.priority_worker) if w and w.isRunning()]
+        if workers:
             reply = QMessageBox.question(self, "Quit",
-                "Processing is still running.\nAre you sure you want to quit?",
+                "Processing is still running.\nAre you sure you want to quit?\n\n"
+                "Unfinished mods stay queued and resume next time.",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
             
             if reply == QMessageBox.StandardButton.Yes:
-                self.worker.stop()
-                self.worker.wait(3000)  # Wait up to 3 seconds
+                for worker in workers:
+                    worker.stop()
+                for worker in workers:
+                    worker.wait(3000)  # Wait up to 3 seconds
                 event.accept()
             else:
                 event.ignore()
@@ -1386,6 +5696,148 @@ class PBRifyWindow(QMainWindow):
 # MAIN ENTRY POINT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def parse_args(argv: list) -> argparse.Namespace:
+    """Parse command line arguments. Settings not given come from config.txt."""
+    parser = argparse.ArgumentParser(description="Batch convert Skyrim mod textures to PBR with create_pbr.exe.")
+    parser.add_argument('--cli', action='store_true', help="process mods without opening the window")
+    parser.add_argument('--mods-dir', type=Path, help="mods directory")
+    parser.add_argument('--output-dir', type=Path, help="output directory")
+    parser.add_argument('--create-pbr', type=Path, help="path to create_pbr.exe")
+    parser.add_argument('--checkpoint', choices=ALLOWED_CHECKPOINTS)
+    parser.add_argument('--format', dest='texture_format', choices=ALLOWED_TEXTURE_FORMATS)
+    parser.add_argument('--max-tile-size', choices=ALLOWED_TILE_SIZES)
+    parser.add_argument('--max-concurrent-mods', type=int, help="create_pbr.exe processes to run at the same time")
+    parser.add_argument('--job-dir', type=Path, help="shared folder to split the work with other machines")
+    parser.add_argument('--node-name', help="name of this machine in the job directory")
+    parser.add_argument('--shard', help="only process the i-th of N static shares of the mods, e.g. 2/3")
+    parser.add_argument('--scratch-dir', type=Path, help="fast folder to convert in before outputs are committed")
+    parser.add_argument('--metrics-file', type=Path, help="write metrics in the Prometheus text format to this file")
+    parser.add_argument('--status-file', type=Path, help="write the progress as JSON to this file")
+    parser.add_argument('--variant', action='append', metavar='CHECKPOINT:FORMAT:TILE',
+                        help="convert with these settings instead, into '<Mod> PBR (CHECKPOINT FORMAT TILE)' folders, "
+                             "repeat for a settings matrix, e.g. --variant s4:dds:1024 --variant s4_alt:png:1024")
+    parser.add_argument('--min-texture-size', type=int, help="skip textures with a side below this many pixels")
+    parser.add_argument('--max-texture-size', type=int, help="skip textures with a side above this many pixels")
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help="only convert textures matching this glob, e.g. textures/armor/**, can be repeated")
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help="skip textures matching this glob, e.g. textures/lod/**, can be repeated")
+    parser.add_argument('--exclude-mod', action='append', metavar='NAME',
+                        help="skip mods with this name or matching this glob, can be repeated")
+    parser.add_argument('--child-log-level', choices=ALLOWED_CHILD_LOG_LEVELS,
+                        help="level create_pbr.exe output is logged at, it is always in each mod's own log")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="run fewer create_pbr.exe processes, or suspend them, while the machine is busy")
+    parser.add_argument('--trivial', choices=ALLOWED_TRIVIAL_ACTIONS,
+                        help="what to do with pairs whose diffuse and normal maps are a single colour, needs NumPy")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report the work left and what the texture filters remove without converting")
+    return parser.parse_args(argv)
+
+
+def apply_args(settings: Settings, args: argparse.Namespace):
+    """Override settings with the ones given on the command line."""
+    if args.mods_dir is not None:
+        settings.mods_directory = args.mods_dir
+    if args.output_dir is not None:
+        settings.output_directory = args.output_dir
+    if args.create_pbr is not None:
+        settings.create_pbr_path = args.create_pbr
+    if args.checkpoint is not None:
+        settings.checkpoint = args.checkpoint
+    if args.texture_format is not None:
+        settings.texture_format = args.texture_format
+    if args.max_tile_size is not None:
+        settings.max_tile_size = args.max_tile_size
+    if args.max_concurrent_mods is not None:
+        settings.max_concurrent_mods = max(1, args.max_concurrent_mods)
+    if args.job_dir is not None:
+        settings.job_directory = args.job_dir
+    if args.node_name is not None:
+        settings.node_name = args.node_name
+    if args.shard is not None:
+        settings.shard = args.shard
+    if args.scratch_dir is not None:
+        settings.scratch_directory = args.scratch_dir
+    if args.metrics_file is not None:
+        settings.metrics_file = args.metrics_file
+    if args.status_file is not None:
+        settings.status_file = args.status_file
+    if args.variant is not None:
+        settings.variants = args.variant
+    if args.min_texture_size is not None:
+        settings.min_texture_size = max(0, args.min_texture_size)
+    if args.max_texture_size is not None:
+        settings.max_texture_size = max(0, args.max_texture_size)
+    if args.include is not None:
+        settings.include_globs = args.include
+    if args.exclude is not None:
+        settings.exclude_globs = args.exclude
+    if args.exclude_mod is not None:
+        settings.excluded_mods = args.exclude_mod
+    if args.child_log_level is not None:
+        settings.child_log_level = args.child_log_level
+    if args.adaptive:
+        settings.adaptive_concurrency = True
+    if args.trivial is not None:
+        settings.trivial_textures = args.trivial
+
+
+async def print_events(engine: ConversionEngine) -> ProcessingStats:
+    """Run the engine and print its progress to the console."""
+    events = engine.events()
+    engine_task = asyncio.create_task(engine.run())
+    async for event in events:
+        if event.kind == EVENT_PROGRESS:
+            print(f"[{event.current}/{event.total}] {event.mod_name}", flush=True)
+        elif event.kind == EVENT_PAUSED and event.paused:
+            print(f"Paused: {event.message}", flush=True)
+        elif event.kind == EVENT_ERROR:
+            print(f"Error: {event.message}", file=sys.stderr, flush=True)
+    return await engine_task
+
+
+def run_cli(args: argparse.Namespace) -> int:
+    """Process mods headless. Returns the exit code."""
+    settings = Settings.load(Path.cwd() / CONFIG_FILE_NAME)
+    apply_args(settings, args)
+    
+    logger = setup_logging(console=True)
+    
+    if not settings.is_valid():
+        logger.error("Mods directory, output directory and create_pbr.exe must all be valid. "
+                     "Set them in config.txt or on the command line.")
+        return 2
+    if settings.shard and parse_shard(settings.shard) is None:
+        logger.error(f"Invalid shard '{settings.shard}', expected i/N with 1 <= i <= N.")
+        return 2
+    if settings.scratch_directory is not None and not settings.scratch_directory.is_dir():
+        logger.error(f"Scratch directory {settings.scratch_directory} does not exist.")
+        return 2
+    for variant in settings.variants:
+        if parse_variant(variant) is None:
+            logger.error(f"Invalid variant '{variant}', expected checkpoint:format:tile, e.g. s4:dds:1024.")
+            return 2
+    
+    if args.dry_run:
+        logger.info(ConversionEngine(settings, logger).dry_run())
+        return 0
+    
+    if settings.job_directory is not None:
+        # the shared directory tracks the work, several nodes may run from one folder
+        job_queue = JobQueue()
+    else:
+        job_queue = JobQueue(Path.cwd() / QUEUE_FILE_NAME)
+        for job in job_queue.recover():
+            logger.warning(f"Requeued interrupted job: {job.mod_name}")
+    engine = ConversionEngine(settings, logger, job_queue)
+    
+    # Ctrl+C stops gracefully: running children are killed and their jobs stay queued
+    signal.signal(signal.SIGINT, lambda signum, frame: engine.stop())
+    stats = asyncio.run(print_events(engine))
+    return 1 if stats.failed_mods or engine.should_stop else 0
+
+
 def main():
     # Check Python version
     if sys.version_info < PYTHON_MIN_VERSION:
@@ -1393,6 +5845,10 @@ def main():
         print(f"Current version: {sys.version_info.major}.{sys.version_info.minor}")
         sys.exit(1)
     
+    args = parse_args(sys.argv[1:])
+    if args.cli:
+        sys.exit(run_cli(args))
+    
     # Create application
     app = QApplication(sys.argv)
     app.setStyle("Fusion")  # Use Fusion style for consistent look
@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=['socket', 'ssl', 'http', 'urllib', 'email', 'mimetypes', 'netrc', 'nntplib', 'PySide6.QtNetwork'],
+    excludes=['ssl', 'http', 'urllib', 'email', 'mimetypes', 'netrc', 'nntplib', 'PySide6.QtNetwork'],
     noarchive=True,
     optimize=0,
 )
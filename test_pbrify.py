@@ -0,0 +1,607 @@
+"""Tests for PBRify. The ones that convert use the stand-in create_pbr.exe of bench_pbrify.py.
+
+    python -m unittest test_pbrify
+"""
+
+import asyncio
+import dataclasses
+import logging
+import multiprocessing
+import os
+import struct
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import bench_pbrify
+import pbrify
+
+
+class SharedJobDirectoryTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def leave_dead_claim(self, mod_name: str) -> Path:
+        """Leave the claim of a node that died after creating the mod's output folder."""
+        dead = pbrify.SharedJobDirectory(self.path, 'dead', lease=60)
+        self.assertEqual(dead.claim(mod_name), {})
+        dead.mark_output_created(mod_name)
+        lock_path = dead.lock_path(mod_name)
+        old = time.time() - 3600
+        os.utime(lock_path, (old, old))
+        return lock_path
+    
+    def test_takeover_lost_to_another_node_keeps_expired_claim(self):
+        lock_path = self.leave_dead_claim('Mod')
+        node_a = pbrify.SharedJobDirectory(self.path, 'a', lease=60)
+        node_b = pbrify.SharedJobDirectory(self.path, 'b', lease=60)
+        results = {}
+        rename = os.rename
+        
+        def rename_then_b_claims(source, target):
+            # b creates the new lock between a's rename and a's own attempt
+            rename(source, target)
+            if str(target).endswith('.expired') and 'b' not in results:
+                results['b'] = node_b.claim('Mod')
+        
+        with mock.patch.object(pbrify.os, 'rename', rename_then_b_claims):
+            results['a'] = node_a.claim('Mod')
+        
+        self.assertIsNone(results['a'])
+        self.assertEqual(results['b'].get('node'), 'dead')
+        self.assertTrue(results['b'].get('created_output'))
+        self.assertTrue(node_b.owns(lock_path))
+        self.assertEqual(node_b.expired_paths(lock_path), [])
+    
+    def test_node_dying_during_takeover_leaves_mod_abandoned(self):
+        lock_path = self.leave_dead_claim('Mod')
+        node_a = pbrify.SharedJobDirectory(self.path, 'a', lease=60)
+        os.rename(lock_path, lock_path.with_name(f'{lock_path.name}.a.expired'))  # a dies right after
+        self.assertTrue(node_a.is_abandoned('Mod'))
+        node_b = pbrify.SharedJobDirectory(self.path, 'b', lease=60)
+        self.assertTrue(node_b.claim('Mod').get('created_output'))
+        self.assertFalse(node_b.is_abandoned('Mod'))
+
+
+def convert_as_node(index: int, settings: pbrify.Settings, results):
+    """Run one node in its own process and report the mods it converted."""
+    converted = []
+    logger = logging.getLogger('pbrify-test-node')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    engine = pbrify.ConversionEngine(settings, logger, pbrify.JobQueue())
+    convert_mod = engine.convert_mod
+    
+    async def record_conversion(prepared):
+        converted.append(prepared.mod_path.name)
+        return await convert_mod(prepared)
+    
+    engine.convert_mod = record_conversion
+    stats = asyncio.run(engine.run())
+    results.put((index, converted, stats.failed_mods))
+
+
+@unittest.skipIf(os.name == 'nt', "the stand-in create_pbr.exe is a Python script")
+class SeveralNodesTest(unittest.TestCase):
+    """Several processes against one library, as several machines would run."""
+    
+    MODS = 8
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.settings = bench_pbrify.build_library(self.root, self.MODS, 2, 4, 0.05)
+        self.mod_names = [f'Mod{m:03}' for m in range(self.MODS)]
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def run_nodes(self, settings: list) -> list:
+        """Run a node per settings at the same time. Returns the mods each one converted."""
+        context = multiprocessing.get_context('fork')  # the nodes share the loaded module, like separate installs
+        results = context.Queue()
+        nodes = [context.Process(target=convert_as_node, args=(index, node_settings, results))
+                 for index, node_settings in enumerate(settings)]
+        for node in nodes:
+            node.start()
+        reports = sorted(results.get(timeout=120) for _ in nodes)
+        for node in nodes:
+            node.join(timeout=30)
+            self.assertEqual(node.exitcode, 0)
+        self.assertEqual([failed for _, _, failed in reports], [0] * len(nodes))
+        return [converted for _, converted, _ in reports]
+    
+    def assert_converted_once(self, converted: list):
+        everything = [mod_name for node in converted for mod_name in node]
+        self.assertCountEqual(everything, self.mod_names)
+        for mod_name in self.mod_names:
+            output_path = self.settings.output_directory / f'{mod_name} PBR'
+            self.assertTrue((output_path / pbrify.MANIFEST_FILE_NAME).is_file(), mod_name)
+            self.assertEqual(len(list(output_path.rglob('*_rmaos.dds'))), 2, mod_name)
+    
+    def node_settings(self, **changes) -> pbrify.Settings:
+        return dataclasses.replace(self.settings, job_directory=self.root / 'jobs', **changes)
+    
+    def test_shared_job_directory_converts_each_mod_once(self):
+        converted = self.run_nodes([self.node_settings(node_name=name) for name in 'abc'])
+        self.assert_converted_once(converted)
+        self.assertEqual(list((self.root / 'jobs' / 'claims').iterdir()), [])
+    
+    def test_expired_claim_is_taken_over(self):
+        # a dead node left a claim and half an output folder behind
+        dead = pbrify.SharedJobDirectory(self.root / 'jobs', 'dead', lease=60)
+        self.assertEqual(dead.claim('Mod003'), {})
+        output_path = self.settings.output_directory / 'Mod003 PBR'
+        (output_path / 'textures' / 'pbr' / 'armor').mkdir(parents=True)
+        (output_path / 'textures' / 'pbr' / 'armor' / 'tex0000.dds').write_bytes(b'partial')
+        dead.mark_output_created('Mod003')
+        old = time.time() - 3600
+        os.utime(dead.lock_path('Mod003'), (old, old))
+        
+        converted = self.run_nodes([self.node_settings(node_name=name, claim_lease=60) for name in 'ab'])
+        self.assert_converted_once(converted)
+        self.assertNotEqual((output_path / 'textures' / 'pbr' / 'armor' / 'tex0000.dds').read_bytes(), b'partial')
+        self.assertEqual(list((self.root / 'jobs' / 'claims').iterdir()), [])
+    
+    def test_static_shards_are_disjoint_and_complete(self):
+        shards = [f'{index}/3' for index in range(1, 4)]
+        converted = self.run_nodes([dataclasses.replace(self.settings, shard=shard) for shard in shards])
+        self.assert_converted_once(converted)
+        for shard, node in zip(shards, converted):
+            self.assertCountEqual(node, [name for name in self.mod_names if pbrify.in_shard(name, shard)])
+
+
+class JobQueueTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / pbrify.QUEUE_FILE_NAME
+        self.mods = [Path(self.tmp.name) / f'Mod{i}' for i in range(5)]
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_changes_survive_a_reload_through_the_journal(self):
+        queue = pbrify.JobQueue(self.path)
+        self.assertEqual(queue.enqueue_many(self.mods), 5)
+        self.assertEqual(queue.enqueue_many(self.mods[:2]), 0)
+        self.assertEqual(queue.enqueue_many(self.mods[4:], pbrify.PRIORITY_HIGH), 1)
+        job = queue.claim_next()
+        queue.finish(job, False, 'broken')
+        queue.remove(queue.jobs[pbrify.JobQueue.key(self.mods[3])])
+        self.assertTrue(queue.journal_path.is_file())
+        with open(queue.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"mod_path": "cut short')  # the last session was killed mid-write
+        
+        reloaded = pbrify.JobQueue(self.path)
+        self.assertEqual(reloaded.pending_paths(), [self.mods[0].resolve(), self.mods[1].resolve(),
+                                                    self.mods[2].resolve()])
+        self.assertEqual(reloaded.jobs[job.mod_path].error, 'broken')
+        self.assertEqual(reloaded.next_seq, 5)
+    
+    def test_journal_is_folded_into_the_queue_file(self):
+        queue = pbrify.JobQueue(self.path)
+        queue.enqueue_many(self.mods)  # the first change writes the queue file
+        self.assertFalse(queue.journal_path.exists())
+        with mock.patch.object(pbrify, 'QUEUE_COMPACT_ENTRIES', 1):
+            for _ in range(3):
+                job = queue.claim_next()
+                self.assertTrue(queue.journal_path.exists())
+                queue.finish(job, True)
+        # the sixth change outgrows the five jobs
+        self.assertFalse(queue.journal_path.exists())
+        self.assertEqual(len(pbrify.JobQueue(self.path).pending_paths()), 2)
+
+
+class ChildOutputTest(unittest.TestCase):
+    
+    def test_texture_path_with_spaces_scales_the_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mod_path = Path(tmp) / 'Skyrim 202X'
+            texture = mod_path / 'textures' / 'a_n.dds'
+            texture.parent.mkdir(parents=True)
+            header = bytearray(128)
+            header[:4] = b'DDS '
+            struct.pack_into('<III', header, 8, 0x1007, 4096, 4096)
+            texture.write_bytes(bytes(header))
+            
+            for line in (f'Processing {texture}', f"Processing '{texture}'",
+                         f'Processing textures{os.sep}a_n.dds'):
+                match = pbrify.DDS_PATH_REGEX.search(line)
+                self.assertIsNotNone(match, line)
+                self.assertTrue(match.group(1).endswith('a_n.dds'), line)
+                engine = pbrify.ConversionEngine(pbrify.Settings(texture_timeout=600), mock.Mock())
+                timeout = engine.texture_timeout(Path(match.group(1)), mod_path)
+                self.assertAlmostEqual(timeout, 600 + pbrify.TEXTURE_TIMEOUT_PER_MEGAPIXEL * 4096 * 4096 / 1_000_000)
+    
+    def test_skipped_texture_path_with_spaces(self):
+        match = pbrify.DDS_PATH_REGEX.search(r'normals: Skipping C:\Mods\Skyrim 202X\textures\a_n.dds')
+        self.assertEqual(match.group(1), r'C:\Mods\Skyrim 202X\textures\a_n.dds')
+
+
+
+class OutputVerificationTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write_dds(self, name: str, width: int = 64, height: int = 64, mips: int = 7, data_size: int = 2744,
+                  magic: bytes = b'DDS ') -> Path:
+        """Write a BC1 texture whose header claims the given size and mips, followed by data_size bytes."""
+        header = bytearray(128)
+        header[:4] = magic
+        struct.pack_into('<IIIIIII', header, 4, 124, 0x1007 | 0x20000, height, width, 0, 0, mips)
+        struct.pack_into('<II4s', header, 76, 32, 0x4, b'DXT1')
+        path = self.path / name
+        path.write_bytes(bytes(header) + bytes(data_size))
+        return path
+    
+    def test_dds_outputs(self):
+        # 64x64 BC1 with 7 mips holds 2048 + 512 + 128 + 32 + 8 + 8 + 8 bytes
+        self.assertEqual(pbrify.verify_output_file(self.write_dds('whole.dds')), '')
+        self.assertEqual(pbrify.verify_output_file(self.path / 'missing.dds'), 'missing')
+        (self.path / 'empty.dds').write_bytes(b'')
+        self.assertEqual(pbrify.verify_output_file(self.path / 'empty.dds'), 'empty')
+        self.assertEqual(pbrify.verify_output_file(self.write_dds('cut.dds', data_size=2743)),
+                         'truncated (2871 of 2872 bytes)')
+        self.assertEqual(pbrify.verify_output_file(self.write_dds('magic.dds', magic=b'PNG ')), 'invalid DDS header')
+        (self.path / 'header.dds').write_bytes(b'DDS ' + bytes(60))
+        self.assertEqual(pbrify.verify_output_file(self.path / 'header.dds'), 'invalid DDS header')
+        self.assertEqual(pbrify.verify_output_file(self.write_dds('wide.dds', width=0, mips=1, data_size=128)),
+                         'bad dimensions 0x64')
+    
+    def test_png_outputs(self):
+        whole = self.path / 'whole.png'
+        pbrify.write_constant_png(whole, 8, 4, (1, 2, 3, 4))
+        self.assertEqual(pbrify.verify_output_file(whole), '')
+        data = whole.read_bytes()
+        (self.path / 'cut.png').write_bytes(data[:-4])
+        self.assertEqual(pbrify.verify_output_file(self.path / 'cut.png'), 'truncated')
+        (self.path / 'signature.png').write_bytes(b'\x89PNG\n\n\x1a\n' + data[8:])
+        self.assertEqual(pbrify.verify_output_file(self.path / 'signature.png'), 'invalid PNG header')
+        (self.path / 'header.png').write_bytes(data[:20])
+        self.assertEqual(pbrify.verify_output_file(self.path / 'header.png'), 'invalid PNG header')
+        (self.path / 'empty.png').write_bytes(b'')
+        self.assertEqual(pbrify.verify_output_file(self.path / 'empty.png'), 'empty')
+        self.assertEqual(pbrify.verify_output_file(self.path / 'missing.png'), 'missing')
+
+
+@unittest.skipIf(pbrify.np is None, "decoding textures needs NumPy")
+class TrivialTextureTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    @staticmethod
+    def blocks(*blocks: bytes):
+        return pbrify.np.frombuffer(b''.join(blocks), pbrify.np.uint8).reshape(len(blocks), -1)
+    
+    def test_bc1_four_colour_block(self):
+        # red and blue endpoints, pixel i uses palette entry i % 4
+        block = struct.pack('<HHI', 0xF800, 0x001F, 0xE4E4E4E4)
+        pixels = pbrify.decode_bc1(self.blocks(block)).tolist()
+        self.assertEqual(pixels[:4], [[255, 0, 0, 255], [0, 0, 255, 255], [170, 0, 85, 255], [85, 0, 170, 255]])
+        self.assertEqual(pixels[4:8], pixels[:4])
+    
+    def test_bc1_three_colour_block_has_transparent_black(self):
+        block = struct.pack('<HHI', 0x001F, 0xF800, 0xE4E4E4E4)
+        pixels = pbrify.decode_bc1(self.blocks(block)).tolist()
+        self.assertEqual(pixels[:4], [[0, 0, 255, 255], [255, 0, 0, 255], [127, 0, 127, 255], [0, 0, 0, 0]])
+        # BC3 colour blocks always have four colours
+        pixels = pbrify.decode_bc1(self.blocks(block), four_colour=True).tolist()
+        self.assertEqual(pixels[3], [170, 0, 85, 255])
+    
+    def test_bc4_block(self):
+        indices = sum(i % 8 << 3 * i for i in range(16)).to_bytes(6, 'little')
+        values = pbrify.decode_bc4(self.blocks(bytes([255, 0]) + indices)).tolist()
+        self.assertEqual(values[:8], [255, 0, 218, 182, 145, 109, 72, 36])
+        values = pbrify.decode_bc4(self.blocks(bytes([0, 255]) + indices)).tolist()
+        self.assertEqual(values[:8], [0, 255, 51, 102, 153, 204, 0, 255])
+    
+    def test_constant_block_compressed_textures(self):
+        for kind, colour in (('bc1', (131, 129, 131, 255)), ('bc3', (131, 129, 131, 128)),
+                             ('bc5', (128, 128, 255, 255))):
+            texture = self.path / f'{kind}.dds'
+            bench_pbrify.write_bench_texture(texture, 256, kind, constant=True)
+            pixels = pbrify.read_dds_pixels(texture)
+            self.assertEqual(len(pixels), 64 * 64, kind)  # the largest mip within TRIVIAL_ANALYSIS_SIZE
+            self.assertEqual(pbrify.constant_colour(pixels, 0), colour, kind)
+            bench_pbrify.write_bench_texture(texture, 256, kind, constant=False)
+            self.assertIsNone(pbrify.constant_colour(pbrify.read_dds_pixels(texture), 4), kind)
+    
+    def test_tolerance_edge(self):
+        texture = self.path / 'grey.dds'
+        pbrify.write_constant_dds(texture, 16, 16, (100, 100, 100, 255))
+        with open(texture, 'r+b') as f:
+            f.seek(128 + 2)  # red of the first pixel, stored as BGRA
+            f.write(bytes([104]))
+        pixels = pbrify.read_dds_pixels(texture)
+        self.assertEqual(pbrify.constant_colour(pixels, 4), (102, 100, 100, 255))
+        self.assertIsNone(pbrify.constant_colour(pixels, 3))
+    
+    def test_non_power_of_two_sizes(self):
+        texture = self.path / 'odd.dds'
+        pbrify.write_constant_dds(texture, 24, 40, (10, 20, 30, 40))
+        pixels = pbrify.read_dds_pixels(texture)
+        self.assertEqual(len(pixels), 24 * 40)
+        self.assertEqual(pbrify.constant_colour(pixels, 0), (10, 20, 30, 40))
+        # 200x120 halves twice to fit
+        pbrify.write_constant_dds(texture, 200, 120, (10, 20, 30, 40))
+        pixels = pbrify.read_dds_pixels(texture)
+        self.assertEqual(len(pixels), 50 * 30)
+        self.assertEqual(pbrify.constant_colour(pixels, 0), (10, 20, 30, 40))
+
+
+@unittest.skipIf(os.name == 'nt', "the stand-in create_pbr.exe is a Python script")
+class ChildProcessTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.pid_path = root / 'pid'
+        (root / 'bin').mkdir()
+        (root / 'mods' / 'Mod').mkdir(parents=True)
+        (root / 'output' / 'Mod PBR').mkdir(parents=True)
+        self.settings = pbrify.Settings(root / 'mods', root / 'output', root / 'bin' / 'create_pbr.exe')
+        self.mod_path = root / 'mods' / 'Mod'
+        self.output_path = root / 'output' / 'Mod PBR'
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def write_create_pbr(self, output: str):
+        """Write a create_pbr.exe that records its process id, prints output and hangs."""
+        self.settings.create_pbr_path.write_text(f"""#!{sys.executable}
+import os, sys, time
+open({str(self.pid_path)!r}, 'w').write(str(os.getpid()))
+sys.stdout.write({output!r})
+sys.stdout.flush()
+time.sleep(60)
+""")
+        self.settings.create_pbr_path.chmod(0o755)
+    
+    def assert_child_gone(self):
+        pid = int(self.pid_path.read_text())
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+    
+    def test_child_is_killed_when_reading_its_output_fails(self):
+        self.write_create_pbr('\r' + 'x' * pbrify.CHILD_LINE_LIMIT * 2)  # tqdm style progress without a newline
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock())
+        result = asyncio.run(engine.run_create_pbr(self.mod_path, self.output_path, 'Mod'))
+        self.assertFalse(result.success)
+        self.assertEqual(engine.children, set())
+        self.assert_child_gone()
+    
+    def test_child_is_killed_when_cancelled(self):
+        self.write_create_pbr('normals: found 1\n')
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock())
+        
+        async def cancel_once_started():
+            task = asyncio.create_task(engine.run_create_pbr(self.mod_path, self.output_path, 'Mod'))
+            while not self.pid_path.is_file() or not self.pid_path.read_text():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        asyncio.run(cancel_once_started())
+        self.assert_child_gone()
+
+
+
+@unittest.skipIf(os.name == 'nt', "the stand-in create_pbr.exe is a Python script")
+class ConversionTest(unittest.TestCase):
+    """Runs against the stand-in create_pbr.exe of the benchmarks."""
+    
+    PAIRS = 6
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.settings = bench_pbrify.build_library(self.root, 1, self.PAIRS, 4, 0)
+        self.mod_path = self.settings.mods_directory / 'Mod000'
+        pbrify.PATH_INDEX.listings.clear()
+    
+    def tearDown(self):
+        pbrify.PATH_INDEX.listings.clear()
+        self.tmp.cleanup()
+    
+    def run_engine(self, mods: Optional[list] = None) -> pbrify.ConversionEngine:
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue(), mods=mods)
+        asyncio.run(engine.run())
+        return engine
+    
+    def outputs(self, mod_name: str = 'Mod000') -> list:
+        output_path = self.settings.output_directory / f'{mod_name} PBR' / 'textures' / 'pbr'
+        return sorted(p.relative_to(output_path).as_posix() for p in output_path.rglob('*.dds'))
+    
+    @staticmethod
+    def expected_outputs(pairs) -> list:
+        return [f'armor/tex{p:04}{suffix}.dds' for p in pairs for suffix in ('', '_n', '_rmaos')]
+    
+    def count_runs(self, engine: pbrify.ConversionEngine) -> list:
+        """Record the pairs create_pbr.exe is run on, by texture number."""
+        runs = []
+        convert_pairs = engine.convert_pairs
+        
+        async def record_run(mod_path, output_path, pairs, *args, **kwargs):
+            runs.append([int(pair.diffuse_name[3:7]) for pair in pairs])
+            return await convert_pairs(mod_path, output_path, pairs, *args, **kwargs)
+        
+        engine.convert_pairs = record_run
+        return runs
+    
+    def test_own_pbr_folder_is_not_converted_again(self):
+        own = self.mod_path / 'textures' / 'pbr' / 'armor'
+        bench_pbrify.write_dds(own / 'iron.dds', 4)
+        bench_pbrify.write_dds(own / 'iron_n.dds', 4)
+        self.settings.skip_covered_textures = True
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock())
+        plan = engine.plan_mod(self.mod_path)
+        self.assertFalse(plan.is_partial)
+        self.assertTrue(plan.needs_staging)
+        
+        engine = self.run_engine()
+        self.assertEqual(engine.stats.processed_mods, 1)
+        self.assertEqual(self.outputs(), self.expected_outputs(range(self.PAIRS)))
+    
+    def change_library(self) -> pbrify.ConversionEngine:
+        """Change the first texture, remove the second pair and add a new one. Returns an engine counting runs."""
+        textures = self.mod_path / 'textures' / 'armor'
+        bench_pbrify.write_dds(textures / 'tex0001.dds', 8)
+        (textures / 'tex0002.dds').unlink()
+        (textures / 'tex0002_n.dds').unlink()
+        bench_pbrify.write_dds(textures / 'tex0006.dds', 4)
+        bench_pbrify.write_dds(textures / 'tex0006_n.dds', 4)
+        pbrify.PATH_INDEX.listings.clear()
+        return pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+    
+    def test_update_converts_added_and_changed_pairs_and_removes_stale_outputs(self):
+        self.run_engine()
+        engine = self.change_library()
+        plan = engine.plan_mod(self.mod_path)
+        self.assertTrue(plan.update)
+        self.assertEqual(plan.current_pairs, 4)
+        self.assertEqual([pair.diffuse_name for pair in plan.pairs], ['tex0001.dds', 'tex0006.dds'])
+        self.assertEqual(len(plan.removed_keys), 1)
+        self.assertEqual(sorted(plan.stale_outputs), ['textures/pbr/' + rel for rel in self.expected_outputs([1, 2])])
+        
+        runs = self.count_runs(engine)
+        asyncio.run(engine.run())
+        self.assertEqual(runs, [[1, 6]])
+        self.assertEqual(engine.stats.updated_mods, 1)
+        self.assertEqual(self.outputs(), self.expected_outputs([0, 1, 3, 4, 5, 6]))
+        manifest = pbrify.OutputManifest.load(self.settings.output_directory / 'Mod000 PBR')
+        self.assertEqual(sorted(Path(key).name for key in manifest.entries),
+                         [f'tex{p:04}_n.dds' for p in (0, 1, 3, 4, 5, 6)])
+        self.assertEqual(pbrify.ConversionEngine(self.settings, mock.Mock()).get_mods_to_process(), [])
+    
+    def test_touched_texture_with_the_same_content_is_current(self):
+        self.settings.manifest_hashes = True
+        self.run_engine()
+        texture = self.mod_path / 'textures' / 'armor' / 'tex0001.dds'
+        later = texture.stat().st_mtime + 60
+        os.utime(texture, (later, later))
+        self.assertEqual(pbrify.ConversionEngine(self.settings, mock.Mock()).get_mods_to_process(), [])
+        with open(texture, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\xff' if f.read(1) != b'\xff' else b'\x00')
+        self.assertEqual(pbrify.ConversionEngine(self.settings, mock.Mock()).get_mods_to_process(), [self.mod_path])
+    
+    def test_changed_settings_convert_every_pair_again(self):
+        self.run_engine()
+        self.settings.max_tile_size = '2048'
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+        runs = self.count_runs(engine)
+        asyncio.run(engine.run())
+        self.assertEqual(runs, [list(range(self.PAIRS))])
+        manifest = pbrify.OutputManifest.load(self.settings.output_directory / 'Mod000 PBR')
+        self.assertEqual({entry['settings']['max_tile_size'] for entry in manifest.entries.values()}, {'2048'})
+    
+    def test_scratch_update_keeps_the_final_folder_whole_until_the_commit(self):
+        self.settings.scratch_directory = self.root / 'scratch'
+        self.settings.scratch_directory.mkdir()
+        self.run_engine()
+        before = self.outputs()
+        engine = self.change_library()
+        during = []
+        convert_mod = engine.convert_mod
+        
+        async def look_at_final_folder(prepared):
+            during.append(self.outputs())
+            return await convert_mod(prepared)
+        
+        engine.convert_mod = look_at_final_folder
+        saved = []
+        save = pbrify.OutputManifest.save
+        
+        def look_before_saving(manifest):
+            saved.append(self.outputs())
+            save(manifest)
+        
+        with mock.patch.object(pbrify.OutputManifest, 'save', look_before_saving):
+            asyncio.run(engine.run())
+        
+        self.assertEqual(during, [before])
+        # the new outputs are in and the stale ones gone before the manifest says so
+        self.assertEqual(saved, [self.expected_outputs([0, 1, 3, 4, 5, 6])])
+        self.assertEqual(self.outputs(), self.expected_outputs([0, 1, 3, 4, 5, 6]))
+        changed = self.settings.output_directory / 'Mod000 PBR' / 'textures' / 'pbr' / 'armor' / 'tex0001_n.dds'
+        self.assertEqual(changed.stat().st_size, (self.mod_path / 'textures' / 'armor' / 'tex0001_n.dds').stat().st_size)
+        self.assertEqual(list(self.settings.scratch_directory.iterdir()), [])
+    
+    def test_damaged_outputs_are_reconverted_on_their_own(self):
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+        runs = self.count_runs(engine)
+        with mock.patch.dict(os.environ, {bench_pbrify.FAKE_TRUNCATE_VARIABLE: 'tex0002_n'}):
+            asyncio.run(engine.run())
+        
+        # reconverted once right away, then left for the next run
+        self.assertEqual(runs, [list(range(self.PAIRS)), [2]])
+        self.assertEqual(engine.stats.incomplete_textures, 1)
+        self.assertEqual(engine.stats.processed_mods, 1)
+        self.assertEqual(self.outputs(), self.expected_outputs([0, 1, 3, 4, 5]))
+        manifest = pbrify.OutputManifest.load(self.settings.output_directory / 'Mod000 PBR')
+        self.assertEqual(len(manifest.entries), self.PAIRS - 1)
+        self.assertFalse(any('tex0002' in key for key in manifest.entries))
+        
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+        runs = self.count_runs(engine)
+        asyncio.run(engine.run())
+        self.assertEqual(runs, [[2]])
+        self.assertEqual(engine.stats.incomplete_textures, 0)
+        self.assertEqual(self.outputs(), self.expected_outputs(range(self.PAIRS)))
+    
+    def test_failing_texture_is_isolated_and_quarantined(self):
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+        runs = self.count_runs(engine)
+        with mock.patch.dict(os.environ, {bench_pbrify.FAKE_FAIL_VARIABLE: 'tex0003_n'}):
+            asyncio.run(engine.run())
+        
+        # 0 to 2 were written before the crash, the rest is bisected
+        self.assertEqual(runs, [[0, 1, 2, 3, 4, 5], [3, 4], [3], [4], [5]])
+        self.assertEqual(engine.stats.processed_mods, 1)
+        self.assertEqual(engine.stats.quarantined_textures, 1)
+        self.assertEqual(self.outputs(), self.expected_outputs([0, 1, 2, 4, 5]))
+        output_path = self.settings.output_directory / 'Mod000 PBR'
+        report = (output_path / pbrify.QUARANTINE_FILE_NAME).read_text(encoding='utf-8').splitlines()
+        self.assertEqual(report[1:], ['textures/armor/tex0003.dds\ttextures/armor/tex0003_n.dds'])
+        manifest = pbrify.OutputManifest.load(output_path)
+        quarantined = [key for key, entry in manifest.entries.items() if entry.get('quarantined')]
+        self.assertEqual(len(manifest.entries), self.PAIRS)
+        self.assertEqual(len(quarantined), 1)
+        self.assertIn('tex0003', quarantined[0])
+    
+    def test_bisection_stops_at_the_retry_cap(self):
+        self.settings.max_bisect_runs = 3
+        engine = pbrify.ConversionEngine(self.settings, mock.Mock(), pbrify.JobQueue())
+        runs = self.count_runs(engine)
+        with mock.patch.dict(os.environ, {bench_pbrify.FAKE_FAIL_VARIABLE: '_n'}):
+            asyncio.run(engine.run())
+        
+        self.assertEqual(runs, [[0, 1, 2, 3, 4, 5], [0, 1, 2], [0, 1], [0]])
+        self.assertEqual(engine.stats.failed_mods, 1)
+        self.assertEqual(engine.stats.quarantined_textures, 1)
+        self.assertEqual(self.outputs(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()